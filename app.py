@@ -1,8 +1,9 @@
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from pymongo import MongoClient
 from dotenv import load_dotenv
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
 import os
 
 # ✅ Import route blueprints
@@ -15,6 +16,10 @@ from routes.feedback_routes import feedback_bp
 from routes.admin_routes import admin_bp
 from routes.tools_routes import tools_bp
 from routes.user_activity_routes import activity_bp
+from utils.upload_ingest import IngestRequest, MAX_UPLOAD_MB
+from utils.upload_handles import UploadHandleError
+from utils.db_indexes import bootstrap_indexes
+from utils.job_queue import get_job_queue
 
 # ✅ Load environment variables
 load_dotenv()
@@ -22,6 +27,10 @@ load_dotenv()
 # ✅ Initialize Flask App
 app = Flask(__name__)
 
+# ✅ Stream uploads to scratch (hashed + sniffed on arrival) and cap body size
+app.request_class = IngestRequest
+app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_MB * 1024 * 1024
+
 # ✅ Enable CORS for frontend communication (Production Safe)
 CORS(
     app,
@@ -59,6 +68,9 @@ except Exception as e:
     print("❌ MongoDB Connection Failed:", e)
     app.db = None
 
+# ✅ Indexes for every route query (idempotent; strict plan check in dev / CI)
+bootstrap_indexes(app.db)
+
 # ✅ Register Blueprints (organized modular structure)
 app.register_blueprint(auth_bp, url_prefix="/api/auth")
 app.register_blueprint(docs_bp, url_prefix="/api/docs")
@@ -70,6 +82,29 @@ app.register_blueprint(admin_bp, url_prefix="/api/admin")
 app.register_blueprint(tools_bp, url_prefix="/api/tools")
 app.register_blueprint(activity_bp, url_prefix="/api/activity")
 
+# ✅ Start the tool job queue (fails jobs abandoned by dead workers)
+with app.app_context():
+    get_job_queue()
+
+# ✅ Upload errors (any route can hit the body limit)
+@app.errorhandler(RequestEntityTooLarge)
+def handle_too_large(e):
+    limit = request.max_content_length
+    if limit:
+        return jsonify({"error": f"Upload too large; the limit is {limit // (1024 * 1024)} MB"}), 413
+    return jsonify({"error": "Upload too large"}), 413
+
+
+@app.errorhandler(UnsupportedMediaType)
+def handle_wrong_type(e):
+    return jsonify({"error": e.description}), 415
+
+
+@app.errorhandler(UploadHandleError)
+def handle_expired(e):
+    return jsonify({"error": str(e)}), 410
+
+
 # ✅ Health Check Route
 @app.route("/api/health")
 def health():
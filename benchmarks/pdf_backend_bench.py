@@ -0,0 +1,119 @@
+# backend/benchmarks/pdf_backend_bench.py
+"""
+Compare the pikepdf and PyPDF2 PDF backends on a generated corpus.
+
+Run from the backend folder:
+    python -m benchmarks.pdf_backend_bench --docs 40 --pages 50
+
+Each corpus document has text pages plus one embedded image so the
+numbers resemble real uploads rather than empty pages.
+"""
+import argparse
+import io
+import os
+import random
+import shutil
+import tempfile
+import time
+import zlib
+import pikepdf
+from utils.pdf_backend import BACKENDS, get_backend
+
+
+def make_document(path, pages, seed):
+    """Write a synthetic PDF with `pages` text pages and a shared image."""
+    rng = random.Random(seed)
+    with pikepdf.Pdf.new() as pdf:
+        font = pdf.make_indirect(pikepdf.Dictionary(
+            Type=pikepdf.Name.Font, Subtype=pikepdf.Name.Type1, BaseFont=pikepdf.Name.Helvetica,
+        ))
+
+        side = 256
+        pixels = bytes(rng.getrandbits(8) for _ in range(side * side * 3))
+        image = pdf.make_stream(zlib.compress(pixels))
+        image.Type = pikepdf.Name.XObject
+        image.Subtype = pikepdf.Name.Image
+        image.Width = side
+        image.Height = side
+        image.ColorSpace = pikepdf.Name.DeviceRGB
+        image.BitsPerComponent = 8
+        image.Filter = pikepdf.Name.FlateDecode
+
+        for number in range(pages):
+            lines = [b"BT /F1 11 Tf 72 720 Td 14 TL"]
+            for line in range(40):
+                words = " ".join(f"w{rng.randint(0, 99999)}" for _ in range(10))
+                lines.append(f"(Doc {seed} page {number} line {line}: {words}) '".encode())
+            lines.append(b"ET q 128 0 0 128 400 60 cm /Im0 Do Q")
+
+            page = pdf.add_blank_page(page_size=(612, 792))
+            page.Resources = pikepdf.Dictionary(
+                Font=pikepdf.Dictionary(F1=font),
+                XObject=pikepdf.Dictionary(Im0=image),
+            )
+            page.Contents = pdf.make_stream(b"\n".join(lines))
+
+        pdf.save(path)
+
+
+def build_corpus(folder, docs, pages):
+    paths = []
+    for i in range(docs):
+        path = os.path.join(folder, f"doc_{i:03d}.pdf")
+        make_document(path, pages, seed=i)
+        paths.append(path)
+    return paths
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def bench_backend(name, paths, folder, every):
+    backend = get_backend(name)
+    merged_path = os.path.join(folder, f"merged_{name}.pdf")
+
+    merge_s = timed(lambda: backend.merge(paths, merged_path))
+
+    def split():
+        doc = backend.open(merged_path)
+        try:
+            total = backend.page_count(doc)
+            for start in range(1, total + 1, every):
+                backend.extract(doc, start, min(start + every - 1, total), io.BytesIO())
+        finally:
+            backend.close(doc)
+
+    split_s = timed(split)
+    return merge_s, split_s, os.path.getsize(merged_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=40, help="documents in the corpus")
+    parser.add_argument("--pages", type=int, default=50, help="pages per document")
+    parser.add_argument("--every", type=int, default=10, help="pages per split part")
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="pdf-bench-")
+    try:
+        print(f"📚 Building corpus: {args.docs} docs × {args.pages} pages …")
+        paths = build_corpus(folder, args.docs, args.pages)
+
+        print(f"{'backend':<10} {'merge (s)':>10} {'split (s)':>10} {'output MB':>10}")
+        results = {}
+        for name in BACKENDS:
+            merge_s, split_s, size = bench_backend(name, paths, folder, args.every)
+            results[name] = (merge_s, split_s)
+            print(f"{name:<10} {merge_s:>10.2f} {split_s:>10.2f} {size / (1024 * 1024):>10.2f}")
+
+        fast, slow = results["pikepdf"], results["pypdf2"]
+        print(f"⚡ pikepdf speedup — merge ×{slow[0] / fast[0]:.1f}, split ×{slow[1] / fast[1]:.1f}")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,18 @@ from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from flask_cors import cross_origin
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 from werkzeug.utils import secure_filename
 from werkzeug.security import generate_password_hash
 import base64
 import os
+import re
+import threading
+import time
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
+from utils.text_delta import apply_delta
+from utils.autosave import AutosaveConflict, get_autosave
 
 docs_bp = Blueprint("docs_bp", __name__)
 
@@ -16,10 +22,98 @@ docs_bp = Blueprint("docs_bp", __name__)
 # ----------------------------------------------------------
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif", "webp"}
 
+# Document listing pages
+DOCS_PAGE_SIZE = 50
+DOCS_MAX_PAGE_SIZE = 200
+EPOCH = datetime(1970, 1, 1)
+
+# Home summary: per-user cache, dropped on this process's document writes.
+# Other workers' writes show up once the entry expires.
+SUMMARY_CACHE_TTL = int(os.getenv("HOME_SUMMARY_CACHE_TTL", "30"))
+SUMMARY_LIST_SIZE = 5
+SUMMARY_FIELDS = {"name": 1, "favorite": 1, "created_at": 1, "updated_at": 1}
+_summary_cache = {}
+_summary_lock = threading.Lock()
+
 def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def encode_cursor(doc):
+    """
+    Opaque page cursor for the position after `doc`: "<updated_at ms>-<_id>",
+    or "null-<_id>" for legacy documents without updated_at.
+    """
+    updated_at = doc.get("updated_at")
+    if updated_at is None:
+        return f"null-{doc['_id']}"
+    millis = (updated_at - EPOCH) // timedelta(milliseconds=1)
+    return f"{millis}-{doc['_id']}"
+
+
+def decode_cursor(cursor):
+    """(updated_at or None, _id) from a page cursor; raises ValueError when malformed."""
+    millis, _, doc_id = cursor.partition("-")
+    try:
+        updated_at = None if millis == "null" else EPOCH + timedelta(milliseconds=int(millis))
+        return updated_at, ObjectId(doc_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def after_cursor(updated_at, last_id):
+    """
+    Keyset filter for everything after (updated_at, last_id) in
+    (updated_at desc, _id desc) order. Missing / null updated_at sorts
+    last, so those documents follow every dated one.
+    """
+    if updated_at is None:
+        return [{"updated_at": None, "_id": {"$lt": last_id}}]
+    return [
+        {"updated_at": {"$lt": updated_at}},
+        {"updated_at": updated_at, "_id": {"$lt": last_id}},
+        {"updated_at": None},
+    ]
+
+
+def summary_doc(doc):
+    """JSON-ready copy of a projected summary document."""
+    return {
+        **doc,
+        "_id": str(doc["_id"]),
+        "created_at": (doc.get("created_at") or datetime.utcnow()).isoformat(),
+        "updated_at": (doc.get("updated_at") or datetime.utcnow()).isoformat(),
+    }
+
+
+def cached_summary(user_id):
+    if not SUMMARY_CACHE_TTL:
+        return None
+    with _summary_lock:
+        entry = _summary_cache.get(user_id)
+    if entry and time.monotonic() - entry[0] < SUMMARY_CACHE_TTL:
+        return entry[1]
+    return None
+
+
+def store_summary(user_id, summary):
+    if not SUMMARY_CACHE_TTL:
+        return
+    now = time.monotonic()
+    with _summary_lock:
+        # Drop expired entries now and then so idle users don't pile up
+        if len(_summary_cache) > 1000:
+            for key in [k for k, (t, _) in _summary_cache.items() if now - t >= SUMMARY_CACHE_TTL]:
+                del _summary_cache[key]
+        _summary_cache[user_id] = (now, summary)
+
+
+def invalidate_summary(user_id):
+    """Call after any write to the user's documents."""
+    with _summary_lock:
+        _summary_cache.pop(user_id, None)
+
+
 # ----------------------------------------------------------
 # CHECK DOCUMENT NAME
 # ----------------------------------------------------------
@@ -70,12 +164,17 @@ def create_doc():
             "name": name,
             "content": content,
             "favorite": favorite,
+            "version": 0,
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow(),
         }
 
         result = db.documents.insert_one(doc)
+        invalidate_summary(user_id)
         return jsonify({"_id": str(result.inserted_id), "message": "Document created"}), 201
+    except DuplicateKeyError:
+        # Same name created concurrently: the unique (user_id, name) index caught it
+        return jsonify({"message": "Document name already exists"}), 400
     except Exception as e:
         print("❌ create_doc error:", e)
         return jsonify({"message": "Server error"}), 500
@@ -88,17 +187,69 @@ def create_doc():
 @cross_origin(origins=["https://viadocs.in"], supports_credentials=True)
 @jwt_required()
 def get_user_docs():
+    """
+    The user's documents, newest first.
+    Without limit / cursor: every document, with content, as a bare array
+    (the original response, kept for existing clients).
+    With limit and/or cursor: one page as {docs, next_cursor}, without content.
+    Query params:
+    - limit (default 50, max 200) and cursor (next_cursor of the previous page)
+    - favorites=true: favourites only
+    - prefix: names starting with this text (case-insensitive)
+    - content=true / false: include the document bodies (default: paged false, unpaged true)
+    """
     try:
         db = current_app.db
         user_id = get_jwt_identity()
 
-        docs = list(db.documents.find({"user_id": user_id}).sort("updated_at", -1))
+        # Buffered autosaves change updated_at, so the order: write them first
+        autosave = get_autosave(db)
+        if autosave:
+            autosave.flush(user_id)
+
+        paged = "limit" in request.args or "cursor" in request.args
+        try:
+            limit = min(max(int(request.args.get("limit", DOCS_PAGE_SIZE)), 1), DOCS_MAX_PAGE_SIZE)
+        except ValueError:
+            return jsonify({"message": "limit must be a number"}), 400
+
+        query = {"user_id": user_id}
+        if request.args.get("favorites", "").lower() in ("1", "true"):
+            query["favorite"] = True
+        prefix = request.args.get("prefix", "").strip()
+        if prefix:
+            query["name"] = {"$regex": "^" + re.escape(prefix), "$options": "i"}
+
+        cursor = request.args.get("cursor")
+        if cursor:
+            try:
+                updated_at, last_id = decode_cursor(cursor)
+            except ValueError as e:
+                return jsonify({"message": str(e)}), 400
+            # Keyset: strictly after the last document of the previous page
+            query["$or"] = after_cursor(updated_at, last_id)
+
+        projection = None
+        if request.args.get("content", "" if paged else "true").lower() not in ("1", "true"):
+            projection = {"content": 0}
+
+        docs = db.documents.find(query, projection).sort([("updated_at", -1), ("_id", -1)])
+        if paged:
+            # One extra row tells whether another page follows
+            docs = list(docs.limit(limit + 1))
+            next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+            docs = docs[:limit]
+        else:
+            docs = list(docs)
+
         for d in docs:
             d["_id"] = str(d["_id"])
-            d["created_at"] = d.get("created_at", datetime.utcnow()).isoformat()
-            d["updated_at"] = d.get("updated_at", datetime.utcnow()).isoformat()
+            d["created_at"] = (d.get("created_at") or datetime.utcnow()).isoformat()
+            d["updated_at"] = (d.get("updated_at") or datetime.utcnow()).isoformat()
 
-        return jsonify(docs), 200
+        if not paged:
+            return jsonify(docs), 200
+        return jsonify({"docs": docs, "next_cursor": next_cursor}), 200
     except Exception as e:
         print("❌ get_user_docs error:", e)
         return jsonify({"message": "Server error"}), 500
@@ -120,6 +271,15 @@ def get_single_doc(doc_id):
             return jsonify({"message": "Document not found"}), 404
 
         doc["_id"] = str(doc["_id"])
+        doc.setdefault("version", 0)
+
+        # Autosaves not written yet
+        autosave = get_autosave(db)
+        pending = autosave.pending(user_id, doc_id) if autosave else None
+        if pending:
+            doc["content"] = pending["content"]
+            doc["updated_at"] = pending["updated_at"]
+            doc["version"] = pending["version"]
         return jsonify(doc), 200
     except Exception as e:
         print("❌ get_single_doc error:", e)
@@ -133,31 +293,175 @@ def get_single_doc(doc_id):
 @cross_origin(origins=["https://viadocs.in"], supports_credentials=True)
 @jwt_required()
 def update_doc(doc_id):
+    """
+    Full save: sets the fields present in the body, leaves the rest alone.
+    Content-only saves are buffered and coalesced (utils/autosave.py)
+    unless the body has "save_now": true. With "version", the save only
+    applies to that version (409 otherwise), like PATCH.
+    """
     try:
         db = current_app.db
         user_id = get_jwt_identity()
         data = request.get_json() or {}
-
-        update_data = {
-            "name": data.get("name"),
-            "content": data.get("content"),
-            "favorite": data.get("favorite", False),
-            "updated_at": datetime.utcnow(),
-        }
-
-        result = db.documents.update_one(
-            {"_id": ObjectId(doc_id), "user_id": user_id}, {"$set": update_data}
-        )
+        save_now = bool(data.pop("save_now", False))
+        expected = data.pop("version", None)
+        if expected is not None and (not isinstance(expected, int) or isinstance(expected, bool)):
+            return jsonify({"message": "version must be a number"}), 400
+
+        autosave = get_autosave(db)
+        if autosave and not save_now and set(data) == {"content"}:
+            stored = None
+            if autosave.pending(user_id, doc_id) is None:
+                doc = db.documents.find_one({"_id": ObjectId(doc_id), "user_id": user_id}, {"version": 1})
+                if not doc:
+                    return jsonify({"message": "Document not found"}), 404
+                stored = doc.get("version", 0)
+            try:
+                version = autosave.stage(user_id, doc_id, data["content"], expected, stored)
+            except AutosaveConflict as e:
+                return jsonify({"message": "Document has changed", "version": e.version}), 409
+            invalidate_summary(user_id)
+            return jsonify({"message": "Document updated successfully", "version": version}), 200
+
+        # Anything else goes straight to MongoDB, after the buffered saves
+        if autosave:
+            autosave.flush(user_id, doc_id)
+        if not data:
+            return jsonify({"message": "Document saved"}), 200
+
+        update_data = {"updated_at": datetime.utcnow()}
+        if "name" in data:
+            name = (data.get("name") or "").strip()
+            if not name:
+                return jsonify({"message": "Document name required"}), 400
+            update_data["name"] = name
+        if "content" in data:
+            update_data["content"] = data.get("content")
+        if "favorite" in data:
+            update_data["favorite"] = bool(data.get("favorite"))
+
+        query = {"_id": ObjectId(doc_id), "user_id": user_id}
+        if expected is not None:
+            # Documents saved before versioning have no version field
+            query["version"] = expected if expected else {"$in": [0, None]}
+        result = db.documents.update_one(query, {"$set": update_data, "$inc": {"version": 1}})
 
         if result.matched_count == 0:
+            latest = db.documents.find_one({"_id": ObjectId(doc_id), "user_id": user_id}, {"version": 1})
+            if latest and expected is not None:
+                return jsonify({"message": "Document has changed", "version": latest.get("version", 0)}), 409
             return jsonify({"message": "Document not found"}), 404
 
+        invalidate_summary(user_id)
         return jsonify({"message": "Document updated successfully"}), 200
+    except DuplicateKeyError:
+        return jsonify({"message": "Document name already exists"}), 400
     except Exception as e:
         print("❌ update_doc error:", e)
         return jsonify({"message": "Server error"}), 500
 
 
+# ----------------------------------------------------------
+# PATCH DOCUMENT (delta save)
+# ----------------------------------------------------------
+@docs_bp.route("/my-docs/<doc_id>", methods=["PATCH", "OPTIONS"])
+@cross_origin(origins=["https://viadocs.in"], supports_credentials=True)
+@jwt_required()
+def patch_doc(doc_id):
+    """
+    Incremental save against a known version.
+    Body:
+    - version: the version the client's copy is based on (required)
+    - ops: text delta for content (see utils/text_delta.py),
+      or content: the full text
+    - name, favorite: optional
+    - save_now: true writes through instead of buffering the save
+    A stale version gets 409 with the current version; the client reloads
+    and retries. Returns the new version.
+    """
+    try:
+        db = current_app.db
+        user_id = get_jwt_identity()
+        data = request.get_json() or {}
+        save_now = bool(data.get("save_now", False))
+
+        version = data.get("version")
+        if not isinstance(version, int) or isinstance(version, bool):
+            return jsonify({"message": "version is required"}), 400
+
+        # The latest state may still be in the autosave buffer
+        autosave = get_autosave(db)
+        doc = autosave.pending(user_id, doc_id) if autosave else None
+        if doc is None:
+            doc = db.documents.find_one(
+                {"_id": ObjectId(doc_id), "user_id": user_id}, {"content": 1, "version": 1}
+            )
+        if not doc:
+            return jsonify({"message": "Document not found"}), 404
+
+        current = doc.get("version", 0)
+        if version != current:
+            return jsonify({"message": "Document has changed", "version": current}), 409
+
+        # Only the fields that actually change are written
+        update_data = {}
+        content = doc.get("content") or ""
+        if "ops" in data:
+            try:
+                new_content = apply_delta(content, data["ops"])
+            except ValueError as e:
+                return jsonify({"message": str(e)}), 422
+            if new_content != content:
+                update_data["content"] = new_content
+        elif "content" in data and data["content"] != content:
+            update_data["content"] = data["content"]
+        if "name" in data:
+            name = (data.get("name") or "").strip()
+            if not name:
+                return jsonify({"message": "Document name required"}), 400
+            update_data["name"] = name
+        if "favorite" in data:
+            update_data["favorite"] = bool(data.get("favorite"))
+
+        if not update_data:
+            if save_now and autosave:
+                autosave.flush(user_id, doc_id)
+            return jsonify({"version": current}), 200
+
+        if autosave and not save_now and set(update_data) == {"content"}:
+            # Compare-and-stage: a save that got in since the read wins, this one gets 409
+            try:
+                version = autosave.stage(user_id, doc_id, update_data["content"], version, current)
+            except AutosaveConflict as e:
+                return jsonify({"message": "Document has changed", "version": e.version}), 409
+            invalidate_summary(user_id)
+            return jsonify({"version": version}), 200
+        if autosave:
+            autosave.flush(user_id, doc_id)
+
+        update_data["updated_at"] = datetime.utcnow()
+        # Documents saved before versioning have no version field
+        expected = current if current else {"$in": [0, None]}
+        result = db.documents.update_one(
+            {"_id": ObjectId(doc_id), "user_id": user_id, "version": expected},
+            {"$set": update_data, "$inc": {"version": 1}},
+        )
+        if result.matched_count == 0:
+            # Another save got in between the read and the write
+            latest = db.documents.find_one({"_id": ObjectId(doc_id), "user_id": user_id}, {"version": 1})
+            if not latest:
+                return jsonify({"message": "Document not found"}), 404
+            return jsonify({"message": "Document has changed", "version": latest.get("version", 0)}), 409
+
+        invalidate_summary(user_id)
+        return jsonify({"version": current + 1, "updated_at": update_data["updated_at"].isoformat()}), 200
+    except DuplicateKeyError:
+        return jsonify({"message": "Document name already exists"}), 400
+    except Exception as e:
+        print("❌ patch_doc error:", e)
+        return jsonify({"message": "Server error"}), 500
+
+
 # ----------------------------------------------------------
 # DELETE DOCUMENT
 # ----------------------------------------------------------
@@ -169,10 +473,15 @@ def delete_doc(doc_id):
         db = current_app.db
         user_id = get_jwt_identity()
 
+        autosave = get_autosave(db)
+        if autosave:
+            autosave.discard(user_id, doc_id)
+
         result = db.documents.delete_one({"_id": ObjectId(doc_id), "user_id": user_id})
         if result.deleted_count == 0:
             return jsonify({"message": "Document not found"}), 404
 
+        invalidate_summary(user_id)
         return jsonify({"message": "Document deleted"}), 200
     except Exception as e:
         print("❌ delete_doc error:", e)
@@ -199,6 +508,7 @@ def toggle_favorite(doc_id):
             {"_id": ObjectId(doc_id), "user_id": user_id},
             {"$set": {"favorite": new_status, "updated_at": datetime.utcnow()}},
         )
+        invalidate_summary(user_id)
 
         return jsonify({"favorite": new_status}), 200
     except Exception as e:
@@ -263,37 +573,42 @@ def upload_image():
 @cross_origin(origins=["https://viadocs.in"], supports_credentials=True)
 @jwt_required()
 def home_summary():
+    """
+    Counts plus the latest and favourite documents for the home page.
+    Every query is bounded by an index: the counts are index-only
+    (user_id, and user_id + favorite) and each list reads at most
+    SUMMARY_LIST_SIZE documents along the updated_at order, without content.
+    """
     try:
         db = current_app.db
         user_id = get_jwt_identity()
 
-        total_docs = db.documents.count_documents({"user_id": user_id})
-        favorite_count = db.documents.count_documents({"user_id": user_id, "favorite": True})
-
-        recent_docs = list(
-            db.documents.find({"user_id": user_id})
-            .sort("updated_at", -1)
-            .limit(5)
-        )
-        for doc in recent_docs:
-            doc["_id"] = str(doc["_id"])
-            doc["updated_at"] = doc.get("updated_at", datetime.utcnow()).isoformat()
-
-        favorite_docs = list(
-            db.documents.find({"user_id": user_id, "favorite": True})
-            .sort("updated_at", -1)
-            .limit(5)
-        )
-        for f in favorite_docs:
-            f["_id"] = str(f["_id"])
-            f["updated_at"] = f.get("updated_at", datetime.utcnow()).isoformat()
-
-        return jsonify({
-            "total_docs": total_docs,
-            "favorite_count": favorite_count,
-            "recent_docs": recent_docs,
-            "favorite_docs": favorite_docs,
-        }), 200
+        summary = cached_summary(user_id)
+        if summary is not None:
+            return jsonify(summary), 200
+
+        autosave = get_autosave(db)
+        if autosave:
+            autosave.flush(user_id)
+
+        mine = {"user_id": user_id}
+        favorites = {"user_id": user_id, "favorite": True}
+        newest = [("updated_at", -1), ("_id", -1)]
+
+        summary = {
+            "total_docs": db.documents.count_documents(mine),
+            "favorite_count": db.documents.count_documents(favorites),
+            "recent_docs": [
+                summary_doc(d)
+                for d in db.documents.find(mine, SUMMARY_FIELDS).sort(newest).limit(SUMMARY_LIST_SIZE)
+            ],
+            "favorite_docs": [
+                summary_doc(d)
+                for d in db.documents.find(favorites, SUMMARY_FIELDS).sort(newest).limit(SUMMARY_LIST_SIZE)
+            ],
+        }
+        store_summary(user_id, summary)
+        return jsonify(summary), 200
     except Exception as e:
         print("❌ home_summary error:", e)
         return jsonify({"message": "Server error"}), 500
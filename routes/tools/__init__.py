@@ -1,8 +1,12 @@
 from flask import Blueprint
+from utils.upload_ingest import ingest_uploads
 
 # ✅ Create master blueprint for all tools
 tools_bp = Blueprint("tools_bp", __name__)
 
+# ✅ Receive uploads (per-tool size limit, type check) before any tool runs
+tools_bp.before_request(ingest_uploads)
+
 # ✅ Import individual tool blueprints
 from routes.tools.pdf_to_word_routes import pdf_to_word_bp
 from routes.tools.word_to_pdf_routes import word_to_pdf_bp
@@ -15,6 +19,10 @@ from routes.tools.pdf_to_image_routes import pdf_to_image_bp
 from routes.tools.image_to_pdf_routes import image_to_pdf_bp
 from routes.tools.password_protect_routes import password_protect_bp
 from routes.tools.unlock_pdf_routes import unlock_pdf_bp
+from routes.tools.cache_routes import cache_bp
+from routes.tools.jobs_routes import jobs_bp
+from routes.tools.upload_routes import upload_bp
+from routes.tools.office_batch_routes import office_batch_bp
 
 # ✅ Register all sub-blueprints with URL prefixes
 tools_bp.register_blueprint(pdf_to_word_bp, url_prefix="/pdf-to-word")
@@ -28,3 +36,7 @@ tools_bp.register_blueprint(pdf_to_image_bp, url_prefix="/pdf-to-image")
 tools_bp.register_blueprint(image_to_pdf_bp, url_prefix="/image-to-pdf")
 tools_bp.register_blueprint(password_protect_bp, url_prefix="/password-protect")
 tools_bp.register_blueprint(unlock_pdf_bp, url_prefix="/unlock-pdf")
+tools_bp.register_blueprint(cache_bp, url_prefix="/cache")
+tools_bp.register_blueprint(jobs_bp, url_prefix="/jobs")
+tools_bp.register_blueprint(upload_bp, url_prefix="/upload")
+tools_bp.register_blueprint(office_batch_bp, url_prefix="/office-to-pdf/batch")
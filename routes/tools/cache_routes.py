@@ -0,0 +1,17 @@
+from flask import Blueprint, jsonify
+from utils.result_cache import get_cache
+
+# Blueprint for the shared tool result cache
+cache_bp = Blueprint("cache_bp", __name__)
+
+
+@cache_bp.route("/stats", methods=["GET"])
+def cache_stats():
+    """
+    Hit / miss counters and size of the tool result cache (this worker).
+    """
+    try:
+        return jsonify(get_cache().stats()), 200
+    except Exception as e:
+        print("❌ Cache stats error:", e)
+        return jsonify({"error": str(e)}), 500
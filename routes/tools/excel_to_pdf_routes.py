@@ -1,72 +1,88 @@
 import os
-import subprocess
-import tempfile
-import shutil
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, jsonify
+from utils.libreoffice_convert import libreoffice_convert
+from utils.libreoffice_pool import LibreOfficeError
+from utils.excel_pdf import classify_workbook, excel_to_pdf, NativeExcelUnsupported
+from utils.result_cache import cache_lookup, send_cached
+from utils.upload_handles import get_upload
+from utils.job_queue import run_tool
+from utils.workspace import new_workspace
 
 # Create blueprint for Excel → PDF
 excel_to_pdf_bp = Blueprint("excel_to_pdf_bp", __name__)
 
-# Folder for converted PDFs
-UPLOAD_FOLDER = os.path.join(os.getcwd(), "uploads", "excel-to-pdf")
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+
+def convert_excel_file(excel_path):
+    """
+    Convert one saved Excel file to PDF; returns a tool result dict.
+    Plain tabular workbooks are drawn natively, the rest go to LibreOffice.
+    """
+    native, reason = classify_workbook(excel_path)
+    if native:
+        pdf_path = os.path.splitext(excel_path)[0] + ".pdf"
+        try:
+            pages = excel_to_pdf(excel_path, pdf_path)
+            print(f"✅ Rendered {os.path.basename(excel_path)} natively ({pages} pages)")
+            return {
+                "path": pdf_path,
+                "download_name": os.path.basename(pdf_path),
+                "mimetype": "application/pdf",
+                "headers": {"x-excel-renderer": "native"},
+            }
+        except NativeExcelUnsupported as e:
+            reason = str(e)
+        except Exception as e:
+            print("⚠️ Native Excel rendering failed:", e)
+            reason = "native renderer error"
+
+    print(f"ℹ️ Using LibreOffice for {os.path.basename(excel_path)}: {reason}")
+
+    # Convert on a warm pooled LibreOffice instance, next to the input
+    pdf_path = libreoffice_convert(excel_path, os.path.dirname(excel_path), "pdf")
+    pdf_filename = os.path.basename(pdf_path)
+
+    print(f"✅ Converted {os.path.basename(excel_path)} → {pdf_filename}")
+    return {
+        "path": pdf_path,
+        "download_name": pdf_filename,
+        "mimetype": "application/pdf",
+        "headers": {"x-excel-renderer": "libreoffice"},
+    }
 
 
 @excel_to_pdf_bp.route("", methods=["POST"])
 def convert_excel_to_pdf():
     """
-    Convert Excel (.xls / .xlsx) files to PDF using LibreOffice (headless mode).
+    Convert Excel (.xls / .xlsx) files to PDF: simple sheets natively,
+    everything else with LibreOffice (headless mode).
     """
-    if "file" not in request.files:
+    file = get_upload("file")
+    if file is None:
         return jsonify({"error": "No file uploaded"}), 400
 
-    file = request.files["file"]
-
-    if file.filename == "":
-        return jsonify({"error": "No file selected"}), 400
-
     if not file.filename.lower().endswith((".xls", ".xlsx")):
         return jsonify({"error": "Invalid file type. Please upload .xls or .xlsx"}), 400
 
+    # Serve repeat uploads straight from the result cache
+    cache_key, cached = cache_lookup("excel-to-pdf", [file])
+    if cached:
+        return send_cached(cached, os.path.splitext(file.filename)[0] + ".pdf")
+
     # Save uploaded file temporarily
-    temp_dir = tempfile.mkdtemp()
-    excel_path = os.path.join(temp_dir, file.filename)
+    temp_dir = new_workspace("excel-to-pdf-")
+    excel_path = os.path.join(temp_dir, os.path.basename(file.filename))
     file.save(excel_path)
 
     try:
-        # Use LibreOffice to convert Excel → PDF
-        subprocess.run(
-            [
-                "soffice",
-                "--headless",
-                "--convert-to",
-                "pdf",
-                "--outdir",
-                UPLOAD_FOLDER,
-                excel_path,
-            ],
-            check=True,
-        )
-
-        # Generate output path
-        base_name = os.path.splitext(file.filename)[0]
-        pdf_filename = f"{base_name}.pdf"
-        pdf_path = os.path.join(UPLOAD_FOLDER, pdf_filename)
-
-        if not os.path.exists(pdf_path):
-            raise FileNotFoundError("Conversion failed: PDF not found")
-
-        print(f"✅ Converted {file.filename} → {pdf_filename}")
-
-        # Send file to frontend for download
-        return send_file(
-            pdf_path,
-            as_attachment=True,
-            download_name=pdf_filename,
-            mimetype="application/pdf",
+        return run_tool(
+            "excel-to-pdf",
+            convert_excel_file,
+            {"excel_path": excel_path},
+            cache_key=cache_key,
+            cleanup=[temp_dir],
         )
 
-    except subprocess.CalledProcessError as e:
+    except LibreOfficeError as e:
         print("❌ LibreOffice conversion failed:", e)
         return jsonify({"error": "LibreOffice conversion failed"}), 500
 
@@ -74,5 +90,3 @@ def convert_excel_to_pdf():
         print("❌ Conversion Error:", str(e))
         return jsonify({"error": str(e)}), 500
 
-    finally:
-        shutil.rmtree(temp_dir, ignore_errors=True)
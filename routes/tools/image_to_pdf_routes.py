@@ -1,72 +1,73 @@
 import os
-import io
-from flask import Blueprint, request, send_file, jsonify
+from flask import Blueprint, request, jsonify
 from werkzeug.utils import secure_filename
-from PIL import Image
+from utils.result_cache import cache_lookup, send_cached
+from utils.upload_handles import get_uploads
+from utils.job_queue import run_tool, report_progress
+from utils.image_pdf import PAGE_SIZES, images_to_pdf
+from utils.workspace import new_workspace
 
 # --- Create blueprint for Image → PDF ---
 image_to_pdf_bp = Blueprint("image_to_pdf_bp", __name__)
 
-# --- Upload folder setup ---
-UPLOAD_FOLDER = os.path.join(os.getcwd(), "uploads", "image-to-pdf")
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+
+def build_image_pdf(image_paths, work_dir, page_size="image"):
+    """
+    Combine saved images (in order) into one PDF; returns a tool result dict.
+    JPEGs are embedded untouched, other formats decoded in a process pool.
+    """
+    # ✅ Write pages one by one straight to disk
+    pdf_path = os.path.join(work_dir, "images.pdf")
+    passthrough = images_to_pdf(image_paths, pdf_path, page_size=page_size, progress=report_progress)
+
+    print(f"✅ Image to PDF: {len(image_paths)} page(s), {passthrough} JPEG(s) passed through")
+    return {"path": pdf_path, "download_name": "images.pdf", "mimetype": "application/pdf"}
 
 
 @image_to_pdf_bp.route("", methods=["POST"])
 def image_to_pdf():
     """
     Convert multiple uploaded images into a single PDF file.
+    Accepts:
+    - images (one or more files, in page order) or handles from /api/tools/upload
+    - page_size (image, a4, letter; default image = page matches each image)
     """
     try:
-        # ✅ Check for uploaded images
-        if "images" not in request.files:
+        # ✅ Check for uploaded images (or stored handles)
+        valid_files = get_uploads("images")
+        if not valid_files:
             return jsonify({"error": "No images uploaded"}), 400
 
-        files = request.files.getlist("images")
-        if not files or len(files) == 0:
-            return jsonify({"error": "No valid images found"}), 400
-
-        image_list = []
-        first_image = None
+        page_size = request.form.get("page_size", "image").lower()
+        if page_size not in PAGE_SIZES:
+            return jsonify({"error": f"page_size must be one of {', '.join(PAGE_SIZES)}"}), 400
 
-        for idx, img_file in enumerate(files):
-            if img_file and img_file.filename:
-                filename = secure_filename(img_file.filename)
-                img_path = os.path.join(UPLOAD_FOLDER, filename)
-                img_file.save(img_path)
+        # ✅ Serve repeat uploads straight from the result cache (order matters)
+        cache_key, cached = cache_lookup("image-to-pdf", valid_files, {"page_size": page_size})
+        if cached:
+            return send_cached(cached)
 
-                # ✅ Open using Pillow and convert to RGB
-                img = Image.open(img_path)
-                rgb_img = img.convert("RGB")
+        # ✅ Save inputs (index prefix keeps duplicate names apart)
+        work_dir = new_workspace("image-to-pdf-")
+        image_paths = []
+        for idx, img_file in enumerate(valid_files):
+            filename = secure_filename(img_file.filename)
+            img_path = os.path.join(work_dir, f"{idx:04d}_{filename}")
+            img_file.save(img_path)
+            image_paths.append(img_path)
 
-                if idx == 0:
-                    first_image = rgb_img
-                else:
-                    image_list.append(rgb_img)
-
-        if not first_image:
-            return jsonify({"error": "No valid images to process"}), 400
-
-        # ✅ Save all images into a single PDF (in memory)
-        pdf_buffer = io.BytesIO()
-        first_image.save(pdf_buffer, format="PDF", save_all=True, append_images=image_list)
-        pdf_buffer.seek(0)
-
-        # ✅ Optional cleanup
-        for f in os.listdir(UPLOAD_FOLDER):
-            try:
-                os.remove(os.path.join(UPLOAD_FOLDER, f))
-            except:
-                pass
-
-        # ✅ Send generated PDF to frontend
-        return send_file(
-            pdf_buffer,
-            mimetype="application/pdf",
-            as_attachment=True,
-            download_name="images.pdf"
+        # ✅ Send generated PDF to frontend (or queue it)
+        return run_tool(
+            "image-to-pdf",
+            build_image_pdf,
+            {"image_paths": image_paths, "work_dir": work_dir, "page_size": page_size},
+            cache_key=cache_key,
+            cleanup=[work_dir],
         )
 
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     except Exception as e:
         print(f"[ERROR] Image to PDF conversion failed: {e}")
         return jsonify({"error": "Failed to convert images to PDF", "details": str(e)}), 500
@@ -0,0 +1,50 @@
+from flask import Blueprint, jsonify, send_file
+from utils.job_queue import get_job_queue, job_status
+
+# Blueprint for polling async tool jobs
+jobs_bp = Blueprint("jobs_bp", __name__)
+
+
+@jobs_bp.route("/<job_id>", methods=["GET"])
+def get_job(job_id):
+    """
+    Status of a queued tool conversion.
+    """
+    try:
+        job = get_job_queue().get(job_id)
+        if not job:
+            return jsonify({"error": "Job not found"}), 404
+
+        return jsonify(job_status(job)), 200
+    except Exception as e:
+        print("❌ Job status error:", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@jobs_bp.route("/<job_id>/result", methods=["GET"])
+def get_job_result(job_id):
+    """
+    Download the output of a finished tool conversion.
+    """
+    try:
+        job = get_job_queue().get(job_id)
+        if not job:
+            return jsonify({"error": "Job not found"}), 404
+
+        if job["status"] == "failed":
+            return jsonify({"error": job.get("error") or "Conversion failed"}), 500
+        if job["status"] != "done":
+            return jsonify({"error": "Job is not finished yet", "status": job["status"]}), 409
+
+        response = send_file(
+            get_job_queue().store.open_result(job),
+            as_attachment=True,
+            download_name=job["download_name"],
+            mimetype=job["mimetype"],
+        )
+        for name, value in (job.get("headers") or {}).items():
+            response.headers[name] = value
+        return response
+    except Exception as e:
+        print("❌ Job result error:", e)
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,228 @@
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import Blueprint, request, jsonify
+from utils.libreoffice_pool import POOL_SIZE
+from utils.result_cache import cache_lookup, cache_store
+from utils.upload_handles import UploadHandleError, get_uploads
+from utils.job_queue import run_tool, report_progress, wants_async
+from utils.pdf_backend import get_backend, merge_incremental
+from utils.zip_stream import write_zip, zip_response
+from utils.workspace import new_workspace
+from routes.tools.word_to_pdf_routes import convert_word_file
+from routes.tools.powerpoint_to_pdf_routes import convert_ppt_file
+from routes.tools.excel_to_pdf_routes import convert_excel_file
+
+# Create blueprint for batch Office → PDF
+office_batch_bp = Blueprint("office_batch_bp", __name__)
+
+BATCH_MAX_FILES = int(os.getenv("OFFICE_BATCH_MAX_FILES", "50"))
+# Parallel conversions; beyond the LibreOffice pool size they would only queue
+BATCH_WORKERS = int(os.getenv("OFFICE_BATCH_WORKERS", str(POOL_SIZE)))
+
+# extension → (single-file tool, converter); the tool name shares its result cache
+BATCH_CONVERTERS = {
+    ".doc": ("word-to-pdf", convert_word_file),
+    ".docx": ("word-to-pdf", convert_word_file),
+    ".ppt": ("ppt-to-pdf", convert_ppt_file),
+    ".pptx": ("ppt-to-pdf", convert_ppt_file),
+    ".xls": ("excel-to-pdf", convert_excel_file),
+    ".xlsx": ("excel-to-pdf", convert_excel_file),
+}
+
+SPOOL_BUFFER = 1024 * 1024
+MAX_ERROR_LENGTH = 200
+# Proxies reject large response headers; the merged PDF has no report.json
+ERROR_HEADER_BYTES = 1024
+
+
+def _pdf_name(filename, taken):
+    """Output name for `filename`, numbered when another file already took it."""
+    stem = os.path.splitext(os.path.basename(filename))[0] or "document"
+    name, n = f"{stem}.pdf", 1
+    while name in taken:
+        n += 1
+        name = f"{stem} ({n}).pdf"
+    taken.add(name)
+    return name
+
+
+def _convert_one(item, work_dir):
+    """Convert one batch item to `work_dir`; returns the PDF path."""
+    if item["cached"] is not None:
+        pdf_path = os.path.join(work_dir, f"{item['index']:03d}.pdf")
+        shutil.copyfile(item["cached"]["path"], pdf_path)
+        return pdf_path
+
+    _, converter = BATCH_CONVERTERS[item["ext"]]
+    result = converter(item["path"])
+    cache_store(
+        item["cache_key"], result["path"], result["download_name"],
+        result["mimetype"], result.get("headers"),
+    )
+    return result["path"]
+
+
+def converted_files(items, work_dir):
+    """
+    Convert every item on the warm LibreOffice pool in parallel.
+    Yields (item, pdf_path, error) as conversions finish.
+    """
+    executor = ThreadPoolExecutor(max_workers=max(1, BATCH_WORKERS))
+    try:
+        futures = {executor.submit(_convert_one, item, work_dir): item for item in items}
+        for done, future in enumerate(as_completed(futures), start=1):
+            item = futures[future]
+            try:
+                yield item, future.result(), None
+            except Exception as e:
+                print(f"❌ Batch conversion failed for {item['filename']}: {e}")
+                yield item, None, str(e)[:MAX_ERROR_LENGTH]
+            report_progress(done, len(items))
+    finally:
+        # Client gone or generator closed early: drop what has not started
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _report_entry(item, error):
+    entry = {"file": item["filename"], "status": "error" if error else "ok"}
+    if error:
+        entry["error"] = error
+    else:
+        entry["output"] = item["output"]
+    return entry
+
+
+def batch_zip_entries(items, work_dir):
+    """ZIP entries: each PDF as soon as it is converted, then report.json."""
+    report = {}
+    for item, pdf_path, error in converted_files(items, work_dir):
+        report[item["index"]] = _report_entry(item, error)
+        if pdf_path is not None:
+            yield item["output"], pdf_path
+
+    files = [report[index] for index in sorted(report)]
+    yield "report.json", json.dumps({"files": files}, indent=2).encode()
+
+
+def _error_header(errors):
+    """
+    As many of `errors` as fit in ERROR_HEADER_BYTES of JSON (ASCII-escaped,
+    so the header stays latin-1). x-batch-failed carries the full count.
+    """
+    kept = []
+    for error in errors:
+        if len(json.dumps(kept + [error])) > ERROR_HEADER_BYTES:
+            break
+        kept.append(error)
+    return json.dumps(kept)
+
+
+def convert_batch(items, work_dir, output="zip"):
+    """
+    Convert a saved batch to one ZIP or one merged PDF; returns a tool result dict.
+    Failed files are listed in the report instead of failing the batch.
+    """
+    if output == "zip":
+        zip_path = os.path.join(work_dir, "converted.zip")
+        write_zip(batch_zip_entries(items, work_dir), zip_path)
+        print(f"✅ Batch converted {len(items)} files to ZIP")
+        return {"path": zip_path, "download_name": "converted.zip", "mimetype": "application/zip"}
+
+    pdf_paths, errors = {}, []
+    for item, pdf_path, error in converted_files(items, work_dir):
+        if error:
+            errors.append({"file": item["filename"], "error": error})
+        else:
+            pdf_paths[item["index"]] = pdf_path
+
+    if not pdf_paths:
+        raise ValueError("None of the files could be converted: " + json.dumps(errors))
+
+    # Merge in upload order, not completion order
+    merged_path = os.path.join(work_dir, "merged.pdf")
+    ordered = [pdf_paths[index] for index in sorted(pdf_paths)]
+    if len(ordered) == 1:
+        shutil.copyfile(ordered[0], merged_path)
+    else:
+        merge_incremental(get_backend(), ordered, merged_path, work_dir)
+    print(f"✅ Batch merged {len(ordered)} of {len(items)} files")
+
+    return {
+        "path": merged_path,
+        "download_name": "merged.pdf",
+        "mimetype": "application/pdf",
+        "headers": {
+            "x-batch-converted": str(len(ordered)),
+            "x-batch-failed": str(len(errors)),
+            "x-batch-errors": _error_header(errors),
+        },
+    }
+
+
+@office_batch_bp.route("", methods=["POST"])
+def convert_office_batch():
+    """
+    Convert many Word / PowerPoint / Excel files to PDF in one request.
+    Accepts:
+    - files (repeated) or handles (from /api/tools/upload)
+    - output: "zip" (default; one PDF per file plus report.json, streamed
+      as files finish) or "merged" (one PDF in upload order)
+    A file that fails to convert is reported, the rest are still returned.
+    """
+    try:
+        uploaded_files = get_uploads("files")
+        if not uploaded_files:
+            return jsonify({"error": "No files uploaded"}), 400
+        if len(uploaded_files) > BATCH_MAX_FILES:
+            return jsonify({"error": f"At most {BATCH_MAX_FILES} files per batch"}), 400
+
+        output = request.form.get("output", "zip").lower()
+        if output not in ("zip", "merged"):
+            return jsonify({"error": "output must be zip or merged"}), 400
+
+        for file in uploaded_files:
+            if os.path.splitext(file.filename.lower())[1] not in BATCH_CONVERTERS:
+                return jsonify({"error": f"Unsupported file type: {file.filename}"}), 400
+
+        # Save inputs (index prefix keeps duplicate names apart); files
+        # converted before by the single-file tools come from their cache
+        work_dir = new_workspace("office-batch-")
+        items, taken = [], set()
+        for index, file in enumerate(uploaded_files):
+            ext = os.path.splitext(file.filename.lower())[1]
+            cache_key, cached = cache_lookup(BATCH_CONVERTERS[ext][0], [file])
+            path = os.path.join(work_dir, f"{index:03d}_{os.path.basename(file.filename)}")
+            if cached is None:
+                file.save(path, buffer_size=SPOOL_BUFFER)
+            items.append({
+                "index": index,
+                "filename": file.filename,
+                "ext": ext,
+                "path": path,
+                "output": _pdf_name(file.filename, taken),
+                "cache_key": cache_key,
+                "cached": cached,
+            })
+
+        if output == "zip" and not wants_async():
+            # Stream each PDF to the client as soon as it is converted
+            return zip_response(batch_zip_entries(items, work_dir), "converted.zip", cleanup=[work_dir])
+
+        return run_tool(
+            "office-batch",
+            convert_batch,
+            {"items": items, "work_dir": work_dir, "output": output},
+            cleanup=[work_dir],
+        )
+
+    except UploadHandleError as e:
+        return jsonify({"error": str(e)}), 410
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 422
+
+    except Exception as e:
+        print("❌ Batch Conversion Error:", str(e))
+        return jsonify({"error": str(e)}), 500
@@ -1,44 +1,43 @@
 import os
 from flask import Blueprint, request, jsonify, send_file
 import pikepdf
+from utils.upload_handles import get_upload, upload_pdf_info
+from utils.job_queue import cleanup_paths, cleanup_after
+from utils.workspace import new_workspace
 
 # ✅ Blueprint
 password_protect_bp = Blueprint("password_protect_bp", __name__)
 
-# ✅ Upload folder
-UPLOAD_FOLDER = os.path.join(os.getcwd(), "uploads", "password-protect")
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+
+def protect_check_body(locked):
+    if locked:
+        return {"locked": True, "message": "This PDF is already password-protected."}
+    return {"locked": False, "message": "This PDF is unlocked and can be protected."}
+
 
 # ✅ Check if PDF is password-protected
 @password_protect_bp.route("/check", methods=["POST"])
 def check_lock_status():
     """
     Check whether the uploaded PDF is locked or unlocked.
+    Accepts 'pdfFile' or a 'handle' from /api/tools/upload.
     """
-    if "pdfFile" not in request.files:
+    pdf_file = get_upload("pdfFile")
+    if pdf_file is None:
         return jsonify({"message": "No PDF uploaded"}), 400
 
-    pdf_file = request.files["pdfFile"]
-    temp_path = os.path.join(UPLOAD_FOLDER, pdf_file.filename)
-    pdf_file.save(temp_path)
-
+    # Header-only inspection: handles are cached, uploads sniffed in place
     try:
-        with pikepdf.open(temp_path):
-            return jsonify({
-                "locked": False,
-                "message": "This PDF is unlocked and can be protected."
-            }), 200
-    except pikepdf.PasswordError:
-        return jsonify({
-            "locked": True,
-            "message": "This PDF is already password-protected."
-        }), 200
+        info = upload_pdf_info(pdf_file)
     except Exception as e:
         print(f"❌ PDF Check Error: {e}")
         return jsonify({"message": f"Error reading PDF: {str(e)}"}), 500
-    finally:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+
+    return jsonify({
+        **protect_check_body(info["needs_password"]),
+        "pages": info["pages"],
+        "encryption": info.get("encryption"),
+    }), 200
 
 
 # ✅ Set password protection on an unlocked PDF
@@ -46,16 +45,20 @@ def check_lock_status():
 def password_protect():
     """
     Protect an unlocked PDF with a new password.
+    Accepts 'pdf' or a 'handle' from /api/tools/upload, plus 'password'.
     """
-    if "pdf" not in request.files or "password" not in request.form:
+    pdf_file = get_upload("pdf")
+    if pdf_file is None or "password" not in request.form:
         return jsonify({"message": "Missing file or password"}), 400
 
-    pdf_file = request.files["pdf"]
     password = request.form["password"]
 
-    temp_input = os.path.join(UPLOAD_FOLDER, pdf_file.filename)
-    output_path = os.path.join(UPLOAD_FOLDER, f"protected_{pdf_file.filename}")
+    # Per-request workspace, removed once the response has been sent
+    work_dir = new_workspace("password-protect-")
+    temp_input = os.path.join(work_dir, "input.pdf")
+    output_path = os.path.join(work_dir, "output.pdf")
     pdf_file.save(temp_input)
+    sent = False
 
     try:
         with pikepdf.open(temp_input) as pdf:
@@ -64,17 +67,19 @@ def password_protect():
                 encryption=pikepdf.Encryption(owner=password, user=password, R=4)
             )
 
-        return send_file(
+        response = send_file(
             output_path,
             as_attachment=True,
             download_name=f"protected_{pdf_file.filename}",
             mimetype="application/pdf",
         )
+        sent = True
+        return cleanup_after(response, [work_dir])
     except pikepdf.PasswordError:
         return jsonify({"message": "This PDF is already protected."}), 400
     except Exception as e:
         print(f"❌ PDF Protect Error: {e}")
         return jsonify({"message": f"Error protecting PDF: {str(e)}"}), 500
     finally:
-        if os.path.exists(temp_input):
-            os.remove(temp_input)
+        if not sent:
+            cleanup_paths([work_dir])
@@ -1,27 +1,158 @@
 import os
 import subprocess
-from flask import Blueprint, request, send_file, jsonify
+from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
 from werkzeug.utils import secure_filename
+from utils.result_cache import cache_lookup, send_cached
+from utils.upload_handles import UploadHandleError, get_upload
+from utils.job_queue import run_tool, report_progress, cleanup_paths
+from utils.pdf_compress import (
+    ghostscript_executable,
+    run_ghostscript,
+    compress_parallel,
+    estimate_sizes,
+    pick_setting_for_target,
+    optimize_lossless,
+)
+from utils.pdf_images import recompress_images
+from utils.workspace import new_workspace
 
 # ===========================================
 #  PDF Compressor Blueprint
 # ===========================================
 pdf_compress_bp = Blueprint("pdf_compress_bp", __name__)
 
-# Folder to store temporary files
-UPLOAD_FOLDER = os.path.join(os.getcwd(), "uploads", "pdf-compress")
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+# Image mode: target resolution and JPEG quality bounds
+IMAGE_DPI_RANGE = (36, 600)
+IMAGE_QUALITY_RANGE = (10, 95)
+
+# Compression presets, highest quality first
+SETTINGS_MAP = {
+    "low": "/printer",         # high quality → least compression
+    "recommended": "/ebook",   # good quality → recommended
+    "extreme": "/screen",      # lowest quality → smallest file
+}
+
+
+def compress_file(input_path, output_path, pdf_setting, parallel=False, target_mb=None):
+    """
+    Compress one saved PDF with Ghostscript; returns a tool result dict
+    carrying the size headers. `parallel` compresses page chunks concurrently.
+    With `target_mb` the preset is picked from sampled size estimates so a
+    single full pass lands under the target where possible.
+    """
+    print("USING GHOSTSCRIPT:", ghostscript_executable())
+
+    headers = {}
+    if target_mb is not None:
+        pdf_setting, estimates = pick_setting_for_target(
+            input_path, target_mb * 1024 * 1024, list(SETTINGS_MAP.values())
+        )
+        print(f"🎯 Target {target_mb:.2f}MB → using {pdf_setting} (estimates: {estimates})")
+        headers["x-target-mb"] = f"{target_mb:.2f}"
+
+    # --------------------------
+    # Run Ghostscript
+    # --------------------------
+    if parallel:
+        compress_parallel(input_path, output_path, pdf_setting)
+    else:
+        run_ghostscript(input_path, output_path, pdf_setting)
+
+    # --------------------------
+    # File size calculation
+    # --------------------------
+    original_size = os.path.getsize(input_path) / (1024 * 1024)
+    compressed_size = os.path.getsize(output_path) / (1024 * 1024)
+
+    print(f"✅ Compression success: {original_size:.2f}MB → {compressed_size:.2f}MB")
+
+    headers["x-original-size-mb"] = f"{original_size:.2f}"
+    headers["x-compressed-size-mb"] = f"{compressed_size:.2f}"
+    if target_mb is not None:
+        mode = next(m for m, v in SETTINGS_MAP.items() if v == pdf_setting)
+        headers["x-compression-mode"] = mode
+        headers["x-target-met"] = "true" if compressed_size <= target_mb else "false"
+
+    return {
+        "path": output_path,
+        "download_name": os.path.basename(output_path),
+        "mimetype": "application/pdf",
+        "headers": headers,
+    }
+
+
+def compress_lossless_file(input_path, output_path, linearize=False):
+    """
+    Lossless structural optimization with pikepdf (no Ghostscript);
+    returns a tool result dict carrying the size headers.
+    """
+    stats = optimize_lossless(input_path, output_path, linearize=linearize)
+
+    original_size = os.path.getsize(input_path) / (1024 * 1024)
+    compressed_size = os.path.getsize(output_path) / (1024 * 1024)
+    print(
+        f"✅ Lossless optimization: {original_size:.2f}MB → {compressed_size:.2f}MB "
+        f"({stats['images_folded']} images, {stats['fonts_folded']} fonts folded)"
+    )
+
+    return {
+        "path": output_path,
+        "download_name": os.path.basename(output_path),
+        "mimetype": "application/pdf",
+        "headers": {
+            "x-original-size-mb": f"{original_size:.2f}",
+            "x-compressed-size-mb": f"{compressed_size:.2f}",
+            "x-compression-mode": "lossless",
+            "x-images-deduplicated": str(stats["images_folded"]),
+            "x-fonts-deduplicated": str(stats["fonts_folded"]),
+            "x-linearized": "true" if linearize else "false",
+        },
+    }
+
+
+def compress_images_file(input_path, output_path, target_dpi=150, quality=75):
+    """
+    Per-image downsampling / re-encoding (text and vectors untouched);
+    returns a tool result dict carrying the size and image headers.
+    """
+    stats = recompress_images(input_path, output_path, target_dpi, quality, progress=report_progress)
+
+    original_size = os.path.getsize(input_path) / (1024 * 1024)
+    compressed_size = os.path.getsize(output_path) / (1024 * 1024)
+    print(
+        f"✅ Image recompression: {original_size:.2f}MB → {compressed_size:.2f}MB "
+        f"({stats['recompressed']}/{stats['images']} images, {stats['bytes_saved']} bytes saved)"
+    )
+
+    return {
+        "path": output_path,
+        "download_name": os.path.basename(output_path),
+        "mimetype": "application/pdf",
+        "headers": {
+            "x-original-size-mb": f"{original_size:.2f}",
+            "x-compressed-size-mb": f"{compressed_size:.2f}",
+            "x-compression-mode": "images",
+            "x-images-total": str(stats["images"]),
+            "x-images-recompressed": str(stats["recompressed"]),
+            "x-image-bytes-saved": str(stats["bytes_saved"]),
+        },
+    }
 
 
 @pdf_compress_bp.route("", methods=["POST", "OPTIONS"])
 @jwt_required(optional=True)
 def compress_pdf():
     """
-    Compress a PDF using Ghostscript.
+    Compress a PDF using Ghostscript (or pikepdf for mode=lossless).
     Accepts:
-    - file (PDF)
-    - mode (extreme, recommended, low)
+    - file (PDF) or handle (from /api/tools/upload)
+    - mode (extreme, recommended, low, target, lossless, images)
+    - target_mb (with mode=target, pick the best preset that fits this size)
+    - linearize (mode=lossless, "true" for fast web view output)
+    - dpi / quality (mode=images, target resolution and JPEG quality; default 150 / 75)
+    - parallel (optional, "true" compresses page chunks on all cores)
+    - async (optional, queue the job and poll /api/tools/jobs/<id>)
     """
 
     # Handle CORS preflight
@@ -32,89 +163,125 @@ def compress_pdf():
         # --------------------------
         # Validate file input
         # --------------------------
-        if "file" not in request.files:
+        file = get_upload("file")
+        if file is None:
             return jsonify({"error": "No file uploaded"}), 400
 
-        file = request.files["file"]
-        if not file or file.filename == "":
-            return jsonify({"error": "No file selected"}), 400
-
         filename = secure_filename(file.filename)
 
         if not filename.lower().endswith(".pdf"):
             return jsonify({"error": "Only PDF files are supported"}), 400
 
-        # Save uploaded PDF
-        input_path = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(input_path)
-
         # --------------------------
         # Select compression mode
         # --------------------------
         mode = request.form.get("mode", "recommended").lower()
-        settings_map = {
-            "extreme": "/screen",      # lowest quality → smallest file
-            "recommended": "/ebook",   # good quality → recommended
-            "low": "/printer"          # high quality → least compression
-        }
-        pdf_setting = settings_map.get(mode, "/ebook")
+        pdf_setting = SETTINGS_MAP.get(mode, "/ebook")
+        parallel = request.form.get("parallel", "false").lower() in ("1", "true", "yes")
+
+        target_mb = None
+        if mode == "target" or request.form.get("target_mb"):
+            try:
+                target_mb = float(request.form.get("target_mb", ""))
+            except ValueError:
+                return jsonify({"error": "target_mb must be a number"}), 400
+            if target_mb <= 0:
+                return jsonify({"error": "target_mb must be positive"}), 400
 
         # Output file path
         output_filename = f"compressed_{filename}"
-        output_path = os.path.join(UPLOAD_FOLDER, output_filename)
 
         # --------------------------
-        # Ghostscript Executable
+        # Lossless: pikepdf rewrite, no Ghostscript
         # --------------------------
+        if mode == "lossless":
+            linearize = request.form.get("linearize", "false").lower() in ("1", "true", "yes")
+            cache_key, cached = cache_lookup("pdf-compress", [file], {"mode": "lossless", "linearize": linearize})
+            if cached:
+                return send_cached(cached, output_filename)
 
-        # Correct fixed path for Windows
-        if os.name == "nt":
-            gs_executable = r"C:\Program Files\gs\gs10.06.0\bin\gswin64c.exe"
-        else:
-            gs_executable = "gs"
-
-        print("USING GHOSTSCRIPT:", gs_executable)
-
-        # Ghostscript command
-        gs_command = [
-            gs_executable,
-            "-sDEVICE=pdfwrite",
-            "-dCompatibilityLevel=1.4",
-            f"-dPDFSETTINGS={pdf_setting}",
-            "-dNOPAUSE",
-            "-dQUIET",
-            "-dBATCH",
-            f"-sOutputFile={output_path}",
-            input_path,
-        ]
+            work_dir = new_workspace("pdf-compress-")
+            input_path = os.path.join(work_dir, "input.pdf")
+            file.save(input_path)
+            return run_tool(
+                "pdf-compress",
+                compress_lossless_file,
+                {
+                    "input_path": input_path,
+                    "output_path": os.path.join(work_dir, output_filename),
+                    "linearize": linearize,
+                },
+                cache_key=cache_key,
+                cleanup=[work_dir],
+            )
 
         # --------------------------
-        # Run Ghostscript
+        # Images: per-image downsample / re-encode
         # --------------------------
-        subprocess.run(gs_command, check=True)
+        if mode == "images":
+            try:
+                target_dpi = int(request.form.get("dpi", 150))
+                quality = int(request.form.get("quality", 75))
+            except ValueError:
+                return jsonify({"error": "dpi and quality must be numbers"}), 400
+            target_dpi = max(IMAGE_DPI_RANGE[0], min(IMAGE_DPI_RANGE[1], target_dpi))
+            quality = max(IMAGE_QUALITY_RANGE[0], min(IMAGE_QUALITY_RANGE[1], quality))
 
-        # --------------------------
-        # File size calculation
-        # --------------------------
-        original_size = os.path.getsize(input_path) / (1024 * 1024)
-        compressed_size = os.path.getsize(output_path) / (1024 * 1024)
+            cache_key, cached = cache_lookup(
+                "pdf-compress", [file], {"mode": "images", "dpi": target_dpi, "quality": quality}
+            )
+            if cached:
+                return send_cached(cached, output_filename)
 
-        print(f"✅ Compression success: {original_size:.2f}MB → {compressed_size:.2f}MB")
+            work_dir = new_workspace("pdf-compress-")
+            input_path = os.path.join(work_dir, "input.pdf")
+            file.save(input_path)
+            return run_tool(
+                "pdf-compress",
+                compress_images_file,
+                {
+                    "input_path": input_path,
+                    "output_path": os.path.join(work_dir, output_filename),
+                    "target_dpi": target_dpi,
+                    "quality": quality,
+                },
+                cache_key=cache_key,
+                cleanup=[work_dir],
+            )
+
+        # Serve repeat uploads straight from the result cache. Parallel output
+        # is stitched from page chunks and drops the outline, so it is keyed apart
+        cache_params = {"target_mb": target_mb} if target_mb is not None else {"setting": pdf_setting}
+        cache_params["parallel"] = parallel
+        cache_key, cached = cache_lookup("pdf-compress", [file], cache_params)
+        if cached:
+            return send_cached(cached, output_filename)
+
+        # Save uploaded PDF to a per-request workspace
+        work_dir = new_workspace("pdf-compress-")
+        input_path = os.path.join(work_dir, "input.pdf")
+        file.save(input_path)
+        output_path = os.path.join(work_dir, output_filename)
 
         # --------------------------
-        # Send compressed file
+        # Compress and send (or queue)
         # --------------------------
-        response = send_file(
-            output_path,
-            as_attachment=True,
-            download_name=output_filename,
-            mimetype="application/pdf",
+        return run_tool(
+            "pdf-compress",
+            compress_file,
+            {
+                "input_path": input_path,
+                "output_path": output_path,
+                "pdf_setting": pdf_setting,
+                "parallel": parallel,
+                "target_mb": target_mb,
+            },
+            cache_key=cache_key,
+            cleanup=[work_dir],
         )
 
-        response.headers["x-original-size-mb"] = f"{original_size:.2f}"
-        response.headers["x-compressed-size-mb"] = f"{compressed_size:.2f}"
-
-        return response
+    except UploadHandleError as e:
+        return jsonify({"error": str(e)}), 410
 
     except subprocess.CalledProcessError as e:
         print("❌ Ghostscript compression failed:", str(e))
@@ -126,3 +293,60 @@ def compress_pdf():
     except Exception as e:
         print("❌ Server Error:", str(e))
         return jsonify({"error": f"Server error: {str(e)}"}), 500
+
+
+@pdf_compress_bp.route("/estimate", methods=["POST", "OPTIONS"])
+@jwt_required(optional=True)
+def estimate_compression():
+    """
+    Project the compressed size for each mode without producing the full file.
+    Accepts:
+    - file (PDF) or handle (from /api/tools/upload)
+    """
+
+    # Handle CORS preflight
+    if request.method == "OPTIONS":
+        return jsonify({"message": "CORS Preflight OK"}), 200
+
+    work_dir = None
+    try:
+        file = get_upload("file")
+        if file is None:
+            return jsonify({"error": "No file uploaded"}), 400
+
+        filename = secure_filename(file.filename)
+        if not filename.lower().endswith(".pdf"):
+            return jsonify({"error": "Only PDF files are supported"}), 400
+
+        work_dir = new_workspace("pdf-estimate-")
+        input_path = os.path.join(work_dir, "input.pdf")
+        file.save(input_path)
+
+        estimates, info = estimate_sizes(input_path, list(SETTINGS_MAP.values()))
+
+        return jsonify({
+            "original_size_mb": round(info["original_bytes"] / (1024 * 1024), 2),
+            "total_pages": info["total_pages"],
+            "sample_pages": info["sample_pages"],
+            "estimates_mb": {
+                mode: round(estimates[setting] / (1024 * 1024), 2)
+                for mode, setting in SETTINGS_MAP.items()
+            },
+        }), 200
+
+    except UploadHandleError as e:
+        return jsonify({"error": str(e)}), 410
+
+    except subprocess.CalledProcessError as e:
+        print("❌ Ghostscript estimate failed:", str(e))
+        return jsonify({
+            "error": "Ghostscript failed. Make sure Ghostscript is installed correctly.",
+            "details": str(e)
+        }), 500
+
+    except Exception as e:
+        print("❌ Server Error:", str(e))
+        return jsonify({"error": f"Server error: {str(e)}"}), 500
+
+    finally:
+        cleanup_paths([work_dir] if work_dir else None)
@@ -1,60 +1,74 @@
 import os
-import io
-from flask import Blueprint, request, send_file, jsonify
-from PyPDF2 import PdfMerger
+from flask import Blueprint, jsonify
+from utils.result_cache import cache_lookup, send_cached
+from utils.upload_handles import UploadHandleError, get_uploads
+from utils.job_queue import run_tool, report_progress
+from utils.pdf_backend import get_backend, merge_incremental
+from utils.workspace import new_workspace
 
 # Create blueprint for PDF Merge
 pdf_merge_bp = Blueprint("pdf_merge_bp", __name__)
 
-# Folder for uploads
-UPLOAD_FOLDER = os.path.join(os.getcwd(), "uploads", "pdf-merge")
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+SPOOL_BUFFER = 1024 * 1024
+
+
+def merge_files(pdf_paths, work_dir):
+    """
+    Merge saved PDFs in order; returns a tool result dict.
+    Inputs are merged in bounded batches spilled to `work_dir`, and the
+    result is served from disk.
+    """
+    backend = get_backend()
+    merged_path = os.path.join(work_dir, "merged_output.pdf")
+    merge_incremental(backend, pdf_paths, merged_path, work_dir, progress=report_progress)
+    print(f"✅ Merged {len(pdf_paths)} PDFs with {backend.name}")
+
+    return {"path": merged_path, "download_name": "merged.pdf", "mimetype": "application/pdf"}
 
 
 @pdf_merge_bp.route("", methods=["POST"])
 def merge_pdfs():
     """
     Merge multiple PDF files into one.
-    Expects multiple 'files' in form-data.
+    Expects multiple 'files' in form-data, or 'handles' from /api/tools/upload.
     Returns a merged PDF blob.
     """
     try:
         # ✅ Step 1: Get uploaded files
-        uploaded_files = request.files.getlist("files")
+        uploaded_files = get_uploads("files")
         if not uploaded_files or len(uploaded_files) < 2:
             return jsonify({"error": "Please upload at least two PDF files"}), 400
 
-        merger = PdfMerger()
-
-        # ✅ Step 2: Merge all PDFs
         for file in uploaded_files:
             if not file.filename.lower().endswith(".pdf"):
                 return jsonify({"error": f"Invalid file type: {file.filename}"}), 400
 
-            file_path = os.path.join(UPLOAD_FOLDER, file.filename)
-            file.save(file_path)
-            merger.append(file_path)
-
-        # ✅ Step 3: Write merged output to memory
-        output_stream = io.BytesIO()
-        merger.write(output_stream)
-        merger.close()
-        output_stream.seek(0)
-
-        # ✅ Step 4: Optionally save for records
-        merged_path = os.path.join(UPLOAD_FOLDER, "merged_output.pdf")
-        with open(merged_path, "wb") as f:
-            f.write(output_stream.getbuffer())
-
-        # ✅ Step 5: Return merged PDF file
-        output_stream.seek(0)
-        return send_file(
-            output_stream,
-            as_attachment=True,
-            download_name="merged.pdf",
-            mimetype="application/pdf",
+        # ✅ Serve repeat uploads straight from the result cache (order matters)
+        cache_key, cached = cache_lookup("pdf-merge", uploaded_files)
+        if cached:
+            return send_cached(cached)
+
+        # ✅ Step 2: Spool inputs to a per-request scratch folder
+        # (index prefix keeps duplicate names apart)
+        work_dir = new_workspace("pdf-merge-")
+        pdf_paths = []
+        for idx, file in enumerate(uploaded_files):
+            file_path = os.path.join(work_dir, f"{idx:05d}.pdf")
+            file.save(file_path, buffer_size=SPOOL_BUFFER)
+            pdf_paths.append(file_path)
+
+        # ✅ Step 3: Merge and return merged PDF file (or queue it)
+        return run_tool(
+            "pdf-merge",
+            merge_files,
+            {"pdf_paths": pdf_paths, "work_dir": work_dir},
+            cache_key=cache_key,
+            cleanup=[work_dir],
         )
 
+    except UploadHandleError as e:
+        return jsonify({"error": str(e)}), 410
+
     except Exception as e:
         print(f"❌ PDF Merge Error: {e}")
         return jsonify({"error": str(e)}), 500
@@ -1,63 +1,168 @@
 import os
 import io
-from flask import Blueprint, request, send_file, jsonify
-from PyPDF2 import PdfReader, PdfWriter
+from flask import Blueprint, request, jsonify
+from utils.result_cache import cache_lookup, send_cached
+from utils.upload_handles import get_upload
+from utils.job_queue import run_tool, report_progress, wants_async, cleanup_paths
+from utils.page_ranges import parse_page_ranges
+from utils.zip_stream import write_zip, zip_response
+from utils.pdf_backend import get_backend
+from utils.workspace import new_workspace
 
 # Blueprint for PDF Split tool
 pdf_split_bp = Blueprint("pdf_split_bp", __name__)
 
-# Folder to save temporary files
-UPLOAD_FOLDER = os.path.join(os.getcwd(), "uploads", "pdf-split")
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+SPLIT_MODES = ("ranges", "every", "pages")
+
+
+def split_groups(mode, total_pages, ranges=None, every=None):
+    """
+    Page groups (1-based inclusive start, end) that each become one output file.
+    - ranges: "1-3,7,10-20" → one file per comma-separated part
+    - every:  one file per `every` pages
+    - pages:  one file per page
+    """
+    if mode == "every":
+        if not every or every < 1:
+            raise ValueError("'every' must be a positive number of pages")
+        return [(start, min(start + every - 1, total_pages)) for start in range(1, total_pages + 1, every)]
+    if mode == "pages":
+        return [(page, page) for page in range(1, total_pages + 1)]
+    return parse_page_ranges(ranges, total_pages)
+
+
+def part_name(start, end):
+    return f"page_{start}.pdf" if start == end else f"split_{start}-{end}.pdf"
+
+
+def split_entries(backend, doc, groups, close=False):
+    """
+    Build each output from the already-parsed document, one at a time,
+    yielding (arcname, bytes) so only one part is held in memory.
+    `close` releases the document once the last part is out.
+    """
+    try:
+        for done, (start, end) in enumerate(groups, start=1):
+            output_stream = io.BytesIO()
+            backend.extract(doc, start, end, output_stream)
+            report_progress(done, len(groups))
+            yield part_name(start, end), output_stream.getvalue()
+    finally:
+        if close:
+            backend.close(doc)
+
+
+def write_single_part(backend, doc, group, work_dir):
+    """Write one page group to disk; returns a tool result dict."""
+    filepath = os.path.join(work_dir, part_name(*group))
+    try:
+        backend.extract(doc, group[0], group[1], filepath)
+    finally:
+        backend.close(doc)
+    return {"path": filepath, "download_name": "split.pdf", "mimetype": "application/pdf"}
+
+
+def split_file(pdf_path, work_dir, mode="ranges", ranges=None, every=None):
+    """
+    Split a saved PDF in one pass; returns a tool result dict.
+    A single group comes back as a PDF, several as a ZIP.
+    """
+    # Read the input PDF (once)
+    backend = get_backend()
+    doc = backend.open(pdf_path)
+    try:
+        groups = split_groups(mode, backend.page_count(doc), ranges, every)
+    except Exception:
+        backend.close(doc)
+        raise
+
+    if len(groups) == 1:
+        return write_single_part(backend, doc, groups[0], work_dir)
+
+    zip_path = os.path.join(work_dir, "split.zip")
+    write_zip(split_entries(backend, doc, groups, close=True), zip_path)
+    return {"path": zip_path, "download_name": "split.zip", "mimetype": "application/zip"}
 
 
 @pdf_split_bp.route("", methods=["POST"])
 def split_pdf():
-    """Split a PDF file by page range."""
+    """
+    Split a PDF file.
+    Accepts:
+    - file (PDF) or handle (from /api/tools/upload)
+    - mode (ranges, every, pages; default ranges)
+    - ranges (mode=ranges, e.g. "1-3,7,10-20"; one output per part)
+    - every (mode=every, pages per output file)
+    One output returns a PDF; several stream back as a ZIP.
+    """
     try:
-        uploaded_file = request.files.get("file")
+        uploaded_file = get_upload("file")
         if not uploaded_file or not uploaded_file.filename.lower().endswith(".pdf"):
             return jsonify({"error": "Please upload a valid PDF file"}), 400
 
-        range_str = request.form.get("ranges", "")
-        if not range_str or "-" not in range_str:
+        mode = request.form.get("mode", "ranges").lower()
+        if mode not in SPLIT_MODES:
+            return jsonify({"error": f"mode must be one of {', '.join(SPLIT_MODES)}"}), 400
+
+        range_str = request.form.get("ranges", "").strip()
+        if mode == "ranges" and not range_str:
             return jsonify({"error": "Invalid page range format"}), 400
 
+        every = None
+        if mode == "every":
+            try:
+                every = int(request.form.get("every", ""))
+            except ValueError:
+                return jsonify({"error": "Invalid 'every' value"}), 400
+
+        # Serve repeat uploads straight from the result cache
+        cache_key, cached = cache_lookup(
+            "pdf-split", [uploaded_file], {"mode": mode, "ranges": range_str, "every": every}
+        )
+        if cached:
+            return send_cached(cached)
+
+        work_dir = new_workspace("pdf-split-")
+        pdf_path = os.path.join(work_dir, "input.pdf")
+        uploaded_file.save(pdf_path)
+        split_args = {"pdf_path": pdf_path, "work_dir": work_dir, "mode": mode, "ranges": range_str, "every": every}
+
+        if wants_async():
+            return run_tool("pdf-split", split_file, split_args, cache_key=cache_key, cleanup=[work_dir])
+
+        # Parse once and validate before the first byte goes out
+        backend = get_backend()
+        doc = None
         try:
-            start_page, end_page = map(int, range_str.split("-"))
-        except ValueError:
-            return jsonify({"error": "Invalid page range values"}), 400
-
-        # Read the input PDF
-        pdf_reader = PdfReader(uploaded_file)
-        total_pages = len(pdf_reader.pages)
-        if start_page < 1 or end_page > total_pages or start_page > end_page:
-            return jsonify({"error": f"Page range out of bounds (1–{total_pages})"}), 400
-
-        # Create a new PDF with selected pages
-        pdf_writer = PdfWriter()
-        for i in range(start_page - 1, end_page):
-            pdf_writer.add_page(pdf_reader.pages[i])
-
-        # Write split output to memory
-        output_stream = io.BytesIO()
-        pdf_writer.write(output_stream)
-        output_stream.seek(0)
-
-        filename = f"split_{start_page}-{end_page}.pdf"
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        with open(filepath, "wb") as f:
-            f.write(output_stream.getbuffer())
-
-        # Return split file to frontend
-        output_stream.seek(0)
-        return send_file(
-            output_stream,
-            as_attachment=True,
-            download_name="split.pdf",
-            mimetype="application/pdf",
+            doc = backend.open(pdf_path)
+            groups = split_groups(mode, backend.page_count(doc), range_str, every)
+        except Exception:
+            if doc is not None:
+                backend.close(doc)
+            cleanup_paths([work_dir])
+            raise
+
+        # Single part: plain PDF download as before
+        if len(groups) == 1:
+            return run_tool(
+                "pdf-split",
+                write_single_part,
+                {"backend": backend, "doc": doc, "group": groups[0], "work_dir": work_dir},
+                cache_key=cache_key,
+                cleanup=[work_dir],
+            )
+
+        # Many parts: stream each one as soon as it is built
+        return zip_response(
+            split_entries(backend, doc, groups, close=True),
+            "split.zip",
+            cache_key=cache_key,
+            cleanup=[work_dir],
         )
 
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     except Exception as e:
         print(f"❌ PDF Split Error: {e}")
         return jsonify({"error": str(e)}), 500
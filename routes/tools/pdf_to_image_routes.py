@@ -1,54 +1,122 @@
 import os
-import zipfile
-import io
-from flask import Blueprint, request, send_file, jsonify
-from pdf2image import convert_from_path
+from flask import Blueprint, request, jsonify
+from utils.result_cache import cache_lookup, send_cached
+from utils.upload_handles import get_upload
+from utils.job_queue import run_tool, report_progress, wants_async, cleanup_paths
+from utils.page_ranges import page_indexes
+from utils.pdf_render import IMAGE_FORMATS, page_total, render_pages
+from utils.zip_stream import write_zip, zip_response
+from utils.workspace import new_workspace
 
 pdf_to_image_bp = Blueprint("pdf_to_image_bp", __name__)
 
-UPLOAD_FOLDER = os.path.join(os.getcwd(), "uploads", "pdf-to-image")
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+MIN_DPI, MAX_DPI = 36, 600
 
-POPPLER_PATH = r"C:\poppler-24.08.0\Library\bin"
-  # <<< CHANGE THIS PATH
+
+def image_entries(pdf_path, indexes, dpi, fmt, quality):
+    """(arcname, bytes) ZIP entries for the selected pages, as they are encoded."""
+    ext = IMAGE_FORMATS[fmt][0]
+    for done, (index, data) in enumerate(render_pages(pdf_path, indexes, dpi, fmt, quality), start=1):
+        report_progress(done, len(indexes))
+        yield f"page_{index + 1}.{ext}", data
+
+
+def render_pdf_images(pdf_path, work_dir, dpi=180, fmt="jpeg", quality=85, pages=None):
+    """
+    Render the selected pages of a saved PDF and zip them; returns a tool result dict.
+    Encoded pages go straight into the archive, no per-page files.
+    """
+    indexes = page_indexes(pages, page_total(pdf_path))
+
+    zip_path = os.path.join(work_dir, "images.zip")
+    write_zip(image_entries(pdf_path, indexes, dpi, fmt, quality), zip_path)
+
+    print(f"✅ Rendered {len(indexes)} page(s) at {dpi} DPI as {fmt}")
+    return {"path": zip_path, "download_name": "images.zip", "mimetype": "application/zip"}
 
 
 @pdf_to_image_bp.route("/", methods=["POST"])
 def pdf_to_image():
-    print("USING POPPLER FROM:", POPPLER_PATH)
+    """
+    Convert PDF pages to images (ZIP).
+    Accepts:
+    - file (PDF) or handle (from /api/tools/upload)
+    - dpi (36–600, default 180)
+    - format (jpeg, png, webp; default jpeg)
+    - quality (1–100, default 85; jpeg/webp only)
+    - pages (optional, e.g. "1-3,7"; default all)
+    """
     try:
         # Check file
-        if "file" not in request.files:
+        file = get_upload("file")
+        if file is None:
             return jsonify({"error": "No file provided"}), 400
 
-        file = request.files["file"]
         if not file.filename.lower().endswith(".pdf"):
             return jsonify({"error": "File must be PDF"}), 400
 
-        pdf_path = os.path.join(UPLOAD_FOLDER, file.filename)
+        # Rendering options
+        fmt = request.form.get("format", "jpeg").lower()
+        if fmt == "jpg":
+            fmt = "jpeg"
+        if fmt not in IMAGE_FORMATS:
+            return jsonify({"error": "format must be jpeg, png or webp"}), 400
+
+        try:
+            dpi = int(request.form.get("dpi", 180))
+            quality = int(request.form.get("quality", 85))
+        except ValueError:
+            return jsonify({"error": "dpi and quality must be numbers"}), 400
+        dpi = max(MIN_DPI, min(MAX_DPI, dpi))
+        quality = max(1, min(100, quality))
+        pages = request.form.get("pages", "").strip() or None
+
+        # Serve repeat uploads straight from the result cache
+        cache_key, cached = cache_lookup(
+            "pdf-to-image", [file],
+            {"dpi": dpi, "format": fmt, "quality": quality, "pages": pages},
+        )
+        if cached:
+            return send_cached(cached)
+
+        work_dir = new_workspace("pdf-to-image-")
+        pdf_path = os.path.join(work_dir, "input.pdf")
         file.save(pdf_path)
 
-        # Convert PDF → images
-        images = convert_from_path(pdf_path, dpi=180, poppler_path=POPPLER_PATH)
-
-        # Save images temporarily + zip them
-        zip_buffer = io.BytesIO()
-        with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zipf:
-            for i, img in enumerate(images, start=1):
-                img_filename = f"page_{i}.jpg"
-                img_path = os.path.join(UPLOAD_FOLDER, img_filename)
-                img.save(img_path, "JPEG")
-                zipf.write(img_path, img_filename)
-
-        zip_buffer.seek(0)
-
-        return send_file(
-            zip_buffer,
-            mimetype="application/zip",
-            as_attachment=True,
-            download_name="images.zip"
+        if wants_async():
+            return run_tool(
+                "pdf-to-image",
+                render_pdf_images,
+                {
+                    "pdf_path": pdf_path,
+                    "work_dir": work_dir,
+                    "dpi": dpi,
+                    "fmt": fmt,
+                    "quality": quality,
+                    "pages": pages,
+                },
+                cache_key=cache_key,
+                cleanup=[work_dir],
+            )
+
+        # Validate the selection before the first byte goes out
+        try:
+            indexes = page_indexes(pages, page_total(pdf_path))
+        except Exception:
+            cleanup_paths([work_dir])
+            raise
+
+        # Stream each page to the client as soon as it is encoded
+        return zip_response(
+            image_entries(pdf_path, indexes, dpi, fmt, quality),
+            "images.zip",
+            cache_key=cache_key,
+            cleanup=[work_dir],
         )
 
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     except Exception as e:
         print("[PDF2IMAGE] Conversion error:", e)
         return jsonify({"error": str(e)}), 500
@@ -1,64 +1,93 @@
 import os
-import tempfile
-from flask import Blueprint, request, jsonify, send_file
-from pdf2docx import Converter
+from flask import Blueprint, request, jsonify
+from utils.result_cache import cache_lookup, send_cached
+from utils.upload_handles import get_upload
+from utils.job_queue import run_tool, report_progress
+from utils.page_ranges import page_indexes
+from utils.pdf_docx import pdf_to_docx
+from utils.pdf_render import page_total
+from utils.workspace import new_workspace
 
 # Create Blueprint for PDF to Word route
 pdf_to_word_bp = Blueprint("pdf_to_word_bp", __name__)
 
-# Folder to store uploaded PDFs and converted DOCX files
-UPLOAD_FOLDER = os.path.join(os.getcwd(), "uploads", "pdf-to-word")
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+DOCX_MIMETYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+def page_selection(pages=None, start=None, end=None):
+    """
+    Page list for the converter: `pages` ("1-3,7") wins, otherwise the
+    1-based `start`/`end` bounds (either may be open). None = every page.
+    """
+    if pages:
+        return pages
+    if start or end:
+        return f"{start or ''}-{end or ''}"
+    return None
+
+
+def convert_pdf_file(pdf_path, work_dir, download_name="converted.docx", pages=None):
+    """
+    Convert the selected pages of one saved PDF to Word; returns a tool result dict.
+    """
+    indexes = page_indexes(pages, page_total(pdf_path))
+
+    # Convert using pdf2docx (page chunks in parallel for long documents)
+    docx_path = os.path.join(work_dir, "converted.docx")
+    converted = pdf_to_docx(pdf_path, docx_path, indexes, work_dir=work_dir, progress=report_progress)
+
+    print(f"✅ Converted {converted} page(s) to Word")
+    return {"path": docx_path, "download_name": download_name, "mimetype": DOCX_MIMETYPE}
+
 
 @pdf_to_word_bp.route("", methods=["POST"])
 def convert_pdf_to_word():
     """
     Route: POST /api/tools/pdf-to-word
-    Accepts: multipart/form-data (with 'file' field)
+    Accepts: multipart/form-data
+    - file (PDF) or handle (from /api/tools/upload)
+    - pages (optional, e.g. "1-3,7")
+    - start / end (optional 1-based page bounds; ignored when pages is set)
     Returns: converted Word (.docx) file for download
     """
-    if "file" not in request.files:
+    file = get_upload("file")
+    if file is None:
         return jsonify({"error": "No file uploaded"}), 400
 
-    file = request.files["file"]
-
-    if file.filename == "":
-        return jsonify({"error": "No file selected"}), 400
-
     if not file.filename.lower().endswith(".pdf"):
         return jsonify({"error": "Invalid file type. Please upload a PDF."}), 400
 
     try:
-        # Save uploaded file temporarily
-        pdf_path = os.path.join(UPLOAD_FOLDER, file.filename)
+        start = int(request.form["start"]) if request.form.get("start") else None
+        end = int(request.form["end"]) if request.form.get("end") else None
+    except ValueError:
+        return jsonify({"error": "start and end must be page numbers"}), 400
+    pages = page_selection(request.form.get("pages", "").strip(), start, end)
+
+    download_name = os.path.splitext(file.filename)[0] + ".docx"
+
+    # Serve repeat uploads straight from the result cache
+    cache_key, cached = cache_lookup("pdf-to-word", [file], {"pages": pages})
+    if cached:
+        return send_cached(cached, download_name)
+
+    try:
+        # Save uploaded file to a per-request work dir
+        work_dir = new_workspace("pdf-to-word-")
+        pdf_path = os.path.join(work_dir, "input.pdf")
         file.save(pdf_path)
 
-        # Create output DOCX file path
-        base_name = os.path.splitext(file.filename)[0]
-        docx_filename = f"{base_name}.docx"
-        docx_path = os.path.join(UPLOAD_FOLDER, docx_filename)
-
-        # Convert using pdf2docx
-        converter = Converter(pdf_path)
-        converter.convert(docx_path)
-        converter.close()
-
-        # Send converted file for download
-        return send_file(
-            docx_path,
-            as_attachment=True,
-            download_name=docx_filename,
-            mimetype="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+        return run_tool(
+            "pdf-to-word",
+            convert_pdf_file,
+            {"pdf_path": pdf_path, "work_dir": work_dir, "download_name": download_name, "pages": pages},
+            cache_key=cache_key,
+            cleanup=[work_dir],
         )
 
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     except Exception as e:
         print("❌ Conversion Error:", str(e))
         return jsonify({"error": f"Conversion failed: {str(e)}"}), 500
-
-    finally:
-        # Clean up uploaded PDF
-        try:
-            if os.path.exists(pdf_path):
-                os.remove(pdf_path)
-        except Exception as cleanup_error:
-            print("⚠️ Cleanup failed:", cleanup_error)
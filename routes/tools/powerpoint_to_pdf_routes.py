@@ -1,14 +1,25 @@
 import os
-import subprocess
-import tempfile
-import shutil
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, jsonify
+from utils.libreoffice_convert import libreoffice_convert
+from utils.libreoffice_pool import LibreOfficeError
+from utils.result_cache import cache_lookup, send_cached
+from utils.upload_handles import get_upload
+from utils.job_queue import run_tool
+from utils.workspace import new_workspace
 
 powerpoint_to_pdf_bp = Blueprint("powerpoint_to_pdf_bp", __name__)
 
-# Folder for output PDFs
-UPLOAD_FOLDER = os.path.join(os.getcwd(), "uploads", "powerpoint-to-pdf")
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+
+def convert_ppt_file(ppt_path):
+    """
+    Convert one saved PowerPoint file to PDF; returns a tool result dict.
+    """
+    # Convert on a warm pooled LibreOffice instance, next to the input
+    pdf_path = libreoffice_convert(ppt_path, os.path.dirname(ppt_path), "pdf")
+    pdf_filename = os.path.basename(pdf_path)
+
+    print(f"✅ Converted {os.path.basename(ppt_path)} → {pdf_filename}")
+    return {"path": pdf_path, "download_name": pdf_filename, "mimetype": "application/pdf"}
 
 
 @powerpoint_to_pdf_bp.route("", methods=["POST"])
@@ -16,55 +27,33 @@ def convert_ppt_to_pdf():
     """
     Convert PowerPoint (.ppt/.pptx) to PDF using LibreOffice (headless mode)
     """
-    if "file" not in request.files:
+    file = get_upload("file")
+    if file is None:
         return jsonify({"error": "No file uploaded"}), 400
 
-    file = request.files["file"]
-    if file.filename == "":
-        return jsonify({"error": "No file selected"}), 400
-
     if not file.filename.lower().endswith((".ppt", ".pptx")):
         return jsonify({"error": "Invalid file type. Please upload .ppt or .pptx"}), 400
 
+    # Serve repeat uploads straight from the result cache
+    cache_key, cached = cache_lookup("ppt-to-pdf", [file])
+    if cached:
+        return send_cached(cached, os.path.splitext(file.filename)[0] + ".pdf")
+
     # Save to temporary folder
-    temp_dir = tempfile.mkdtemp()
-    ppt_path = os.path.join(temp_dir, file.filename)
+    temp_dir = new_workspace("ppt-to-pdf-")
+    ppt_path = os.path.join(temp_dir, os.path.basename(file.filename))
     file.save(ppt_path)
 
     try:
-        # Run LibreOffice headless conversion
-        subprocess.run(
-            [
-                "soffice",
-                "--headless",
-                "--convert-to",
-                "pdf",
-                "--outdir",
-                UPLOAD_FOLDER,
-                ppt_path
-            ],
-            check=True
-        )
-
-        # Find the output PDF
-        base_name = os.path.splitext(file.filename)[0]
-        pdf_filename = f"{base_name}.pdf"
-        pdf_path = os.path.join(UPLOAD_FOLDER, pdf_filename)
-
-        if not os.path.exists(pdf_path):
-            raise FileNotFoundError("Conversion failed: PDF not found")
-
-        print(f"✅ Converted {file.filename} → {pdf_filename}")
-
-        # Send file to frontend
-        return send_file(
-            pdf_path,
-            as_attachment=True,
-            download_name=pdf_filename,
-            mimetype="application/pdf"
+        return run_tool(
+            "ppt-to-pdf",
+            convert_ppt_file,
+            {"ppt_path": ppt_path},
+            cache_key=cache_key,
+            cleanup=[temp_dir],
         )
 
-    except subprocess.CalledProcessError as e:
+    except LibreOfficeError as e:
         print("❌ LibreOffice conversion failed:", e)
         return jsonify({"error": "LibreOffice conversion failed"}), 500
 
@@ -72,5 +61,3 @@ def convert_ppt_to_pdf():
         print("❌ Conversion Error:", str(e))
         return jsonify({"error": str(e)}), 500
 
-    finally:
-        shutil.rmtree(temp_dir, ignore_errors=True)
@@ -1,71 +1,78 @@
 import os
 from flask import Blueprint, request, jsonify, send_file
 import pikepdf
+from utils.upload_handles import get_upload, upload_pdf_info
+from utils.job_queue import cleanup_paths, cleanup_after
+from utils.workspace import new_workspace
 
 unlock_pdf_bp = Blueprint("unlock_pdf_bp", __name__)
 
-UPLOAD_FOLDER = os.path.join(os.getcwd(), "uploads", "unlock-pdf")
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+
+def unlock_check_body(locked):
+    if locked:
+        return {
+            "locked": True,
+            "type": "user",
+            "message": "This PDF is locked. Please enter the password to unlock."
+        }
+    return {"locked": False, "message": "This PDF is already unlocked."}
+
 
 # ✅ Check if locked/unlocked
 @unlock_pdf_bp.route("/check", methods=["POST"])
 def check_lock_status():
-    if "pdfFile" not in request.files:
+    pdf_file = get_upload("pdfFile")
+    if pdf_file is None:
         return jsonify({"message": "No PDF uploaded"}), 400
 
-    pdf_file = request.files["pdfFile"]
-    temp_path = os.path.join(UPLOAD_FOLDER, pdf_file.filename)
-    pdf_file.save(temp_path)
-
+    # Header-only inspection: handles are cached, uploads sniffed in place
     try:
-        with pikepdf.open(temp_path):
-            return jsonify({
-                "locked": False,
-                "message": "This PDF is already unlocked."
-            })
-    except pikepdf.PasswordError:
-        return jsonify({
-            "locked": True,
-            "type": "user",
-            "message": "This PDF is locked. Please enter the password to unlock."
-        })
+        info = upload_pdf_info(pdf_file)
     except Exception as e:
         return jsonify({"message": f"Error reading PDF: {e}"}), 500
-    finally:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+
+    return jsonify({
+        **unlock_check_body(info["needs_password"]),
+        "pages": info["pages"],
+        "encryption": info.get("encryption"),
+    })
 
 
 # ✅ Unlock a locked PDF
 @unlock_pdf_bp.route("/unlock", methods=["POST"])
 def unlock_pdf():
-    if "pdfFile" not in request.files:
+    pdf_file = get_upload("pdfFile")
+    if pdf_file is None:
         return jsonify({"message": "No file uploaded"}), 400
 
-    pdf_file = request.files["pdfFile"]
     password = request.form.get("password", "")
 
-    temp_input = os.path.join(UPLOAD_FOLDER, pdf_file.filename)
-    output_path = os.path.join(UPLOAD_FOLDER, f"unlocked_{pdf_file.filename}")
+    # Per-request workspace, removed once the response has been sent
+    work_dir = new_workspace("unlock-pdf-")
+    temp_input = os.path.join(work_dir, "input.pdf")
+    output_path = os.path.join(work_dir, "output.pdf")
     pdf_file.save(temp_input)
+    sent = False
 
     try:
         with pikepdf.open(temp_input, password=password) as pdf:
             pdf.save(output_path)
 
-        return send_file(
+        response = send_file(
             output_path,
             as_attachment=True,
             download_name=f"unlocked_{pdf_file.filename}",
             mimetype="application/pdf",
         )
+        sent = True
+        return cleanup_after(response, [work_dir])
     except pikepdf.PasswordError:
         return jsonify({"message": "Incorrect password or unable to unlock PDF."}), 401
     except Exception as e:
         return jsonify({"message": f"Error unlocking PDF: {e}"}), 500
     finally:
-        if os.path.exists(temp_input):
-            os.remove(temp_input)
+        if not sent:
+            cleanup_paths([work_dir])
 
 
 
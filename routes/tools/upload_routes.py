@@ -0,0 +1,43 @@
+from flask import Blueprint, request, jsonify
+from utils.upload_handles import get_handle_store
+from utils.upload_ingest import received
+
+# Blueprint for upload-once file handles
+upload_bp = Blueprint("upload_bp", __name__)
+
+
+def public_meta(meta):
+    """Handle metadata without server-side paths."""
+    return {k: v for k, v in meta.items() if k != "path"}
+
+
+@upload_bp.route("", methods=["POST"])
+def upload_file():
+    """
+    Store a file once and get back a handle usable by every tool.
+    Accepts: multipart/form-data with 'file'
+    Returns: handle, filename, size, expires_at and (for PDFs) pdf
+             metadata: pages, encrypted, version
+    """
+    file = request.files.get("file")
+    if not file or not file.filename:
+        return jsonify({"error": "No file uploaded"}), 400
+    file = received(file)
+
+    try:
+        meta = get_handle_store().put(file)
+        return jsonify(public_meta(meta)), 201
+    except Exception as e:
+        print("❌ Upload handle error:", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@upload_bp.route("/<handle>", methods=["GET"])
+def get_upload_meta(handle):
+    """
+    Cached metadata of a stored upload (also refreshes its expiry).
+    """
+    meta = get_handle_store().get(handle)
+    if meta is None:
+        return jsonify({"error": "Upload handle is unknown or expired"}), 404
+    return jsonify(public_meta(meta)), 200
@@ -0,0 +1,252 @@
+# backend/utils/autosave.py
+"""
+Write-behind buffer for document autosaves.
+
+The editor autosaves several times a second while the user types. Content
+saves are acknowledged from memory instead of being written one by one.
+Every save to the same document within AUTOSAVE_WINDOW_MS collapses into
+one pending entry (latest content, number of saves). A background thread
+writes all due entries with a single unordered bulk_write.
+
+- Reads overlay the pending entry (`pending`) or flush the user's first.
+- "Save now" and every non-content write flush the document synchronously.
+- Pending entries are flushed at interpreter exit (graceful worker shutdown).
+  A hard kill loses at most one window of keystrokes.
+
+Each web worker has its own buffer. A flush is conditional on the version
+the entry was staged against. If another worker (or a direct write) moved
+the document on in the meantime, the buffered save is dropped instead of
+overwriting newer content. Its client then gets a 409 on the next save
+and reloads.
+
+Config (env):
+    AUTOSAVE_WINDOW_MS   how long saves to one document are coalesced (default 1500; 0 = write through)
+"""
+import atexit
+import os
+import threading
+import time
+from datetime import datetime
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+AUTOSAVE_WINDOW_MS = int(os.getenv("AUTOSAVE_WINDOW_MS", "1500"))
+
+# How long the version of a written entry is remembered, to catch requests
+# that read the stored version just before the flush landed
+WRITTEN_MEMORY = 60
+
+
+class AutosaveConflict(Exception):
+    """The document moved past the version the save was based on."""
+
+    def __init__(self, version):
+        super().__init__(f"Document is at version {version}")
+        self.version = version
+
+
+class AutosaveBuffer:
+    """Pending content saves keyed by (user_id, doc_id)."""
+
+    def __init__(self, db, window=AUTOSAVE_WINDOW_MS / 1000):
+        self.db = db
+        self.window = window
+        self._pending = {}
+        self._inflight = {}
+        self._written = {}
+        self._lock = threading.Lock()
+        # One flush at a time, so saves reach MongoDB in the order they came
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._flush_loop, name="autosave-flush", daemon=True)
+        self._thread.start()
+
+    # ----------------------------------------------------------
+    # Staging
+    # ----------------------------------------------------------
+    def stage(self, user_id, doc_id, content, expected_version=None, stored_version=None):
+        """
+        Buffer a content save. `stored_version` is the version read from
+        MongoDB, needed only when nothing is buffered for the document.
+        With `expected_version`, the save is only taken when the document
+        is still at that version; otherwise AutosaveConflict is raised.
+        Returns the version the document has once this save is applied.
+        """
+        key = (user_id, str(doc_id))
+        with self._lock:
+            entry = self._pending.get(key)
+            writing = self._inflight.get(key)
+            if entry is not None:
+                current = entry["base"] + entry["saves"]
+            elif writing is not None:
+                current = writing["base"] + writing["saves"]
+            else:
+                written = self._written.get(key)
+                current = max(stored_version or 0, written[0] if written else 0)
+
+            if expected_version is not None and expected_version != current:
+                raise AutosaveConflict(current)
+
+            if entry is None:
+                entry = self._pending[key] = {"base": current, "saves": 0, "since": time.monotonic()}
+            entry["content"] = content
+            entry["updated_at"] = datetime.utcnow()
+            entry["saves"] += 1
+            return entry["base"] + entry["saves"]
+
+    def pending(self, user_id, doc_id):
+        """
+        Copy of the latest unwritten save of a document, or None. Its
+        "version" is the version the document has once it is written.
+        """
+        key = (user_id, str(doc_id))
+        with self._lock:
+            entry = self._pending.get(key) or self._inflight.get(key)
+            if not entry:
+                return None
+            return {**entry, "version": entry["base"] + entry["saves"]}
+
+    def discard(self, user_id, doc_id):
+        """Forget pending saves (the document is being deleted)."""
+        with self._lock:
+            self._pending.pop((user_id, str(doc_id)), None)
+            self._written.pop((user_id, str(doc_id)), None)
+
+    # ----------------------------------------------------------
+    # Flushing
+    # ----------------------------------------------------------
+    def _take(self, match):
+        with self._lock:
+            keys = [key for key, entry in self._pending.items() if match(key, entry)]
+            taken = [(key, self._pending.pop(key)) for key in keys]
+            # Still visible to reads until written
+            self._inflight = dict(taken)
+            return taken
+
+    def _requeue(self, failed):
+        """Put back entries that were not written, merging newer saves (caller holds the lock)."""
+        for key, entry in failed:
+            newer = self._pending.get(key)
+            if newer is not None:
+                newer["saves"] += entry["saves"]
+                newer["base"] = entry["base"]
+                newer["since"] = entry["since"]
+            else:
+                self._pending[key] = entry
+
+    def _conflicted(self, done):
+        """
+        Keys of flushed entries whose conditional update matched nothing.
+        Only read when the bulk write matched fewer documents than it sent.
+        """
+        ids = [ObjectId(doc_id) for (_, doc_id), _ in done]
+        stored = {
+            str(doc["_id"]): (doc.get("version", 0), doc.get("content"))
+            for doc in self.db.documents.find({"_id": {"$in": ids}}, {"version": 1, "content": 1})
+        }
+        return {
+            key for key, entry in done
+            if stored.get(key[1]) != (entry["base"] + entry["saves"], entry["content"])
+        }
+
+    def _write(self, taken):
+        if not taken:
+            return 0
+        ops, failed = [], set()
+        try:
+            ops = [
+                UpdateOne(
+                    # Only on top of the version this entry was staged against
+                    {"_id": ObjectId(doc_id), "user_id": user_id,
+                     "version": entry["base"] if entry["base"] else {"$in": [0, None]}},
+                    {"$set": {"content": entry["content"], "updated_at": entry["updated_at"],
+                              "version": entry["base"] + entry["saves"]}},
+                )
+                for (user_id, doc_id), entry in taken
+            ]
+            matched = self.db.documents.bulk_write(ops, ordered=False).matched_count
+        except BulkWriteError as e:
+            failed = {err["index"] for err in e.details.get("writeErrors", [])}
+            matched = e.details.get("nMatched", 0)
+            print(f"❌ Autosave flush: {len(failed)} of {len(ops)} writes failed")
+        except Exception as e:
+            print("❌ Autosave flush failed:", e)
+            failed = set(range(len(taken)))
+            matched = 0
+
+        done = [item for i, item in enumerate(taken) if i not in failed]
+        conflicted = set()
+        if matched < len(done):
+            try:
+                conflicted = self._conflicted(done)
+            except Exception as e:
+                print("⚠️ Autosave conflict check failed:", e)
+                conflicted = {key for key, _ in done}
+            if conflicted:
+                print(f"⚠️ Autosave dropped {len(conflicted)} save(s): document changed elsewhere")
+
+        with self._lock:
+            self._inflight = {}
+            self._remember_written([item for item in done if item[0] not in conflicted])
+            for key in conflicted:
+                self._written.pop(key, None)
+            # Failed writes are retried on the next flush
+            self._requeue([taken[i] for i in sorted(failed)])
+        return len(done) - len(conflicted)
+
+    def _remember_written(self, written):
+        """Keep the versions just written (caller holds the lock)."""
+        now = time.monotonic()
+        for key, entry in written:
+            self._written[key] = (entry["base"] + entry["saves"], now)
+        for key in [k for k, (_, at) in self._written.items() if now - at > WRITTEN_MEMORY]:
+            del self._written[key]
+
+    def flush(self, user_id=None, doc_id=None):
+        """Write pending saves now: one document, one user's, or all."""
+        def match(key, _):
+            if doc_id is not None:
+                return key == (user_id, str(doc_id))
+            return user_id is None or key[0] == user_id
+        with self._write_lock:
+            return self._write(self._take(match))
+
+    def flush_due(self):
+        """Write entries whose coalescing window has passed."""
+        cutoff = time.monotonic() - self.window
+        with self._write_lock:
+            return self._write(self._take(lambda _, entry: entry["since"] <= cutoff))
+
+    def _flush_loop(self):
+        while not self._stop.wait(max(self.window / 2, 0.05)):
+            try:
+                self.flush_due()
+            except Exception as e:
+                print("⚠️ Autosave flush error:", e)
+
+    def shutdown(self):
+        """Stop the flush thread and write everything still pending."""
+        self._stop.set()
+        written = self.flush()
+        if written:
+            print(f"✅ Autosave flushed {written} pending document(s) on shutdown")
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_autosave(db):
+    """
+    Return the process-wide autosave buffer (created on first use), or
+    None when buffering is disabled.
+    """
+    global _buffer
+    if AUTOSAVE_WINDOW_MS <= 0:
+        return None
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = AutosaveBuffer(db)
+            atexit.register(_buffer.shutdown)
+        return _buffer
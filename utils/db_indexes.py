@@ -0,0 +1,207 @@
+# backend/utils/db_indexes.py
+"""
+MongoDB index bootstrap and query-plan guard.
+
+INDEXES declares every index the app's queries rely on. At startup
+`ensure_indexes` creates the missing ones and leaves existing ones alone,
+so it is safe to run on every boot and from every web process. It never
+drops or rebuilds an index. A conflicting definition (for example an
+existing non-unique index on the same keys, or duplicates that block a
+unique index) is logged and left for a manual migration.
+
+QUERY_SHAPES lists the hot query of each route with sample values.
+`check_query_plans` runs explain() on every shape and reports each one
+whose winning plan contains a COLLSCAN. With DB_QUERY_PLAN_CHECK=1
+(dev / CI) startup fails on such a report. It can also be run by hand:
+
+    python -m utils.db_indexes          # create indexes, then check plans
+
+Config (env):
+    DB_ENSURE_INDEXES     "0" skips index creation at startup (default "1")
+    DB_QUERY_PLAN_CHECK   "1" fails startup when a route query scans a collection
+"""
+import os
+import sys
+import threading
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure, PyMongoError
+
+DB_ENSURE_INDEXES = os.getenv("DB_ENSURE_INDEXES", "1") != "0"
+DB_QUERY_PLAN_CHECK = os.getenv("DB_QUERY_PLAN_CHECK", "0") == "1"
+
+# collection → [(keys, options)]
+INDEXES = {
+    "documents": [
+        # check_doc_name / create_doc; one name per user
+        ([("user_id", ASCENDING), ("name", ASCENDING)], {"name": "user_name_unique", "unique": True}),
+        # get_user_docs pages / home_summary recent docs (_id breaks ties)
+        ([("user_id", ASCENDING), ("updated_at", DESCENDING), ("_id", DESCENDING)], {"name": "user_updated"}),
+        # favourites pages / home_summary favourites
+        ([("user_id", ASCENDING), ("favorite", ASCENDING), ("updated_at", DESCENDING), ("_id", DESCENDING)],
+         {"name": "user_favorite_updated"}),
+    ],
+    "users": [
+        # login / register / password reset
+        ([("email", ASCENDING)], {"name": "email_unique", "unique": True}),
+        ([("username", ASCENDING)], {"name": "username_unique", "unique": True, "sparse": True}),
+        # admin dashboard referral and registration counts
+        ([("referred_by", ASCENDING), ("role", ASCENDING)], {"name": "referral_role"}),
+        ([("role", ASCENDING), ("createdAt", ASCENDING)], {"name": "role_created"}),
+    ],
+    "user_activity": [
+        # track_usage: one row per user per day
+        ([("user_id", ASCENDING), ("date", ASCENDING)], {"name": "user_date"}),
+        # admin analytics: today's visitors, newest first
+        ([("date", ASCENDING), ("updated_at", DESCENDING)], {"name": "date_updated"}),
+    ],
+    "docai_requests": [
+        ([("email", ASCENDING)], {"name": "email"}),
+    ],
+    "tool_jobs": [
+        # expired-job purge
+        ([("expires_at", ASCENDING)], {"name": "expires_at_1"}),
+        # abandoned-job check at queue start
+        ([("status", ASCENDING), ("heartbeat_at", ASCENDING)], {"name": "status_heartbeat"}),
+    ],
+}
+
+# (collection, filter, sort, used by) — sample values only need the right types
+_SAMPLE_USER = "000000000000000000000000"
+QUERY_SHAPES = [
+    ("documents", {"user_id": _SAMPLE_USER, "name": "Untitled"}, None, "docs check_doc_name / create_doc"),
+    ("documents", {"user_id": _SAMPLE_USER}, [("updated_at", DESCENDING), ("_id", DESCENDING)],
+     "docs get_user_docs / home_summary"),
+    ("documents", {"user_id": _SAMPLE_USER, "$or": [
+        {"updated_at": {"$lt": datetime(2024, 1, 1)}},
+        {"updated_at": datetime(2024, 1, 1), "_id": {"$lt": ObjectId()}},
+    ]}, [("updated_at", DESCENDING), ("_id", DESCENDING)], "docs get_user_docs next page"),
+    ("documents", {"user_id": _SAMPLE_USER, "favorite": True}, [("updated_at", DESCENDING), ("_id", DESCENDING)],
+     "docs favourites page / home_summary favourites"),
+    ("documents", {"_id": ObjectId(), "user_id": _SAMPLE_USER}, None, "docs get / update / delete"),
+    ("users", {"email": "user@example.com"}, None, "auth login / register"),
+    ("users", {"username": "user"}, None, "auth check username / register"),
+    ("users", {"_id": ObjectId()}, None, "user profile"),
+    ("users", {"referred_by": "DOC1", "role": "student"}, None, "admin referral counts"),
+    ("users", {"role": "student", "createdAt": {"$gte": datetime(2024, 1, 1), "$lt": datetime(2024, 1, 2)}}, None,
+     "admin registration trend"),
+    ("user_activity", {"user_id": ObjectId(), "date": "2024-01-01"}, None, "activity track_usage"),
+    ("user_activity", {"date": "2024-01-01"}, [("updated_at", DESCENDING)], "admin analytics visitors"),
+    ("docai_requests", {"email": "user@example.com"}, None, "docai request"),
+    ("tool_jobs", {"expires_at": {"$lt": datetime(2024, 1, 1)}}, None, "job purge"),
+    ("tool_jobs", {"status": {"$in": ["queued", "running"]}, "heartbeat_at": {"$lt": datetime(2024, 1, 1)}}, None,
+     "abandoned-job check"),
+]
+
+
+# ----------------------------------------------------------
+# Index bootstrap
+# ----------------------------------------------------------
+def _existing_keys(collection):
+    """{key tuple: index info} for a collection's current indexes."""
+    return {tuple(info["key"]): info for info in collection.index_information().values()}
+
+
+def ensure_indexes(db):
+    """
+    Create every declared index that does not exist yet.
+    Returns the names of the indexes created.
+    """
+    created = []
+    for name, indexes in INDEXES.items():
+        collection = db[name]
+        try:
+            existing = _existing_keys(collection)
+        except PyMongoError as e:
+            print(f"⚠️ Could not list indexes of {name}: {e}")
+            continue
+
+        for keys, options in indexes:
+            current = existing.get(tuple(keys))
+            if current is not None:
+                if bool(current.get("unique")) != bool(options.get("unique")):
+                    print(f"⚠️ Index {current.get('name')} on {name} differs from {options['name']} (unique); left as is")
+                continue
+            try:
+                created.append(collection.create_index(keys, **options))
+            except OperationFailure as e:
+                # Duplicate keys or a conflicting definition: needs a manual fix
+                print(f"⚠️ Could not create index {options['name']} on {name}: {e}")
+
+    if created:
+        print(f"✅ Created MongoDB indexes: {', '.join(created)}")
+    return created
+
+
+# ----------------------------------------------------------
+# Query-plan guard
+# ----------------------------------------------------------
+def _stages(plan):
+    """Every stage name in an explain() plan tree."""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _stages(value)
+
+
+def check_query_plans(db):
+    """
+    explain() every route query shape; returns [(collection, filter, used by)]
+    for the ones whose winning plan scans the whole collection.
+    """
+    failures = []
+    for name, query, sort, used_by in QUERY_SHAPES:
+        cursor = db[name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        winning = cursor.explain().get("queryPlanner", {}).get("winningPlan", {})
+        if "COLLSCAN" in set(_stages(winning)):
+            failures.append((name, query, used_by))
+    return failures
+
+
+def bootstrap_indexes(db):
+    """
+    Startup hook: ensure indexes and, in check mode, fail on collection
+    scans. Index creation runs in the background unless checking.
+    """
+    if db is None or not (DB_ENSURE_INDEXES or DB_QUERY_PLAN_CHECK):
+        return
+
+    def run():
+        if DB_ENSURE_INDEXES:
+            try:
+                ensure_indexes(db)
+            except PyMongoError as e:
+                print("❌ Index bootstrap failed:", e)
+        if DB_QUERY_PLAN_CHECK:
+            failures = check_query_plans(db)
+            for name, query, used_by in failures:
+                print(f"❌ COLLSCAN on {name} for {used_by}: {query}")
+            if failures:
+                raise RuntimeError(f"{len(failures)} route queries scan whole collections")
+            print("✅ All route queries use an index")
+
+    if DB_QUERY_PLAN_CHECK:
+        run()
+    else:
+        threading.Thread(target=run, name="index-bootstrap", daemon=True).start()
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    load_dotenv()
+    database = MongoClient(os.getenv("MONGODB_URI"), serverSelectionTimeoutMS=5000)["viadocsDB"]
+    ensure_indexes(database)
+    problems = check_query_plans(database)
+    for coll, flt, user in problems:
+        print(f"❌ COLLSCAN on {coll} for {user}: {flt}")
+    print("✅ All route queries use an index" if not problems else f"❌ {len(problems)} collection scans")
+    sys.exit(1 if problems else 0)
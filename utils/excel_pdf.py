@@ -0,0 +1,375 @@
+# backend/utils/excel_pdf.py
+"""
+Native Excel → PDF for plain tabular workbooks.
+
+Most excel-to-pdf uploads are a single CSV-like sheet. Starting
+LibreOffice for those is the slow part, so a classifier first looks inside
+the .xlsx package (zip listing + a streaming pass over the sheet XML,
+no workbook load) and only sends workbooks LibreOffice is needed for to
+LibreOffice:
+
+- charts, images, shapes, pivot tables, embedded objects
+- merged cells, hidden rows/columns, print areas / print titles
+- formulas without a cached value, or volatile ones (NOW, RAND, ...)
+  that LibreOffice would recalculate
+- legacy .xls files and very large sheets
+
+Everything else is read with openpyxl (read-only, cached values) and drawn
+straight onto a reportlab canvas as a paginated grid with the bundled
+DejaVu fonts: one table per visible sheet, columns sized to their
+content, numbers right-aligned, portrait or landscape as the width needs.
+
+Config (env):
+    EXCEL_NATIVE_PDF        "0" always uses LibreOffice (default "1")
+    EXCEL_NATIVE_MAX_CELLS  larger workbooks go to LibreOffice (default 200000)
+    EXCEL_PDF_FONT_DIR      folder holding DejaVuSans(.ttf / -Bold.ttf)
+"""
+import datetime
+import os
+import re
+import threading
+import zipfile
+import xml.etree.ElementTree as ET
+from openpyxl import load_workbook
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.pdfgen import canvas
+
+EXCEL_NATIVE_PDF = os.getenv("EXCEL_NATIVE_PDF", "1") != "0"
+EXCEL_NATIVE_MAX_CELLS = int(os.getenv("EXCEL_NATIVE_MAX_CELLS", "200000"))
+EXCEL_PDF_FONT_DIR = os.getenv(
+    "EXCEL_PDF_FONT_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fonts", "dejavu-fonts-ttf-2.37", "ttf"),
+)
+
+# Package parts that mean "not a plain table"
+COMPLEX_PARTS = {
+    "xl/charts/": "charts",
+    "xl/chartsheets/": "chart sheets",
+    "xl/drawings/": "images or shapes",
+    "xl/media/": "images",
+    "xl/pivotTables/": "pivot tables",
+    "xl/embeddings/": "embedded objects",
+}
+VOLATILE_FUNCTIONS = re.compile(r"\b(NOW|TODAY|RAND|RANDBETWEEN|OFFSET|INDIRECT|CELL|INFO)\s*\(", re.IGNORECASE)
+
+# Layout (points)
+MARGIN = 36
+FOOTER = 16
+BASE_FONT_SIZE = 9
+MIN_FONT_SIZE = 6
+CELL_PADDING = 3
+MIN_COLUMN_WIDTH = 18
+MAX_COLUMN_WIDTH = 220
+ROW_HEIGHT_RATIO = 1.6
+
+FONT = "DejaVuSans"
+BOLD_FONT = "DejaVuSans-Bold"
+
+
+class NativeExcelUnsupported(Exception):
+    """The workbook needs LibreOffice after all."""
+
+
+# ----------------------------------------------------------------------
+# Classifier
+# ----------------------------------------------------------------------
+def _local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def _sheet_issue(sheet_xml):
+    """First reason a worksheet is not a plain table, or None. Also returns its cell count."""
+    cells = 0
+    for _, elem in ET.iterparse(sheet_xml, events=("end",)):
+        tag = _local(elem.tag)
+        if tag == "c":
+            cells += 1
+            formula = value = None
+            for child in elem:
+                name = _local(child.tag)
+                if name == "f":
+                    formula = child
+                elif name == "v":
+                    value = child
+            if formula is not None:
+                if value is None or not value.text:
+                    return "formulas without cached values", cells
+                if formula.text and VOLATILE_FUNCTIONS.search(formula.text):
+                    return "volatile formulas", cells
+            elem.clear()
+        elif tag == "row":
+            if elem.get("hidden") in ("1", "true"):
+                return "hidden rows", cells
+            elem.clear()
+        elif tag == "col" and elem.get("hidden") in ("1", "true"):
+            return "hidden columns", cells
+        elif tag == "mergeCell":
+            return "merged cells", cells
+        if cells > EXCEL_NATIVE_MAX_CELLS:
+            return "too many cells", cells
+    return None, cells
+
+
+def classify_workbook(path):
+    """
+    (True, None) when `path` can be rendered natively,
+    else (False, reason) and it should go to LibreOffice.
+    """
+    if not EXCEL_NATIVE_PDF:
+        return False, "native rendering disabled"
+    if not zipfile.is_zipfile(path):
+        return False, "not an .xlsx package"
+
+    try:
+        return _classify_package(path)
+    except (zipfile.BadZipFile, ET.ParseError, KeyError) as e:
+        return False, f"unreadable package ({e})"
+
+
+def _classify_package(path):
+    with zipfile.ZipFile(path) as package:
+        names = package.namelist()
+        for name in names:
+            for prefix, reason in COMPLEX_PARTS.items():
+                if name.startswith(prefix):
+                    return False, reason
+
+        if "xl/workbook.xml" in names:
+            with package.open("xl/workbook.xml") as f:
+                for _, elem in ET.iterparse(f, events=("end",)):
+                    if _local(elem.tag) == "definedName" and elem.get("name", "").startswith("_xlnm.Print_"):
+                        return False, "print areas or titles"
+
+        total_cells = 0
+        for name in names:
+            if not (name.startswith("xl/worksheets/") and name.endswith(".xml")):
+                continue
+            with package.open(name) as f:
+                reason, cells = _sheet_issue(f)
+            total_cells += cells
+            if reason is None and total_cells > EXCEL_NATIVE_MAX_CELLS:
+                reason = "too many cells"
+            if reason is not None:
+                return False, reason
+
+    return True, None
+
+
+# ----------------------------------------------------------------------
+# Cell text
+# ----------------------------------------------------------------------
+def _decimals(number_format):
+    match = re.search(r"\.([0#]+)", number_format)
+    return len(match.group(1)) if match else 0
+
+
+def format_value(value, number_format="General"):
+    """Display text for a cached cell value (common number formats only)."""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, datetime.datetime):
+        if value.time() == datetime.time(0):
+            return value.date().isoformat()
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return str(value)
+    if isinstance(value, (int, float)):
+        number_format = (number_format or "General").split(";")[0]
+        if number_format == "General" or not re.search(r"[0#]", number_format):
+            if isinstance(value, float) and not value.is_integer():
+                return f"{value:.10g}"
+            return str(int(value))
+        decimals = _decimals(number_format)
+        if "%" in number_format:
+            return f"{value * 100:.{decimals}f}%"
+        grouping = "," if "," in number_format else ""
+        return f"{value:{grouping}.{decimals}f}"
+    return str(value)
+
+
+# ----------------------------------------------------------------------
+# Rendering
+# ----------------------------------------------------------------------
+_fonts_registered = False
+_fonts_lock = threading.Lock()
+
+
+def _register_fonts():
+    global _fonts_registered
+    with _fonts_lock:
+        if not _fonts_registered:
+            pdfmetrics.registerFont(TTFont(FONT, os.path.join(EXCEL_PDF_FONT_DIR, "DejaVuSans.ttf")))
+            pdfmetrics.registerFont(TTFont(BOLD_FONT, os.path.join(EXCEL_PDF_FONT_DIR, "DejaVuSans-Bold.ttf")))
+            _fonts_registered = True
+
+
+def _text_width(text, font, cache):
+    """Width of `text` at BASE_FONT_SIZE (memoised: sheet columns repeat a lot)."""
+    key = (text, font)
+    width = cache.get(key)
+    if width is None:
+        width = cache[key] = pdfmetrics.stringWidth(text, font, BASE_FONT_SIZE)
+    return width
+
+
+def _read_sheet(ws):
+    """
+    Used range of a worksheet as rows of (text, bold, numeric, width at
+    BASE_FONT_SIZE), trimmed of empty outer rows and columns.
+    """
+    rows = []
+    widths = {}
+    first_col, last_col = None, -1
+    for row in ws.iter_rows():
+        cells = []
+        for index, cell in enumerate(row):
+            value = getattr(cell, "value", None)
+            text = format_value(value, getattr(cell, "number_format", "General"))
+            if not text:
+                cells.append(None)
+                continue
+            bold = bool(cell.font is not None and cell.font.b)
+            numeric = isinstance(value, (int, float)) and not isinstance(value, bool)
+            width = _text_width(text, BOLD_FONT if bold else FONT, widths)
+            cells.append((text, bold, numeric, width))
+            first_col = index if first_col is None else min(first_col, index)
+            last_col = max(last_col, index)
+        rows.append(cells)
+
+    if first_col is None:
+        return []
+
+    used = [i for i, cells in enumerate(rows) if any(cells)]
+    rows = rows[used[0]:used[-1] + 1]
+    return [(cells + [None] * (last_col + 1 - len(cells)))[first_col:last_col + 1] for cells in rows]
+
+
+def _layout(rows):
+    """Page size, font size and column widths that fit the sheet's width."""
+    widths = [MIN_COLUMN_WIDTH] * len(rows[0])
+    for cells in rows:
+        for i, cell in enumerate(cells):
+            if cell is not None:
+                widths[i] = max(widths[i], min(cell[3] + 2 * CELL_PADDING, MAX_COLUMN_WIDTH))
+
+    natural = sum(widths)
+    for page_size in (A4, landscape(A4)):
+        if natural <= page_size[0] - 2 * MARGIN:
+            return page_size, BASE_FONT_SIZE, widths
+
+    page_size = landscape(A4)
+    scale = (page_size[0] - 2 * MARGIN) / natural
+    if BASE_FONT_SIZE * scale < MIN_FONT_SIZE:
+        raise NativeExcelUnsupported("sheet too wide for one page")
+    return page_size, BASE_FONT_SIZE * scale, [w * scale for w in widths]
+
+
+def _fit(text, font, size, room):
+    """`text` clipped with an ellipsis to `room` points."""
+    if pdfmetrics.stringWidth(text, font, size) <= room:
+        return text
+    while text and pdfmetrics.stringWidth(text + "…", font, size) > room:
+        text = text[:max(0, min(len(text) - 1, int(len(text) * 0.9)))]
+    return text + "…" if text else ""
+
+
+def _draw_sheet(pdf, title, rows):
+    page_size, size, widths = _layout(rows)
+    scale = size / BASE_FONT_SIZE
+    row_height = size * ROW_HEIGHT_RATIO
+    page_w, page_h = page_size
+    per_page = max(1, int((page_h - 2 * MARGIN - FOOTER) // row_height))
+    pages = (len(rows) + per_page - 1) // per_page
+
+    edges = [MARGIN]
+    for w in widths:
+        edges.append(edges[-1] + w)
+
+    for page in range(pages):
+        chunk = rows[page * per_page:(page + 1) * per_page]
+        pdf.setPageSize(page_size)
+        top = page_h - MARGIN
+
+        # Grid
+        bottom = top - len(chunk) * row_height
+        pdf.setStrokeGray(0.75)
+        pdf.setLineWidth(0.25)
+        for x in edges:
+            pdf.line(x, top, x, bottom)
+        for n in range(len(chunk) + 1):
+            y = top - n * row_height
+            pdf.line(edges[0], y, edges[-1], y)
+
+        # Cells: one text object per page, font switched only when it changes
+        pdf.setFillGray(0)
+        baseline = (row_height - size) / 2 + size * 0.2
+        text_obj = pdf.beginText()
+        current_font = None
+        for n, cells in enumerate(chunk):
+            y = top - (n + 1) * row_height + baseline
+            for i, cell in enumerate(cells):
+                if cell is None:
+                    continue
+                text, bold, numeric, width = cell
+                font = BOLD_FONT if bold else FONT
+                width *= scale
+                room = widths[i] - 2 * CELL_PADDING
+                if width > room:
+                    text = _fit(text, font, size, room)
+                    width = pdfmetrics.stringWidth(text, font, size)
+                if font != current_font:
+                    text_obj.setFont(font, size)
+                    current_font = font
+                x = edges[i + 1] - CELL_PADDING - width if numeric else edges[i] + CELL_PADDING
+                text_obj.setTextOrigin(x, y)
+                text_obj.textOut(text)
+        pdf.drawText(text_obj)
+
+        # Footer
+        pdf.setFont(FONT, 7)
+        pdf.setFillGray(0.4)
+        footer = f"{title} — Page {page + 1} of {pages}" if title else f"Page {page + 1} of {pages}"
+        pdf.drawCentredString(page_w / 2, MARGIN / 2, footer)
+        pdf.showPage()
+
+    return pages
+
+
+# ----------------------------------------------------------------------
+# Public API
+# ----------------------------------------------------------------------
+def excel_to_pdf(excel_path, pdf_path):
+    """
+    Render the visible sheets of a classified-simple workbook to `pdf_path`.
+    Returns the page count; raises NativeExcelUnsupported when the sheet
+    does not fit the native layout after all.
+    """
+    _register_fonts()
+
+    wb = load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        sheets = [
+            (ws.title, _read_sheet(ws))
+            for ws in wb.worksheets
+            if getattr(ws, "sheet_state", "visible") == "visible"
+        ]
+    finally:
+        wb.close()
+
+    sheets = [(title, rows) for title, rows in sheets if rows]
+    if not sheets:
+        raise NativeExcelUnsupported("no cell data")
+
+    pdf = canvas.Canvas(pdf_path, pageCompression=1)
+    pdf.setTitle(os.path.splitext(os.path.basename(excel_path))[0])
+    pages = 0
+    for title, rows in sheets:
+        pages += _draw_sheet(pdf, title if len(sheets) > 1 else None, rows)
+    pdf.save()
+    return pages
@@ -0,0 +1,299 @@
+# backend/utils/image_pdf.py
+"""
+Images → PDF builder with bounded memory.
+
+- JPEG uploads are embedded as-is (/DCTDecode passthrough): no decode, no
+  re-encode, no quality loss. Only the header is read (size, colour mode,
+  EXIF orientation); the orientation is applied through the page's
+  placement matrix instead of rotating pixels.
+- Other formats (PNG, WebP, GIF, TIFF, ...) are decoded, EXIF-transposed
+  and Flate-compressed in a process pool, with alpha kept as an /SMask.
+- The PDF is written object by object straight to disk: each image is
+  copied (JPEG) or written (decoded) and then dropped, so memory depends
+  on the pool window, not on the number of images.
+
+Page sizes:
+    image   page matches the image, 1 px = 1 pt (default, as before)
+    a4      A4, orientation following the image, image fitted and centred
+    letter  US Letter, same fitting
+
+Config (env):
+    IMAGE_DECODE_WORKERS  decode processes for non-JPEG inputs (default: CPU count)
+"""
+import os
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+IMAGE_DECODE_WORKERS = int(os.getenv("IMAGE_DECODE_WORKERS", str(os.cpu_count() or 1)))
+
+PAGE_SIZES = {
+    "image": None,
+    "a4": (595.28, 841.89),
+    "letter": (612.0, 792.0),
+}
+
+JPEG_COLORSPACES = {"L": "/DeviceGray", "RGB": "/DeviceRGB", "CMYK": "/DeviceCMYK"}
+
+# EXIF orientation → placement of the unit square, as a PDF matrix [a b c d e f]
+ORIENTATION_MATRICES = {
+    1: (1, 0, 0, 1, 0, 0),
+    2: (-1, 0, 0, 1, 1, 0),
+    3: (-1, 0, 0, -1, 1, 1),
+    4: (1, 0, 0, -1, 0, 1),
+    5: (0, -1, -1, 0, 1, 1),
+    6: (0, -1, 1, 0, 0, 1),
+    7: (0, 1, 1, 0, 0, 0),
+    8: (0, 1, -1, 0, 1, 0),
+}
+
+EXIF_ORIENTATION = 0x0112
+COPY_CHUNK = 1024 * 1024
+
+
+# ----------------------------------------------------------------------
+# Image inspection / decoding
+# ----------------------------------------------------------------------
+def _open_image(path):
+    try:
+        return Image.open(path)
+    except UnidentifiedImageError:
+        raise ValueError(f"Unsupported image file: {os.path.basename(path)}")
+
+
+def jpeg_info(path):
+    """
+    Header-only look at a JPEG: (width, height, mode, orientation, inverted)
+    or None when the file must be decoded instead.
+    """
+    with _open_image(path) as img:
+        if img.format not in ("JPEG", "MPO") or img.mode not in JPEG_COLORSPACES:
+            return None
+        orientation = img.getexif().get(EXIF_ORIENTATION, 1)
+        if orientation not in ORIENTATION_MATRICES:
+            orientation = 1
+        # Adobe CMYK JPEGs store inverted channels
+        inverted = img.mode == "CMYK" and "adobe" in img.info
+        return img.width, img.height, img.mode, orientation, inverted
+
+
+def decode_image(path):
+    """Pool task: decode, transpose and deflate one non-JPEG image."""
+    with _open_image(path) as img:
+        img = ImageOps.exif_transpose(img)
+
+        alpha = None
+        if img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info):
+            img = img.convert("LA" if img.mode == "LA" else "RGBA")
+            alpha = img.getchannel("A")
+            img = img.convert("L" if img.mode == "LA" else "RGB")
+        elif img.mode in ("1", "I", "I;16", "F"):
+            img = img.convert("L")
+        elif img.mode not in ("L", "RGB", "CMYK"):
+            img = img.convert("RGB")
+
+        # Fully opaque alpha is just overhead
+        if alpha is not None and alpha.getextrema() == (255, 255):
+            alpha = None
+
+        return {
+            "width": img.width,
+            "height": img.height,
+            "colorspace": JPEG_COLORSPACES[img.mode],
+            "data": zlib.compress(img.tobytes(), 6),
+            "smask": zlib.compress(alpha.tobytes(), 6) if alpha is not None else None,
+        }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_decode_pool():
+    """Process-wide decode pool (created on first use)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=max(1, IMAGE_DECODE_WORKERS))
+        return _pool
+
+
+def _prepared_images(image_paths):
+    """
+    Yield ("jpeg", path, info) or ("decoded", path, data) in input order.
+    Decodes run ahead in the pool, at most a small window at a time.
+    """
+    pending = deque()
+    window = max(1, IMAGE_DECODE_WORKERS) * 2
+    pool = None
+
+    for path in image_paths:
+        info = jpeg_info(path)
+        if info is not None:
+            pending.append(("jpeg", path, info))
+        else:
+            pool = pool or get_decode_pool()
+            pending.append(("decoded", path, pool.submit(decode_image, path)))
+
+        while pending and (len(pending) > window or pending[0][0] == "jpeg"):
+            yield _resolve(pending.popleft())
+
+    while pending:
+        yield _resolve(pending.popleft())
+
+
+def _resolve(item):
+    kind, path, value = item
+    if kind == "decoded":
+        value = value.result()
+    return kind, path, value
+
+
+# ----------------------------------------------------------------------
+# Incremental PDF writer
+# ----------------------------------------------------------------------
+class _PdfWriter:
+    """Minimal PDF writer: objects go to disk as soon as they are added."""
+
+    def __init__(self, fileobj):
+        self.out = fileobj
+        self.offsets = {}
+        self.next_id = 3  # 1 = catalog, 2 = page tree
+        self.page_ids = []
+        self.out.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def reserve(self):
+        obj_id = self.next_id
+        self.next_id += 1
+        return obj_id
+
+    def _begin(self, obj_id):
+        self.offsets[obj_id] = self.out.tell()
+        self.out.write(f"{obj_id} 0 obj\n".encode())
+
+    def write_object(self, obj_id, body):
+        self._begin(obj_id)
+        self.out.write(body.encode() + b"\nendobj\n")
+
+    def write_stream(self, obj_id, entries, data=None, path=None):
+        """Stream object from bytes, or copied in chunks from a file."""
+        length = len(data) if data is not None else os.path.getsize(path)
+        self._begin(obj_id)
+        self.out.write(f"<< {entries} /Length {length} >>\nstream\n".encode())
+        if data is not None:
+            self.out.write(data)
+        else:
+            with open(path, "rb") as src:
+                for chunk in iter(lambda: src.read(COPY_CHUNK), b""):
+                    self.out.write(chunk)
+        self.out.write(b"\nendstream\nendobj\n")
+
+    def add_page(self, width, height, image_id, matrix):
+        page_id, content_id = self.reserve(), self.reserve()
+        content = ("q " + " ".join(_num(v) for v in matrix) + " cm /Im0 Do Q").encode()
+        self.write_stream(content_id, "", data=content)
+        self.write_object(
+            page_id,
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {_num(width)} {_num(height)}] "
+            f"/Resources << /XObject << /Im0 {image_id} 0 R >> >> /Contents {content_id} 0 R >>",
+        )
+        self.page_ids.append(page_id)
+
+    def close(self):
+        kids = " ".join(f"{page_id} 0 R" for page_id in self.page_ids)
+        self.write_object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>")
+        self.write_object(1, "<< /Type /Catalog /Pages 2 0 R >>")
+
+        xref_offset = self.out.tell()
+        size = self.next_id
+        self.out.write(f"xref\n0 {size}\n0000000000 65535 f \n".encode())
+        for obj_id in range(1, size):
+            self.out.write(f"{self.offsets[obj_id]:010d} 00000 n \n".encode())
+        self.out.write(f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+
+
+def _num(value):
+    return f"{value:.4f}".rstrip("0").rstrip(".") if isinstance(value, float) else str(value)
+
+
+def _placement(width, height, orientation, page_size):
+    """
+    Page size and image matrix for an image stored as width×height pixels.
+    Returns (page_width, page_height, matrix).
+    """
+    # Displayed size after EXIF orientation (5–8 swap the axes)
+    shown_w, shown_h = (height, width) if orientation >= 5 else (width, height)
+
+    target = PAGE_SIZES[page_size]
+    if target is None:
+        page_w, page_h = shown_w, shown_h
+        box = (0, 0, shown_w, shown_h)
+    else:
+        page_w, page_h = target if shown_h >= shown_w else (target[1], target[0])
+        scale = min(page_w / shown_w, page_h / shown_h)
+        draw_w, draw_h = shown_w * scale, shown_h * scale
+        box = ((page_w - draw_w) / 2, (page_h - draw_h) / 2, draw_w, draw_h)
+
+    a, b, c, d, e, f = ORIENTATION_MATRICES[orientation]
+    x, y, w, h = box
+    matrix = (a * w, b * h, c * w, d * h, e * w + x, f * h + y)
+    return page_w, page_h, matrix
+
+
+# ----------------------------------------------------------------------
+# Public API
+# ----------------------------------------------------------------------
+def images_to_pdf(image_paths, output_path, page_size="image", progress=None):
+    """
+    Write `image_paths` (in order), one per page, to `output_path`.
+    `progress(done, total)` is called after every page.
+    Returns the number of JPEGs embedded without re-encoding.
+    """
+    if page_size not in PAGE_SIZES:
+        raise ValueError(f"page_size must be one of {', '.join(PAGE_SIZES)}")
+
+    passthrough = 0
+    with open(output_path, "wb") as out:
+        writer = _PdfWriter(out)
+
+        for done, (kind, path, value) in enumerate(_prepared_images(image_paths), start=1):
+            image_id = writer.reserve()
+
+            if kind == "jpeg":
+                width, height, mode, orientation, inverted = value
+                entries = (
+                    f"/Type /XObject /Subtype /Image /Width {width} /Height {height} "
+                    f"/ColorSpace {JPEG_COLORSPACES[mode]} /BitsPerComponent 8 /Filter /DCTDecode"
+                )
+                if inverted:
+                    entries += " /Decode [1 0 1 0 1 0 1 0]"
+                writer.write_stream(image_id, entries, path=path)
+                passthrough += 1
+            else:
+                width, height, orientation = value["width"], value["height"], 1
+                entries = (
+                    f"/Type /XObject /Subtype /Image /Width {width} /Height {height} "
+                    f"/ColorSpace {value['colorspace']} /BitsPerComponent 8 /Filter /FlateDecode"
+                )
+                if value["smask"] is not None:
+                    smask_id = writer.reserve()
+                    writer.write_stream(
+                        smask_id,
+                        f"/Type /XObject /Subtype /Image /Width {width} /Height {height} "
+                        f"/ColorSpace /DeviceGray /BitsPerComponent 8 /Filter /FlateDecode",
+                        data=value["smask"],
+                    )
+                    entries += f" /SMask {smask_id} 0 R"
+                writer.write_stream(image_id, entries, data=value["data"])
+
+            page_w, page_h, matrix = _placement(width, height, orientation, page_size)
+            writer.add_page(page_w, page_h, image_id, matrix)
+
+            if progress is not None:
+                progress(done, len(image_paths))
+
+        writer.close()
+
+    return passthrough
@@ -0,0 +1,417 @@
+# backend/utils/job_queue.py
+"""
+Optional asynchronous execution for long-running tool conversions.
+
+A tool route hands its conversion function to `run_tool`. Normally the
+function runs inside the request as before; when the client asks for
+async mode (`?async=1` or an `async` form field) the function is queued
+on a worker pool instead and the route answers 202 with a job id. The
+client then polls GET /api/tools/jobs/<job_id> and downloads the output
+from GET /api/tools/jobs/<job_id>/result.
+
+Job state lives in MongoDB (collection `tool_jobs`, outputs in the GridFS
+bucket `tool_job_results`) so any web node can answer a poll. A local
+in-process backend is available for tests and single-node dev setups.
+
+A conversion function takes keyword arguments and returns a result dict:
+    {"path": ..., "download_name": ..., "mimetype": ..., "headers": {...}}
+
+Jobs record the process that owns them (host:pid) and a heartbeat that
+the owner refreshes while the job is queued or running. When a worker
+dies (timeout kill, OOM, redeploy), its jobs stop beating. They are
+marked failed when the queue starts and whenever one is polled, so
+clients are not left polling a job that will never finish.
+
+Config (env):
+    JOB_BACKEND      "mongo" (default) or "local"
+    JOB_WORKERS      worker threads per web process (default 2)
+    JOB_TTL_HOURS    how long finished jobs and outputs are kept (default 24)
+    JOB_RESULTS_DIR  output folder for the local backend
+    JOB_HEARTBEAT_INTERVAL  seconds between heartbeats of active jobs (default 30)
+    JOB_STALE_AFTER         seconds without a heartbeat before a job counts as dead (default 120)
+"""
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app, jsonify, request, send_file
+from werkzeug.wsgi import ClosingIterator
+from utils.result_cache import cache_store
+from utils.workspace import hold_workspaces
+
+JOB_BACKEND = os.getenv("JOB_BACKEND", "mongo").lower()
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_TTL_HOURS = int(os.getenv("JOB_TTL_HOURS", "24"))
+JOB_RESULTS_DIR = os.getenv("JOB_RESULTS_DIR", os.path.join(os.getcwd(), "uploads", "jobs"))
+JOB_HEARTBEAT_INTERVAL = int(os.getenv("JOB_HEARTBEAT_INTERVAL", "30"))
+JOB_STALE_AFTER = int(os.getenv("JOB_STALE_AFTER", "120"))
+
+ACTIVE_STATUSES = ("queued", "running")
+STALE_ERROR = "The worker running this job stopped before it finished"
+
+_progress = threading.local()
+
+
+def report_progress(done, total, message=None):
+    """Record progress for the job running on this thread (no-op outside jobs)."""
+    reporter = getattr(_progress, "reporter", None)
+    if reporter is not None:
+        reporter(done, total, message)
+
+
+def cleanup_paths(paths):
+    """Remove scratch files / folders, ignoring ones already gone."""
+    for path in paths or []:
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.exists(path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def cleanup_after(response, paths):
+    """
+    Remove scratch `paths` once `response` has been sent. send_file
+    responses are direct passthrough, which skips werkzeug's close
+    callbacks, so their body is wrapped instead.
+    """
+    if not paths:
+        return response
+
+    def cleanup():
+        cleanup_paths(paths)
+
+    if response.direct_passthrough:
+        response.response = ClosingIterator(response.response, cleanup)
+    else:
+        response.call_on_close(cleanup)
+    return response
+
+
+# ----------------------------------------------------------
+# Job stores
+# ----------------------------------------------------------
+class LocalJobStore:
+    """In-process job state; outputs are kept under JOB_RESULTS_DIR."""
+
+    def __init__(self, root=JOB_RESULTS_DIR):
+        self.root = root
+        self._jobs = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def create(self, job):
+        with self._lock:
+            self._jobs[job["_id"]] = dict(job)
+
+    def update(self, job_id, fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def heartbeat(self, job_ids, now):
+        with self._lock:
+            for job_id in job_ids:
+                job = self._jobs.get(job_id)
+                if job and job["status"] in ACTIVE_STATUSES:
+                    job["heartbeat_at"] = now
+
+    def fail_stale(self, cutoff, job_id=None):
+        now, failed = datetime.utcnow(), 0
+        with self._lock:
+            for job in self._jobs.values():
+                if job_id is not None and job["_id"] != job_id:
+                    continue
+                if job["status"] in ACTIVE_STATUSES and job.get("heartbeat_at", job["updated_at"]) < cutoff:
+                    job.update({"status": "failed", "error": STALE_ERROR, "updated_at": now})
+                    failed += 1
+        return failed
+
+    def save_result(self, job_id, result):
+        folder = os.path.join(self.root, job_id)
+        os.makedirs(folder, exist_ok=True)
+        stored = os.path.join(folder, os.path.basename(result["path"]))
+        shutil.copyfile(result["path"], stored)
+        return {"result_path": stored}
+
+    def open_result(self, job):
+        return open(job["result_path"], "rb")
+
+    def purge_expired(self):
+        now = datetime.utcnow()
+        with self._lock:
+            expired = [j for j in self._jobs.values() if j["expires_at"] < now]
+            for job in expired:
+                self._jobs.pop(job["_id"], None)
+        for job in expired:
+            shutil.rmtree(os.path.join(self.root, job["_id"]), ignore_errors=True)
+
+
+class MongoJobStore:
+    """Job state in `tool_jobs`, outputs in the `tool_job_results` GridFS bucket."""
+
+    def __init__(self, db):
+        import gridfs
+
+        self.jobs = db["tool_jobs"]
+        self.results = gridfs.GridFSBucket(db, bucket_name="tool_job_results")
+
+    def create(self, job):
+        self.jobs.insert_one(job)
+
+    def update(self, job_id, fields):
+        self.jobs.update_one({"_id": job_id}, {"$set": fields})
+
+    def get(self, job_id):
+        return self.jobs.find_one({"_id": job_id})
+
+    def heartbeat(self, job_ids, now):
+        self.jobs.update_many(
+            {"_id": {"$in": list(job_ids)}, "status": {"$in": list(ACTIVE_STATUSES)}},
+            {"$set": {"heartbeat_at": now}},
+        )
+
+    def fail_stale(self, cutoff, job_id=None):
+        query = {
+            "status": {"$in": list(ACTIVE_STATUSES)},
+            "$or": [
+                {"heartbeat_at": {"$lt": cutoff}},
+                # Jobs queued before heartbeats existed
+                {"heartbeat_at": {"$exists": False}, "updated_at": {"$lt": cutoff}},
+            ],
+        }
+        if job_id is not None:
+            query["_id"] = job_id
+        result = self.jobs.update_many(
+            query, {"$set": {"status": "failed", "error": STALE_ERROR, "updated_at": datetime.utcnow()}}
+        )
+        return result.modified_count
+
+    def save_result(self, job_id, result):
+        with open(result["path"], "rb") as f:
+            file_id = self.results.upload_from_stream(
+                result["download_name"], f, metadata={"job_id": job_id}
+            )
+        return {"result_file_id": file_id}
+
+    def open_result(self, job):
+        return self.results.open_download_stream(job["result_file_id"])
+
+    def purge_expired(self):
+        # No TTL index: the job document must outlive its GridFS output
+        now = datetime.utcnow()
+        for job in self.jobs.find({"expires_at": {"$lt": now}}, {"result_file_id": 1}):
+            if job.get("result_file_id") is not None:
+                try:
+                    self.results.delete(job["result_file_id"])
+                except Exception:
+                    pass
+            self.jobs.delete_one({"_id": job["_id"]})
+
+
+# ----------------------------------------------------------
+# Queue
+# ----------------------------------------------------------
+class JobQueue:
+    def __init__(self, store, workers=JOB_WORKERS):
+        self.store = store
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="tool-job")
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._active = {}  # job id → workspaces it holds
+        self._active_lock = threading.Lock()
+        threading.Thread(target=self._heartbeat_loop, name="tool-job-heartbeat", daemon=True).start()
+
+    def fail_stale(self, job_id=None):
+        """Mark active jobs without a recent heartbeat as failed."""
+        cutoff = datetime.utcnow() - timedelta(seconds=JOB_STALE_AFTER)
+        return self.store.fail_stale(cutoff, job_id)
+
+    def get(self, job_id):
+        """Job document for a poll; an active job whose owner died comes back failed."""
+        job = self.store.get(job_id)
+        if job and job["status"] in ACTIVE_STATUSES and self.fail_stale(job_id):
+            job = self.store.get(job_id)
+        return job
+
+    def _heartbeat_loop(self):
+        # Jobs left behind by workers that died; off the startup path so a
+        # slow or unreachable MongoDB never blocks the app from booting
+        try:
+            failed = self.fail_stale()
+            if failed:
+                print(f"⚠️ Marked {failed} abandoned job(s) as failed")
+        except Exception as e:
+            print("⚠️ Stale job check failed:", e)
+
+        while True:
+            time.sleep(JOB_HEARTBEAT_INTERVAL)
+            with self._active_lock:
+                active = dict(self._active)
+            if not active:
+                continue
+            for cleanup in active.values():
+                hold_workspaces(cleanup)
+            job_ids = list(active)
+            try:
+                self.store.heartbeat(job_ids, datetime.utcnow())
+            except Exception as e:
+                print("⚠️ Job heartbeat failed:", e)
+
+    def submit(self, tool, func, kwargs, cache_key=None, cleanup=None):
+        """Queue `func(**kwargs)` and return the new job document."""
+        try:
+            self.store.purge_expired()
+        except Exception as e:
+            print("⚠️ Job purge failed:", e)
+
+        now = datetime.utcnow()
+        job = {
+            "_id": uuid.uuid4().hex,
+            "tool": tool,
+            "status": "queued",
+            "progress": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+            "owner": self.owner,
+            "heartbeat_at": now,
+            "expires_at": now + timedelta(hours=JOB_TTL_HOURS),
+        }
+        self.store.create(job)
+        # Keep the workspace janitor off the job's inputs while it waits
+        hold_workspaces(cleanup)
+        with self._active_lock:
+            self._active[job["_id"]] = cleanup
+        self.executor.submit(self._run, job["_id"], func, kwargs, cache_key, cleanup)
+        print(f"🕒 Queued {tool} job {job['_id']}")
+        return job
+
+    def _run(self, job_id, func, kwargs, cache_key, cleanup):
+        def reporter(done, total, message=None):
+            self.store.update(job_id, {
+                "progress": {"done": done, "total": total, "message": message},
+                "updated_at": datetime.utcnow(),
+                "heartbeat_at": datetime.utcnow(),
+            })
+
+        _progress.reporter = reporter
+        now = datetime.utcnow()
+        self.store.update(job_id, {"status": "running", "updated_at": now, "heartbeat_at": now})
+
+        try:
+            result = func(**kwargs)
+            fields = self.store.save_result(job_id, result)
+            cache_store(
+                cache_key, result["path"], result["download_name"],
+                result["mimetype"], result.get("headers"),
+            )
+            fields.update({
+                "status": "done",
+                "download_name": result["download_name"],
+                "mimetype": result["mimetype"],
+                "headers": result.get("headers", {}),
+                "updated_at": datetime.utcnow(),
+            })
+            self.store.update(job_id, fields)
+            print(f"✅ Job {job_id} finished")
+        except Exception as e:
+            print(f"❌ Job {job_id} failed:", e)
+            self.store.update(job_id, {
+                "status": "failed",
+                "error": str(e),
+                "updated_at": datetime.utcnow(),
+            })
+        finally:
+            _progress.reporter = None
+            with self._active_lock:
+                self._active.pop(job_id, None)
+            cleanup_paths(cleanup)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Return the process-wide job queue, picking the backend on first use."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            db = getattr(current_app, "db", None)
+            if JOB_BACKEND == "local" or db is None:
+                store = LocalJobStore()
+            else:
+                store = MongoJobStore(db)
+            _queue = JobQueue(store)
+        return _queue
+
+
+# ----------------------------------------------------------
+# Route helpers
+# ----------------------------------------------------------
+def wants_async():
+    flag = request.args.get("async") or request.form.get("async") or ""
+    return flag.lower() in ("1", "true", "yes")
+
+
+def job_status(job):
+    """Public JSON view of a job document."""
+    status = {
+        "job_id": job["_id"],
+        "tool": job["tool"],
+        "status": job["status"],
+        "progress": job.get("progress"),
+        "error": job.get("error"),
+        "created_at": job["created_at"].isoformat(),
+        "updated_at": job["updated_at"].isoformat(),
+        "status_url": f"/api/tools/jobs/{job['_id']}",
+    }
+    if job["status"] == "done":
+        status["result_url"] = f"/api/tools/jobs/{job['_id']}/result"
+    return status
+
+
+def send_result(result):
+    """Send a conversion result dict as a file download."""
+    response = send_file(
+        result["path"],
+        as_attachment=True,
+        download_name=result["download_name"],
+        mimetype=result["mimetype"],
+    )
+    for name, value in (result.get("headers") or {}).items():
+        response.headers[name] = value
+    return response
+
+
+def run_tool(tool, func, kwargs, cache_key=None, cleanup=None):
+    """
+    Run a conversion inline, or queue it when the client asked for async mode.
+    `cleanup` lists scratch paths removed once the output has been sent.
+    """
+    if wants_async():
+        job = get_job_queue().submit(tool, func, kwargs, cache_key=cache_key, cleanup=cleanup)
+        return jsonify(job_status(job)), 202
+
+    try:
+        result = func(**kwargs)
+    except Exception:
+        cleanup_paths(cleanup)
+        raise
+
+    cache_store(
+        cache_key, result["path"], result["download_name"],
+        result["mimetype"], result.get("headers"),
+    )
+    return cleanup_after(send_result(result), cleanup)
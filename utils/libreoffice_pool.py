@@ -0,0 +1,335 @@
+# backend/utils/libreoffice_pool.py
+"""
+Managed pool of long-lived headless LibreOffice instances.
+
+Every instance owns its own user profile directory, so concurrent
+conversions never fight over one shared profile. When the Python UNO
+bridge is importable the instances are started once and driven over a
+local socket, which removes the multi-second soffice cold start from each
+request. Without UNO every slot falls back to a one-shot
+`soffice --convert-to` run that still uses its private profile.
+
+Config (env):
+    LIBREOFFICE_POOL_SIZE        number of instances per web worker (default 2)
+    LIBREOFFICE_TIMEOUT          seconds before a conversion counts as hung (default 240)
+    LIBREOFFICE_STARTUP_TIMEOUT  seconds to wait for an instance to accept UNO (default 60)
+    LIBREOFFICE_PROFILE_DIR      root folder for the per-instance profiles
+    SOFFICE_BIN                  soffice executable (default "soffice")
+"""
+import atexit
+import os
+import queue
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+POOL_SIZE = int(os.getenv("LIBREOFFICE_POOL_SIZE", "2"))
+CONVERT_TIMEOUT = int(os.getenv("LIBREOFFICE_TIMEOUT", "240"))
+STARTUP_TIMEOUT = int(os.getenv("LIBREOFFICE_STARTUP_TIMEOUT", "60"))
+PROFILE_ROOT = os.getenv(
+    "LIBREOFFICE_PROFILE_DIR", os.path.join(tempfile.gettempdir(), "viadocs-libreoffice")
+)
+SOFFICE_BIN = os.getenv("SOFFICE_BIN", "soffice")
+
+# Where distro / Windows installs keep the pyuno bridge
+UNO_SEARCH_PATHS = [
+    "/usr/lib/python3/dist-packages",
+    "/usr/lib/libreoffice/program",
+    "/opt/libreoffice/program",
+    r"C:\Program Files\LibreOffice\program",
+]
+
+# output format → (CLI filter, UNO filter per document type)
+EXPORT_FILTERS = {
+    "pdf": ("pdf:writer_pdf_Export", {
+        "com.sun.star.sheet.SpreadsheetDocument": "calc_pdf_Export",
+        "com.sun.star.presentation.PresentationDocument": "impress_pdf_Export",
+        "com.sun.star.drawing.DrawingDocument": "draw_pdf_Export",
+        "default": "writer_pdf_Export",
+    }),
+    "docx": ("docx:MS Word 2007 XML", {"default": "MS Word 2007 XML"}),
+    "xlsx": ("xlsx:Calc MS Excel 2007 XML", {"default": "Calc MS Excel 2007 XML"}),
+    "pptx": ("pptx:Impress MS PowerPoint 2007 XML", {"default": "Impress MS PowerPoint 2007 XML"}),
+}
+
+
+class LibreOfficeError(Exception):
+    """Raised when a LibreOffice conversion fails or times out."""
+
+
+def _load_uno():
+    """Import the pyuno bridge, looking in the usual install folders as well."""
+    try:
+        import uno
+        return uno
+    except ImportError:
+        pass
+
+    for path in UNO_SEARCH_PATHS:
+        if os.path.isdir(path) and path not in sys.path:
+            # Appended (not prepended) so system packages never shadow pip ones
+            sys.path.append(path)
+    try:
+        import uno
+        return uno
+    except ImportError:
+        return None
+
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _file_url(path):
+    path = os.path.abspath(path).replace("\\", "/")
+    if not path.startswith("/"):
+        path = "/" + path
+    return "file://" + path
+
+
+class _OfficeWorker:
+    """One headless soffice instance with a private profile."""
+
+    def __init__(self, index, uno):
+        self.index = index
+        self.uno = uno
+        self.profile_dir = os.path.join(PROFILE_ROOT, f"{os.getpid()}-{index}")
+        self.process = None
+        self.desktop = None
+
+    # ----------------------------------------------------------
+    # Lifecycle
+    # ----------------------------------------------------------
+    def alive(self):
+        return self.process is not None and self.process.poll() is None and self.desktop is not None
+
+    def start(self):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        port = _free_port()
+        connection = f"socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext"
+
+        self.process = subprocess.Popen(
+            [
+                SOFFICE_BIN,
+                "--headless",
+                "--invisible",
+                "--nologo",
+                "--nodefault",
+                "--norestore",
+                "--nolockcheck",
+                f"-env:UserInstallation={_file_url(self.profile_dir)}",
+                f"--accept={connection}",
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+        local_ctx = self.uno.getComponentContext()
+        resolver = local_ctx.ServiceManager.createInstanceWithContext(
+            "com.sun.star.bridge.UnoUrlResolver", local_ctx
+        )
+
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while True:
+            if self.process.poll() is not None:
+                raise LibreOfficeError(f"soffice #{self.index} exited during startup")
+            try:
+                ctx = resolver.resolve(f"uno:{connection}")
+                self.desktop = ctx.ServiceManager.createInstanceWithContext(
+                    "com.sun.star.frame.Desktop", ctx
+                )
+                print(f"✅ LibreOffice worker #{self.index} ready on port {port}")
+                return
+            except Exception:
+                if time.monotonic() > deadline:
+                    self.stop()
+                    raise LibreOfficeError(f"soffice #{self.index} did not accept UNO connections")
+                time.sleep(0.25)
+
+    def stop(self):
+        if self.desktop is not None:
+            try:
+                self.desktop.terminate()
+            except Exception:
+                pass
+        self.desktop = None
+
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.process = None
+
+    def restart(self):
+        print(f"♻️ Restarting LibreOffice worker #{self.index}")
+        self.stop()
+        self.start()
+
+    # ----------------------------------------------------------
+    # Conversion
+    # ----------------------------------------------------------
+    def _props(self, **values):
+        from com.sun.star.beans import PropertyValue
+
+        props = []
+        for name, value in values.items():
+            prop = PropertyValue()
+            prop.Name = name
+            prop.Value = value
+            props.append(prop)
+        return tuple(props)
+
+    def _convert_uno(self, input_path, output_path, output_format):
+        doc = self.desktop.loadComponentFromURL(
+            _file_url(input_path), "_blank", 0, self._props(Hidden=True, ReadOnly=True)
+        )
+        if doc is None:
+            raise LibreOfficeError(f"LibreOffice could not open {os.path.basename(input_path)}")
+
+        try:
+            filters = EXPORT_FILTERS[output_format][1]
+            filter_name = filters["default"]
+            for service, name in filters.items():
+                if service != "default" and doc.supportsService(service):
+                    filter_name = name
+                    break
+            doc.storeToURL(_file_url(output_path), self._props(FilterName=filter_name))
+        finally:
+            doc.close(True)
+
+    def _convert_cli(self, input_path, output_dir, output_format, timeout):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        convert_filter = EXPORT_FILTERS.get(output_format, (output_format,))[0]
+        cmd = [
+            SOFFICE_BIN,
+            "--headless",
+            f"-env:UserInstallation={_file_url(self.profile_dir)}",
+            "--convert-to", convert_filter,
+            "--outdir", output_dir,
+            input_path,
+        ]
+        try:
+            result = subprocess.run(
+                cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=timeout
+            )
+        except subprocess.TimeoutExpired:
+            raise LibreOfficeError(f"LibreOffice timed out after {timeout}s")
+
+        if result.returncode != 0:
+            raise LibreOfficeError(f"soffice exited with {result.returncode}: {result.stderr.strip()}")
+
+    def convert(self, input_path, output_dir, output_format, timeout):
+        output_name = os.path.splitext(os.path.basename(input_path))[0] + f".{output_format}"
+        output_path = os.path.join(output_dir, output_name)
+
+        if self.uno is None:
+            self._convert_cli(input_path, output_dir, output_format, timeout)
+        else:
+            if not self.alive():
+                self.restart()
+
+            outcome = {}
+
+            def run():
+                try:
+                    self._convert_uno(input_path, output_path, output_format)
+                except Exception as e:
+                    outcome["error"] = e
+
+            # UNO calls cannot be interrupted, so watch them from the side
+            runner = threading.Thread(target=run, daemon=True)
+            runner.start()
+            runner.join(timeout)
+
+            if runner.is_alive():
+                if self.process is not None:
+                    self.process.kill()
+                self.desktop = None
+                self.restart()
+                raise LibreOfficeError(f"LibreOffice hung for {timeout}s and was restarted")
+
+            if "error" in outcome:
+                # A dead bridge means soffice crashed; bring it back for the next job
+                if self.process is None or self.process.poll() is not None:
+                    self.desktop = None
+                    self.restart()
+                raise LibreOfficeError(str(outcome["error"]))
+
+        if not os.path.exists(output_path):
+            raise LibreOfficeError(f"Output not found at {output_path}")
+        return output_path
+
+
+class LibreOfficePool:
+    """Dispatches conversions to idle LibreOffice instances."""
+
+    def __init__(self, size=POOL_SIZE):
+        self.size = max(1, size)
+        self.uno = _load_uno()
+        self._idle = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+
+        if self.uno is None:
+            print("⚠️ pyuno not available — LibreOffice pool uses one-shot soffice runs")
+
+    def _ensure_workers(self):
+        with self._lock:
+            if self._workers:
+                return
+            for index in range(self.size):
+                worker = _OfficeWorker(index, self.uno)
+                self._workers.append(worker)
+                self._idle.put(worker)
+
+    def convert(self, input_path, output_dir, output_format, timeout=None):
+        """
+        Convert `input_path` into `output_dir` as `output_format`.
+        Blocks until an instance is free. Returns the output file path.
+        """
+        if output_format not in EXPORT_FILTERS:
+            raise LibreOfficeError(f"Unsupported output format: {output_format}")
+
+        self._ensure_workers()
+        os.makedirs(output_dir, exist_ok=True)
+        timeout = timeout or CONVERT_TIMEOUT
+
+        try:
+            worker = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise LibreOfficeError("All LibreOffice workers are busy")
+
+        try:
+            return worker.convert(input_path, output_dir, output_format, timeout)
+        finally:
+            self._idle.put(worker)
+
+    def shutdown(self):
+        with self._lock:
+            for worker in self._workers:
+                worker.stop()
+                shutil.rmtree(worker.profile_dir, ignore_errors=True)
+            self._workers = []
+            self._idle = queue.Queue()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide LibreOffice pool (created on first use)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = LibreOfficePool()
+            atexit.register(_pool.shutdown)
+        return _pool
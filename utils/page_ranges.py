@@ -0,0 +1,41 @@
+# backend/utils/page_ranges.py
+
+
+def parse_page_ranges(spec, total_pages):
+    """
+    Parse a page list like "1-3,7,10-20" into 1-based inclusive
+    (start, end) tuples, in the order given. Open ends are allowed
+    ("5-" runs to the last page, "-3" starts at page 1).
+    Raises ValueError for malformed or out-of-bounds ranges.
+    """
+    ranges = []
+    for part in (spec or "").replace(" ", "").split(","):
+        if not part:
+            continue
+        try:
+            if "-" in part:
+                start_str, end_str = part.split("-", 1)
+                start = int(start_str) if start_str else 1
+                end = int(end_str) if end_str else total_pages
+            else:
+                start = end = int(part)
+        except ValueError:
+            raise ValueError(f"Invalid page range: {part}")
+
+        if start < 1 or end > total_pages or start > end:
+            raise ValueError(f"Page range out of bounds (1–{total_pages}): {part}")
+        ranges.append((start, end))
+
+    if not ranges:
+        raise ValueError("No pages selected")
+    return ranges
+
+
+def page_indexes(spec, total_pages):
+    """0-based page indexes for a page list; every page when spec is empty."""
+    if not spec or spec.strip().lower() == "all":
+        return list(range(total_pages))
+    indexes = []
+    for start, end in parse_page_ranges(spec, total_pages):
+        indexes.extend(range(start - 1, end))
+    return indexes
@@ -0,0 +1,154 @@
+# backend/utils/pdf_backend.py
+"""
+Small PDF engine layer for page-level tools (merge, split).
+
+Two interchangeable backends:
+    pikepdf  libqpdf under the hood; fast and light on memory (default)
+    pypdf2   pure-Python PyPDF2, kept as a fallback
+
+Large merges run in bounded batches through intermediate files on disk,
+so memory and open file handles stay flat however many inputs arrive.
+
+Config (env):
+    PDF_BACKEND           "pikepdf" (default) or "pypdf2"
+    PDF_MERGE_BATCH_SIZE  inputs merged per step (default 32)
+"""
+import os
+
+PDF_BACKEND = os.getenv("PDF_BACKEND", "pikepdf").lower()
+PDF_MERGE_BATCH_SIZE = int(os.getenv("PDF_MERGE_BATCH_SIZE", "32"))
+
+
+class PikepdfBackend:
+    name = "pikepdf"
+
+    def open(self, path):
+        import pikepdf
+
+        return pikepdf.open(path)
+
+    def page_count(self, doc):
+        return len(doc.pages)
+
+    def extract(self, doc, start, end, output):
+        """Write 1-based pages start..end of `doc` to `output` (path or binary file)."""
+        import pikepdf
+
+        with pikepdf.Pdf.new() as part:
+            part.pages.extend(doc.pages[start - 1:end])
+            part.save(output)
+
+    def merge(self, paths, output):
+        """Concatenate PDFs at `paths` (in order) into `output`."""
+        import pikepdf
+
+        sources = []
+        try:
+            with pikepdf.Pdf.new() as merged:
+                for path in paths:
+                    src = pikepdf.open(path)
+                    sources.append(src)
+                    merged.pages.extend(src.pages)
+                merged.save(output)
+        finally:
+            for src in sources:
+                src.close()
+
+    def close(self, doc):
+        doc.close()
+
+
+class PyPDF2Backend:
+    name = "pypdf2"
+
+    def open(self, path):
+        from PyPDF2 import PdfReader
+
+        return PdfReader(path)
+
+    def page_count(self, doc):
+        return len(doc.pages)
+
+    def extract(self, doc, start, end, output):
+        from PyPDF2 import PdfWriter
+
+        writer = PdfWriter()
+        for i in range(start - 1, end):
+            writer.add_page(doc.pages[i])
+        writer.write(output)
+
+    def merge(self, paths, output):
+        from PyPDF2 import PdfMerger
+
+        merger = PdfMerger()
+        try:
+            for path in paths:
+                merger.append(path)
+            merger.write(output)
+        finally:
+            merger.close()
+
+    def close(self, doc):
+        stream = getattr(doc, "stream", None)
+        if stream is not None:
+            stream.close()
+
+
+BACKENDS = {
+    "pikepdf": PikepdfBackend,
+    "pypdf2": PyPDF2Backend,
+}
+
+
+def get_backend(name=None):
+    """Return the configured backend (or `name`), e.g. get_backend("pypdf2")."""
+    name = (name or PDF_BACKEND).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown PDF backend: {name}")
+    return BACKENDS[name]()
+
+
+def merge_incremental(backend, paths, output_path, work_dir, batch_size=PDF_MERGE_BATCH_SIZE, progress=None):
+    """
+    Merge `paths` into `output_path`, at most `batch_size` documents at a time.
+    Each batch is spilled to an intermediate file in `work_dir`; intermediates
+    are deleted as soon as the next level has consumed them.
+    `progress(done, total)` is called after every merge step.
+    """
+    batch_size = max(2, batch_size)
+    originals = set(paths)
+    current = list(paths)
+
+    # Count merge steps up front so progress has a stable total
+    total_steps, remaining = 1, len(current)
+    while remaining > batch_size:
+        remaining = -(-remaining // batch_size)
+        total_steps += remaining
+    done_steps = 0
+
+    level = 0
+    while len(current) > batch_size:
+        next_level = []
+        for i in range(0, len(current), batch_size):
+            batch = current[i:i + batch_size]
+            part_path = os.path.join(work_dir, f"merge_l{level}_{i // batch_size:05d}.pdf")
+            backend.merge(batch, part_path)
+            next_level.append(part_path)
+
+            for path in batch:
+                if path not in originals:
+                    os.remove(path)
+
+            done_steps += 1
+            if progress is not None:
+                progress(done_steps, total_steps)
+        current = next_level
+        level += 1
+
+    backend.merge(current, output_path)
+    for path in current:
+        if path not in originals:
+            os.remove(path)
+    if progress is not None:
+        progress(total_steps, total_steps)
+    return output_path
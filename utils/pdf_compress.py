@@ -0,0 +1,337 @@
+# backend/utils/pdf_compress.py
+"""
+PDF compression engines used by the pdf-compress tool.
+
+Ghostscript's pdfwrite device is single-threaded, so large files can be
+split into page ranges that are compressed by concurrent gs processes and
+stitched back together with pikepdf. Identical images produced by
+separate chunks are folded back into one shared object while stitching.
+
+Output sizes per preset can be projected cheaply by compressing a few
+sample pages, which drives the target-size mode and /estimate endpoint.
+
+The lossless mode skips Ghostscript entirely: pikepdf rewrites the file
+with object streams and maximum-level Flate, folds identical image and
+font streams, and drops anything unreferenced. Page content is never
+re-rendered, so it is fast and leaves quality untouched.
+
+Config (env):
+    GS_WORKERS                concurrent Ghostscript runs per request (default: CPU count)
+    GS_CHUNK_MIN_PAGES        smallest page range worth its own gs run (default 20)
+    GS_ESTIMATE_SAMPLE_PAGES  pages compressed to project output sizes (default 6)
+"""
+import hashlib
+import os
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import pikepdf
+from utils.workspace import new_workspace
+
+GS_WORKERS = int(os.getenv("GS_WORKERS", str(os.cpu_count() or 1)))
+GS_CHUNK_MIN_PAGES = int(os.getenv("GS_CHUNK_MIN_PAGES", "20"))
+
+
+def ghostscript_executable():
+    # Correct fixed path for Windows
+    if os.name == "nt":
+        return r"C:\Program Files\gs\gs10.06.0\bin\gswin64c.exe"
+    return "gs"
+
+
+def run_ghostscript(input_path, output_path, pdf_setting, first_page=None, last_page=None):
+    """Run one gs pdfwrite pass, optionally limited to a page range."""
+    gs_command = [
+        ghostscript_executable(),
+        "-sDEVICE=pdfwrite",
+        "-dCompatibilityLevel=1.4",
+        f"-dPDFSETTINGS={pdf_setting}",
+        "-dNOPAUSE",
+        "-dQUIET",
+        "-dBATCH",
+    ]
+    if first_page is not None:
+        gs_command += [f"-dFirstPage={first_page}", f"-dLastPage={last_page}"]
+    gs_command += [f"-sOutputFile={output_path}", input_path]
+
+    subprocess.run(gs_command, check=True)
+
+
+def page_count(input_path):
+    with pikepdf.open(input_path) as pdf:
+        return len(pdf.pages)
+
+
+def chunk_ranges(total_pages, workers=GS_WORKERS, min_pages=GS_CHUNK_MIN_PAGES):
+    """Split 1..total_pages into at most `workers` even (first, last) ranges."""
+    chunks = max(1, min(workers, total_pages // max(1, min_pages)))
+    size, extra = divmod(total_pages, chunks)
+    ranges, start = [], 1
+    for i in range(chunks):
+        end = start + size - 1 + (1 if i < extra else 0)
+        ranges.append((start, end))
+        start = end + 1
+    return ranges
+
+
+def image_fingerprint(obj):
+    """Hash of an image XObject's encoded bytes and decoding parameters."""
+    digest = hashlib.sha256(obj.read_raw_bytes())
+    for key in ("/Filter", "/DecodeParms", "/Width", "/Height", "/ColorSpace",
+                "/BitsPerComponent", "/Decode", "/ImageMask", "/SMask", "/Mask"):
+        if key in obj:
+            value = obj[key]
+            # Nested streams (SMask) are compared by identity after their own dedupe
+            if isinstance(value, pikepdf.Stream):
+                value = value.objgen
+            digest.update(f"{key}={value!r}".encode("utf-8", "replace"))
+    return digest.hexdigest()
+
+
+def dedupe_images(pdf):
+    """
+    Point every page at one shared copy of byte-identical image XObjects.
+    Returns the number of duplicate references that were folded.
+    """
+    canonical = {}
+    folded = 0
+
+    for page in pdf.pages:
+        resources = page.obj.get("/Resources")
+        if resources is None or "/XObject" not in resources:
+            continue
+        xobjects = resources["/XObject"]
+        for name in list(xobjects.keys()):
+            obj = xobjects[name]
+            if not isinstance(obj, pikepdf.Stream) or obj.get("/Subtype") != "/Image":
+                continue
+            fingerprint = image_fingerprint(obj)
+            keep = canonical.setdefault(fingerprint, obj)
+            if keep.objgen != obj.objgen:
+                xobjects[name] = keep
+                folded += 1
+
+    if folded:
+        pdf.remove_unreferenced_resources()
+    return folded
+
+
+FONT_FILE_KEYS = ("/FontFile", "/FontFile2", "/FontFile3")
+
+
+def _font_descriptors(font):
+    """FontDescriptor dictionaries of a font (Type0 fonts keep theirs on the descendants)."""
+    if "/FontDescriptor" in font:
+        yield font.FontDescriptor
+    for descendant in font.get("/DescendantFonts", []):
+        if "/FontDescriptor" in descendant:
+            yield descendant.FontDescriptor
+
+
+def dedupe_fonts(pdf):
+    """
+    Point every font descriptor at one shared copy of byte-identical
+    embedded font programs. Returns the number of references folded.
+    """
+    canonical = {}
+    folded = 0
+
+    for page in pdf.pages:
+        resources = page.obj.get("/Resources")
+        if resources is None or "/Font" not in resources:
+            continue
+        for font in resources["/Font"].values():
+            for descriptor in _font_descriptors(font):
+                for key in FONT_FILE_KEYS:
+                    stream = descriptor.get(key)
+                    if not isinstance(stream, pikepdf.Stream):
+                        continue
+                    digest = hashlib.sha256(stream.read_raw_bytes())
+                    for param in ("/Filter", "/Subtype", "/Length1", "/Length2", "/Length3"):
+                        digest.update(f"{param}={stream.get(param)!r}".encode("utf-8", "replace"))
+                    keep = canonical.setdefault((key, digest.hexdigest()), stream)
+                    if keep.objgen != stream.objgen:
+                        descriptor[key] = keep
+                        folded += 1
+    return folded
+
+
+# pikepdf's Flate level is process-wide: raise it only while a lossless
+# save runs, and restore the default once the last one is done
+DEFAULT_FLATE_LEVEL = -1  # zlib's default (6)
+_max_flate_users = 0
+_max_flate_lock = threading.Lock()
+
+
+@contextmanager
+def _max_flate_level():
+    global _max_flate_users
+    with _max_flate_lock:
+        if _max_flate_users == 0:
+            pikepdf.settings.set_flate_compression_level(9)
+        _max_flate_users += 1
+    try:
+        yield
+    finally:
+        with _max_flate_lock:
+            _max_flate_users -= 1
+            if _max_flate_users == 0:
+                pikepdf.settings.set_flate_compression_level(DEFAULT_FLATE_LEVEL)
+
+
+def optimize_lossless(input_path, output_path, linearize=False):
+    """
+    Structural, lossless rewrite of a PDF with pikepdf:
+    object streams, Flate at level 9 (other lossless filters recoded),
+    shared copies of identical images and fonts, unreferenced objects
+    dropped, optionally linearized for fast web view.
+    Returns {"images_folded", "fonts_folded", "kept_original"}.
+    """
+    with _max_flate_level(), pikepdf.open(input_path) as pdf:
+        images_folded = dedupe_images(pdf)
+        fonts_folded = dedupe_fonts(pdf)
+        pdf.remove_unreferenced_resources()
+
+        # Only objects reachable from the trailer are written
+        pdf.save(
+            output_path,
+            compress_streams=True,
+            recompress_flate=True,
+            stream_decode_level=pikepdf.StreamDecodeLevel.generalized,
+            object_stream_mode=pikepdf.ObjectStreamMode.generate,
+            linearize=linearize,
+        )
+
+    # Already-optimal input: never hand back a bigger file (unless linearizing was asked for)
+    kept_original = not linearize and os.path.getsize(output_path) >= os.path.getsize(input_path)
+    if kept_original:
+        shutil.copyfile(input_path, output_path)
+
+    return {"images_folded": images_folded, "fonts_folded": fonts_folded, "kept_original": kept_original}
+
+
+def stitch_pdfs(chunk_paths, output_path, docinfo_source=None):
+    """Concatenate chunk PDFs with pikepdf, sharing identical images."""
+    sources = []
+    try:
+        with pikepdf.Pdf.new() as out:
+            for path in chunk_paths:
+                src = pikepdf.open(path)
+                sources.append(src)
+                out.pages.extend(src.pages)
+
+            if docinfo_source is not None:
+                with pikepdf.open(docinfo_source) as original:
+                    out.docinfo = out.copy_foreign(original.docinfo)
+
+            dedupe_images(out)
+            out.save(output_path, object_stream_mode=pikepdf.ObjectStreamMode.generate)
+    finally:
+        for src in sources:
+            src.close()
+
+
+def compress_parallel(input_path, output_path, pdf_setting, workers=GS_WORKERS):
+    """
+    Compress page ranges in concurrent gs processes and stitch the results.
+    Falls back to a single run when the document is too small to split.
+    """
+    total_pages = page_count(input_path)
+    ranges = chunk_ranges(total_pages, workers)
+
+    if len(ranges) == 1:
+        run_ghostscript(input_path, output_path, pdf_setting)
+        return 1
+
+    work_dir = new_workspace("gs-chunks-", expected_bytes=os.path.getsize(input_path))
+    try:
+        chunk_paths = [
+            os.path.join(work_dir, f"chunk_{first:06d}-{last:06d}.pdf") for first, last in ranges
+        ]
+
+        # Each gs run is its own OS process; threads only wait on them
+        with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+            futures = [
+                pool.submit(run_ghostscript, input_path, chunk_path, pdf_setting, first, last)
+                for chunk_path, (first, last) in zip(chunk_paths, ranges)
+            ]
+            for future in futures:
+                future.result()
+
+        stitch_pdfs(chunk_paths, output_path, docinfo_source=input_path)
+        print(f"⚡ Parallel compression: {total_pages} pages in {len(ranges)} chunks")
+        return len(ranges)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+# ----------------------------------------------------------
+# Sampled size estimation
+# ----------------------------------------------------------
+ESTIMATE_SAMPLE_PAGES = int(os.getenv("GS_ESTIMATE_SAMPLE_PAGES", "6"))
+
+
+def sample_page_numbers(total_pages, count=ESTIMATE_SAMPLE_PAGES):
+    """Evenly spread 0-based page indexes to sample."""
+    if total_pages <= count:
+        return list(range(total_pages))
+    step = total_pages / count
+    return sorted({int(i * step + step / 2) for i in range(count)})
+
+
+def estimate_sizes(input_path, pdf_settings, sample_count=ESTIMATE_SAMPLE_PAGES):
+    """
+    Project the compressed size of the whole file for each gs setting by
+    compressing only a few sample pages. Returns ({setting: bytes}, info).
+    """
+    original_bytes = os.path.getsize(input_path)
+    work_dir = new_workspace("gs-estimate-", expected_bytes=original_bytes)
+    try:
+        sample_path = os.path.join(work_dir, "sample.pdf")
+        with pikepdf.open(input_path) as pdf:
+            total_pages = len(pdf.pages)
+            picked = sample_page_numbers(total_pages, sample_count)
+            with pikepdf.Pdf.new() as sample:
+                for index in picked:
+                    sample.pages.append(pdf.pages[index])
+                sample.save(sample_path)
+
+        sample_bytes = os.path.getsize(sample_path)
+
+        def run(setting):
+            out_path = os.path.join(work_dir, f"sample{setting.replace('/', '_')}.pdf")
+            run_ghostscript(sample_path, out_path, setting)
+            return setting, os.path.getsize(out_path)
+
+        with ThreadPoolExecutor(max_workers=len(pdf_settings)) as pool:
+            results = dict(pool.map(run, pdf_settings))
+
+        estimates = {}
+        for setting, compressed_bytes in results.items():
+            ratio = compressed_bytes / sample_bytes if sample_bytes else 1.0
+            # gs never meaningfully grows a file; cap the projection at the input size
+            estimates[setting] = int(min(original_bytes, original_bytes * ratio))
+
+        info = {
+            "original_bytes": original_bytes,
+            "total_pages": total_pages,
+            "sample_pages": len(picked),
+        }
+        return estimates, info
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def pick_setting_for_target(input_path, target_bytes, pdf_settings):
+    """
+    Choose the highest-quality setting projected to fit under target_bytes.
+    `pdf_settings` is ordered from highest quality to smallest output; the
+    last one is used when nothing fits. Returns (setting, estimates).
+    """
+    estimates, _ = estimate_sizes(input_path, pdf_settings)
+    for setting in pdf_settings:
+        if estimates[setting] <= target_bytes:
+            return setting, estimates
+    return pdf_settings[-1], estimates
@@ -0,0 +1,127 @@
+# backend/utils/pdf_docx.py
+"""
+PDF → Word conversion on top of pdf2docx, with page selection and
+multi-process parsing for long documents.
+
+Parsing is the slow part of pdf2docx. Small selections are parsed
+in-process page by page; larger ones are cut into page chunks that a
+shared process pool parses in parallel, each chunk serialised to JSON
+in the request's work dir. The parsed pages are then restored into one
+converter that writes the DOCX, so the output matches a single-process
+run.
+
+pdf2docx's own `multi_processing=True` is not used: it writes its
+intermediate files to fixed names in the working directory, which
+concurrent requests would overwrite, and it reports no progress.
+
+Config (env):
+    PDF2DOCX_WORKERS             parsing processes, the CPU budget for
+                                 this tool (default: CPU count; 1 = off)
+    PDF2DOCX_PARALLEL_MIN_PAGES  selections at least this long use the
+                                 pool (default 20)
+    PDF2DOCX_CHUNK_PAGES         pages parsed per pool task (default 8)
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pdf2docx import Converter
+
+PDF2DOCX_WORKERS = int(os.getenv("PDF2DOCX_WORKERS", str(os.cpu_count() or 1)))
+PDF2DOCX_PARALLEL_MIN_PAGES = int(os.getenv("PDF2DOCX_PARALLEL_MIN_PAGES", "20"))
+PDF2DOCX_CHUNK_PAGES = int(os.getenv("PDF2DOCX_CHUNK_PAGES", "8"))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_docx_pool():
+    """Process-wide parsing pool (created on first use)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=max(1, PDF2DOCX_WORKERS))
+        return _pool
+
+
+def _parse_chunk(pdf_path, indexes, json_path):
+    """Pool task: parse the 0-based pages `indexes` and serialise them to `json_path`."""
+    converter = Converter(pdf_path)
+    try:
+        settings = converter.default_settings
+        converter.load_pages(pages=indexes) \
+            .parse_document(**settings) \
+            .parse_pages(**settings) \
+            .serialize(json_path)
+    finally:
+        converter.close()
+    return len(indexes)
+
+
+def _parse_in_process(converter, indexes, settings, progress):
+    converter.load_pages(pages=indexes).parse_document(**settings)
+
+    pending = [page for page in converter.pages if not page.skip_parsing]
+    for done, page in enumerate(pending, start=1):
+        try:
+            page.parse(**settings)
+        except Exception as e:
+            # Same leniency as pdf2docx's own ignore_page_error default
+            print(f"⚠️ pdf2docx skipped page {page.id + 1}: {e}")
+        if progress is not None:
+            progress(done, len(pending))
+
+
+def _parse_in_pool(converter, pdf_path, indexes, work_dir, progress):
+    chunks = [indexes[i:i + PDF2DOCX_CHUNK_PAGES] for i in range(0, len(indexes), PDF2DOCX_CHUNK_PAGES)]
+    json_paths = [os.path.join(work_dir, f"pages_{n:04d}.json") for n in range(len(chunks))]
+
+    pool = get_docx_pool()
+    futures = [pool.submit(_parse_chunk, pdf_path, chunk, path) for chunk, path in zip(chunks, json_paths)]
+    try:
+        done = 0
+        for future in as_completed(futures):
+            done += future.result()
+            if progress is not None:
+                progress(done, len(indexes))
+    except Exception:
+        for future in futures:
+            future.cancel()
+        raise
+
+    # Restore in page order so the DOCX is identical to a sequential run
+    for path in json_paths:
+        converter.deserialize(path)
+        os.remove(path)
+
+
+def pdf_to_docx(pdf_path, docx_path, indexes=None, work_dir=None, progress=None):
+    """
+    Convert the 0-based pages `indexes` (default: all) of `pdf_path` to `docx_path`.
+    `progress(done, total)` is called as pages finish parsing.
+    Returns the number of pages converted.
+    """
+    converter = Converter(pdf_path)
+    try:
+        total_pages = len(converter.fitz_doc)
+        if indexes is None:
+            indexes = range(total_pages)
+        indexes = sorted(set(indexes))
+        if not indexes:
+            raise ValueError("No pages selected")
+
+        settings = converter.default_settings
+        parallel = (
+            PDF2DOCX_WORKERS > 1
+            and len(indexes) >= PDF2DOCX_PARALLEL_MIN_PAGES
+            and not converter.fitz_doc.needs_pass
+        )
+        if parallel:
+            _parse_in_pool(converter, pdf_path, indexes, work_dir or os.path.dirname(docx_path), progress)
+        else:
+            _parse_in_process(converter, indexes, settings, progress)
+
+        converter.make_docx(docx_path, **settings)
+    finally:
+        converter.close()
+
+    return len(indexes)
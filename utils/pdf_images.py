@@ -0,0 +1,210 @@
+# backend/utils/pdf_images.py
+"""
+Image-level PDF recompression.
+
+Instead of one resampling policy for the whole file (Ghostscript
+presets), every image gets its own decision:
+
+- its effective DPI is measured from where it is drawn (PyMuPDF image
+  placement info); the largest placement, i.e. the lowest DPI, decides
+- if it is denser than the target DPI it is downsampled, then re-encoded:
+  JPEG for photographic content, Flate for flat-colour graphics
+- the new stream replaces the old one only if it is clearly smaller
+
+Identical images are processed once and the result applied to every
+copy. Text and vector content are never touched. Decoding and encoding
+run in a process pool; the document is only modified in the parent.
+
+Config (env):
+    PDF_IMAGE_WORKERS  recompression processes (default: CPU count)
+"""
+import math
+import os
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from io import BytesIO
+import fitz
+import pikepdf
+from PIL import Image
+from utils.pdf_compress import image_fingerprint, dedupe_images
+from utils.pool_document import PoolDocument
+
+PDF_IMAGE_WORKERS = int(os.getenv("PDF_IMAGE_WORKERS", str(os.cpu_count() or 1)))
+
+DPI_HEADROOM = 1.1      # leave images up to 10% above target alone
+MIN_SAVING = 0.9        # keep the new stream only if it is < 90% of the old one
+FLAT_COLOURS = 256      # at most this many colours → lossless Flate, not JPEG
+SUPPORTED_COLORSPACES = {"/DeviceRGB": 3, "/DeviceGray": 1}
+
+
+# ----------------------------------------------------------------------
+# Measuring
+# ----------------------------------------------------------------------
+def effective_dpi(pdf_path):
+    """{object number: lowest effective DPI it is drawn at} for every placed image."""
+    dpi = {}
+    with fitz.open(pdf_path) as doc:
+        for page in doc:
+            for info in page.get_image_info(xrefs=True):
+                xref = info.get("xref")
+                if not xref:
+                    continue
+                a, b, c, d = info["transform"][:4]
+                shown_w, shown_h = math.hypot(a, b), math.hypot(c, d)
+                if shown_w < 1 or shown_h < 1:
+                    continue
+                placed = min(info["width"] / shown_w, info["height"] / shown_h) * 72
+                dpi[xref] = min(placed, dpi.get(xref, placed))
+    return dpi
+
+
+def _components(obj):
+    """Colour components of a supported image, or None to leave it alone."""
+    if obj.get("/ImageMask") or "/Decode" in obj or "/Mask" in obj:
+        return None
+    if int(obj.get("/BitsPerComponent", 8)) != 8:
+        return None
+    colorspace = obj.get("/ColorSpace")
+    if isinstance(colorspace, pikepdf.Name):
+        return SUPPORTED_COLORSPACES.get(str(colorspace))
+    if isinstance(colorspace, pikepdf.Array) and len(colorspace) == 2 and colorspace[0] == "/ICCBased":
+        components = int(colorspace[1].get("/N", 0))
+        return components if components in (1, 3) else None
+    return None
+
+
+# ----------------------------------------------------------------------
+# Pool tasks
+# ----------------------------------------------------------------------
+# Per-process handle of the input (reused across its images)
+_document = PoolDocument(pikepdf.open)
+
+
+def recompress_image(pdf_path, objgen, dpi, target_dpi, quality):
+    """
+    Pool task: downsample / re-encode one image object.
+    Returns (objgen, replacement dict or None).
+    """
+    with _document.use(pdf_path) as pdf:
+        return _recompress(pdf.get_object(objgen), objgen, dpi, target_dpi, quality)
+
+
+def _recompress(obj, objgen, dpi, target_dpi, quality):
+    filters = obj.get("/Filter")
+    filters = list(filters) if isinstance(filters, pikepdf.Array) else [filters]
+    already_jpeg = pikepdf.Name.DCTDecode in filters
+    # Re-encoding a JPEG at full size only adds loss: skip it before decoding
+    if already_jpeg and dpi <= target_dpi * DPI_HEADROOM:
+        return objgen, None
+
+    original_bytes = len(obj.read_raw_bytes())
+    img = pikepdf.PdfImage(obj).as_pil_image()
+    if img.mode not in ("L", "RGB"):
+        img = img.convert("RGB")
+
+    if dpi > target_dpi * DPI_HEADROOM:
+        scale = target_dpi / dpi
+        size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+        img = img.resize(size, Image.LANCZOS)
+
+    flat = img.getcolors(FLAT_COLOURS) is not None
+
+    if flat and not already_jpeg:
+        data, filter_name = zlib.compress(img.tobytes(), 9), "/FlateDecode"
+    else:
+        out = BytesIO()
+        img.save(out, "JPEG", quality=quality, optimize=True)
+        data, filter_name = out.getvalue(), "/DCTDecode"
+
+    if len(data) >= original_bytes * MIN_SAVING:
+        return objgen, None
+    return objgen, {
+        "data": data,
+        "filter": filter_name,
+        "width": img.width,
+        "height": img.height,
+        "gray": img.mode == "L",
+        "saved": original_bytes - len(data),
+    }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_image_pool():
+    """Process-wide recompression pool (created on first use)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=max(1, PDF_IMAGE_WORKERS))
+        return _pool
+
+
+# ----------------------------------------------------------------------
+# Public API
+# ----------------------------------------------------------------------
+def recompress_images(input_path, output_path, target_dpi=150, quality=75, progress=None):
+    """
+    Recompress the images of `input_path` into `output_path`.
+    `progress(done, total)` is called as unique images finish.
+    Returns {"images", "unique", "recompressed", "bytes_saved"}.
+    """
+    placed_dpi = effective_dpi(input_path)
+
+    with pikepdf.open(input_path) as pdf:
+        # Placed images by object number, whatever their generation
+        # (incrementally updated files reuse numbers with gen > 0)
+        placed = {
+            obj.objgen[0]: obj
+            for obj in pdf.objects
+            if isinstance(obj, pikepdf.Stream) and obj.objgen[0] in placed_dpi
+        }
+
+        # Group identical images so each is decoded and encoded once
+        groups = {}
+        for num, dpi in sorted(placed_dpi.items()):
+            obj = placed.get(num)
+            if obj is None or obj.get("/Subtype") != "/Image" or _components(obj) is None:
+                continue
+            group = groups.setdefault(image_fingerprint(obj), {"objects": [], "dpi": dpi})
+            group["objects"].append(obj)
+            group["dpi"] = min(group["dpi"], dpi)
+
+        stats = {"images": sum(len(g["objects"]) for g in groups.values()), "unique": len(groups),
+                 "recompressed": 0, "bytes_saved": 0}
+
+        pool = get_image_pool()
+        futures = {
+            pool.submit(recompress_image, input_path, group["objects"][0].objgen, group["dpi"], target_dpi, quality): group
+            for group in groups.values()
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            _, result = future.result()
+            group = futures[future]
+            if result is not None:
+                for obj in group["objects"]:
+                    _replace_image(obj, result)
+                stats["recompressed"] += len(group["objects"])
+                stats["bytes_saved"] += result["saved"] * len(group["objects"])
+            if progress is not None:
+                progress(done, len(futures))
+
+        # Copies now hold identical bytes; let pages share one of them
+        dedupe_images(pdf)
+        pdf.save(output_path, object_stream_mode=pikepdf.ObjectStreamMode.generate)
+
+    return stats
+
+
+def _replace_image(obj, result):
+    obj.write(result["data"], filter=pikepdf.Name(result["filter"]))
+    obj.Width = result["width"]
+    obj.Height = result["height"]
+    obj.BitsPerComponent = 8
+    # ICC profiles stay valid (same component count); device spaces follow the encoder
+    if isinstance(obj.get("/ColorSpace"), pikepdf.Name):
+        obj.ColorSpace = pikepdf.Name.DeviceGray if result["gray"] else pikepdf.Name.DeviceRGB
+    if "/DecodeParms" in obj:
+        del obj["/DecodeParms"]
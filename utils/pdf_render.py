@@ -0,0 +1,87 @@
+# backend/utils/pdf_render.py
+"""
+In-process PDF page rendering with PyMuPDF (fitz).
+
+Pages are rendered and encoded in a process pool and handed back as
+encoded bytes, so no page ever touches the disk and at most a few
+decoded bitmaps exist at once — peak memory follows the worker count,
+not the page count.
+
+Config (env):
+    RENDER_WORKERS  render processes (default: CPU count)
+"""
+import io
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import fitz
+from utils.pool_document import PoolDocument
+
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", str(os.cpu_count() or 1)))
+
+IMAGE_FORMATS = {
+    "jpeg": ("jpg", "image/jpeg"),
+    "png": ("png", "image/png"),
+    "webp": ("webp", "image/webp"),
+}
+
+# Per-process handle of the document being rendered (reused across pages)
+_document = PoolDocument(fitz.open)
+
+
+def render_page(pdf_path, index, dpi, fmt, quality):
+    """Render one 0-based page and return its encoded bytes."""
+    with _document.use(pdf_path) as doc:
+        pix = doc[index].get_pixmap(dpi=dpi, alpha=False)
+
+    if fmt == "jpeg":
+        return pix.tobytes("jpeg", jpg_quality=quality)
+    if fmt == "png":
+        return pix.tobytes("png")
+
+    # PyMuPDF cannot write WebP itself
+    from PIL import Image
+
+    img = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+    out = io.BytesIO()
+    img.save(out, "WEBP", quality=quality)
+    return out.getvalue()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_render_pool():
+    """Process-wide render pool (created on first use)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=max(1, RENDER_WORKERS))
+        return _pool
+
+
+def page_total(pdf_path):
+    with fitz.open(pdf_path) as doc:
+        return doc.page_count
+
+
+def render_pages(pdf_path, indexes, dpi=180, fmt="jpeg", quality=85):
+    """
+    Yield (index, encoded_bytes) for each 0-based page index, in order.
+    Only a small window of pages is in flight at any time.
+    """
+    pool = get_render_pool()
+    window = max(1, RENDER_WORKERS) * 2
+    pending = deque()
+
+    for index in indexes:
+        pending.append((index, pool.submit(render_page, pdf_path, index, dpi, fmt, quality)))
+        if len(pending) >= window:
+            done_index, future = pending.popleft()
+            yield done_index, future.result()
+
+    while pending:
+        done_index, future = pending.popleft()
+        yield done_index, future.result()
@@ -0,0 +1,548 @@
+# backend/utils/pdf_sniff.py
+"""
+Header-only PDF inspection: version, encryption and page count without
+opening the whole document.
+
+Only the header, the tail (startxref), the cross-reference sections and
+the handful of objects needed (trailer, /Encrypt, catalog, page tree
+root) are read, so the cost does not depend on the file size. Works on
+any seekable binary stream — an upload's own stream needs no copy on
+disk.
+
+Whether the file opens without a password is decided from the
+/Encrypt dictionary with the standard security handler (revisions 2–5).
+Revision 6 (AES-256) needs AES to test the empty password, so that case,
+like any file the sniffer cannot make sense of, falls back to a full
+pikepdf open of the same stream.
+"""
+import hashlib
+import re
+import zlib
+from collections import namedtuple
+
+TAIL_BYTES = 4096
+MAX_OBJECT_BYTES = 1024 * 1024
+
+WHITESPACE = b"\x00\t\n\x0c\r "
+DELIMITERS = b"()<>[]{}/%"
+
+PASSWORD_PAD = bytes.fromhex("28BF4E5E4E758A4164004E56FFFA01082E2E00B6D0683E802F0CA9FE6453697A")
+
+VERSION_RE = re.compile(rb"%PDF-(\d\.\d)")
+OBJ_RE = re.compile(rb"\s*(\d+)\s+(\d+)\s+obj")
+REF_RE = re.compile(rb"(\d+)\s+(\d+)\s+R(?=[\s\x00()<>\[\]{}/%]|$)")
+SUBSECTION_RE = re.compile(rb"\s*(\d+)\s+(\d+)\s*[\r\n]+")
+
+Ref = namedtuple("Ref", "num gen")
+
+
+class Name(str):
+    """A PDF name (without the leading slash)."""
+
+
+class _Truncated(Exception):
+    """Ran out of buffered bytes while parsing; read a bigger window."""
+
+
+# ----------------------------------------------------------------------
+# Object parser (just enough PDF syntax for trailers and dictionaries)
+# ----------------------------------------------------------------------
+def _skip_ws(data, pos):
+    while pos < len(data):
+        c = data[pos]
+        if c in WHITESPACE:
+            pos += 1
+        elif c == 0x25:  # % comment
+            while pos < len(data) and data[pos] not in b"\r\n":
+                pos += 1
+        else:
+            break
+    return pos
+
+
+def _token_end(data, pos):
+    while pos < len(data) and data[pos] not in WHITESPACE and data[pos] not in DELIMITERS:
+        pos += 1
+    if pos >= len(data):
+        raise _Truncated()
+    return pos
+
+
+def _literal_string(data, pos):
+    out = bytearray()
+    depth = 1
+    pos += 1
+    while True:
+        if pos >= len(data):
+            raise _Truncated()
+        c = data[pos]
+        if c == 0x5C:  # backslash
+            pos += 1
+            if pos >= len(data):
+                raise _Truncated()
+            e = data[pos]
+            if e in b"01234567":
+                octal = re.match(rb"[0-7]{1,3}", data[pos:pos + 3]).group(0)
+                out.append(int(octal, 8) & 0xFF)
+                pos += len(octal)
+                continue
+            if e == 0x0D:  # line continuation
+                pos += 2 if data[pos + 1:pos + 2] == b"\n" else 1
+                continue
+            if e == 0x0A:
+                pos += 1
+                continue
+            out.append({0x6E: 0x0A, 0x72: 0x0D, 0x74: 0x09, 0x62: 0x08, 0x66: 0x0C}.get(e, e))
+            pos += 1
+            continue
+        if c == 0x28:
+            depth += 1
+        elif c == 0x29:
+            depth -= 1
+            if depth == 0:
+                return bytes(out), pos + 1
+        out.append(c)
+        pos += 1
+
+
+def _name(data, pos):
+    end = _token_end(data, pos + 1)
+    raw = data[pos + 1:end]
+    return Name(re.sub(rb"#([0-9A-Fa-f]{2})", lambda m: bytes([int(m.group(1), 16)]), raw).decode("latin-1")), end
+
+
+def parse_object(data, pos):
+    """Parse one PDF object at `pos`; returns (value, end position)."""
+    pos = _skip_ws(data, pos)
+    if pos >= len(data):
+        raise _Truncated()
+    c = data[pos]
+
+    if data.startswith(b"<<", pos):
+        result = {}
+        pos += 2
+        while True:
+            pos = _skip_ws(data, pos)
+            if data.startswith(b">>", pos):
+                return result, pos + 2
+            if pos >= len(data):
+                raise _Truncated()
+            key, pos = parse_object(data, pos)
+            value, pos = parse_object(data, pos)
+            result[str(key)] = value
+
+    if c == 0x5B:  # [
+        items = []
+        pos += 1
+        while True:
+            pos = _skip_ws(data, pos)
+            if pos >= len(data):
+                raise _Truncated()
+            if data[pos] == 0x5D:
+                return items, pos + 1
+            value, pos = parse_object(data, pos)
+            items.append(value)
+
+    if c == 0x2F:  # /
+        return _name(data, pos)
+    if c == 0x28:  # (
+        return _literal_string(data, pos)
+    if c == 0x3C:  # <hex>
+        end = data.find(b">", pos)
+        if end < 0:
+            raise _Truncated()
+        digits = re.sub(rb"[^0-9A-Fa-f]", b"", data[pos + 1:end])
+        if len(digits) % 2:
+            digits += b"0"
+        return bytes.fromhex(digits.decode()), end + 1
+
+    ref = REF_RE.match(data, pos)
+    if ref:
+        return Ref(int(ref.group(1)), int(ref.group(2))), ref.end()
+
+    end = _token_end(data, pos)
+    token = data[pos:end]
+    if token == b"true":
+        return True, end
+    if token == b"false":
+        return False, end
+    if token == b"null":
+        return None, end
+    try:
+        return (float(token) if b"." in token else int(token)), end
+    except ValueError:
+        raise ValueError(f"Unexpected token {token[:20]!r} at {pos}")
+
+
+def _decode_stream(meta, raw):
+    filters = meta.get("Filter")
+    filters = filters if isinstance(filters, list) else [filters] if filters else []
+    if any(f != "FlateDecode" for f in filters):
+        raise ValueError(f"Unsupported stream filter: {filters}")
+    data = zlib.decompress(raw) if filters else raw
+
+    params = meta.get("DecodeParms") or {}
+    if isinstance(params, list):
+        params = params[0] or {}
+    predictor = params.get("Predictor", 1)
+    if predictor < 10:
+        return data
+
+    # PNG predictors, one filter byte per row
+    columns = params.get("Columns", 1) * params.get("Colors", 1) * params.get("BitsPerComponent", 8) // 8
+    bpp = max(1, params.get("Colors", 1) * params.get("BitsPerComponent", 8) // 8)
+    out = bytearray()
+    prev = bytearray(columns)
+    for start in range(0, len(data), columns + 1):
+        kind, row = data[start], bytearray(data[start + 1:start + 1 + columns])
+        for i in range(len(row)):
+            left = row[i - bpp] if i >= bpp else 0
+            up = prev[i]
+            if kind == 1:
+                row[i] = (row[i] + left) & 0xFF
+            elif kind == 2:
+                row[i] = (row[i] + up) & 0xFF
+            elif kind == 3:
+                row[i] = (row[i] + (left + up) // 2) & 0xFF
+            elif kind == 4:
+                up_left = prev[i - bpp] if i >= bpp else 0
+                p = left + up - up_left
+                pa, pb, pc = abs(p - left), abs(p - up), abs(p - up_left)
+                row[i] = (row[i] + (left if pa <= pb and pa <= pc else up if pb <= pc else up_left)) & 0xFF
+        out.extend(row)
+        prev = row
+    return bytes(out)
+
+
+# ----------------------------------------------------------------------
+# Cross-reference reader
+# ----------------------------------------------------------------------
+class _PdfReader:
+    def __init__(self, stream):
+        self.f = stream
+        self.f.seek(0, 2)
+        self.size = self.f.tell()
+        self.sections = []
+        self.trailer = None
+        self._objstm_cache = {}
+
+    def read(self, offset, length):
+        self.f.seek(offset)
+        return self.f.read(length)
+
+    def parse_at(self, offset, pattern=None):
+        """
+        Parse the object at `offset` (after `pattern`, e.g. "n g obj").
+        Returns (value, data, end) with `end` relative to `offset`.
+        """
+        window = 4096
+        while True:
+            data = self.read(offset, window)
+            pos = 0
+            if pattern is not None:
+                m = pattern.match(data)
+                if not m:
+                    raise ValueError(f"No object at offset {offset}")
+                pos = m.end()
+            try:
+                value, end = parse_object(data, pos)
+                return value, data, end
+            except _Truncated:
+                if len(data) < window or window >= MAX_OBJECT_BYTES:
+                    raise ValueError(f"Unterminated object at offset {offset}")
+                window *= 8
+
+    def object_at(self, offset):
+        """Indirect object at `offset`; returns (value, raw stream bytes or None)."""
+        value, data, end = self.parse_at(offset, OBJ_RE)
+        pos = _skip_ws(data, end)
+        if isinstance(value, dict) and data.startswith(b"stream", pos):
+            pos += 6
+            if data[pos:pos + 2] == b"\r\n":
+                pos += 2
+            elif data[pos:pos + 1] in (b"\n", b"\r"):
+                pos += 1
+            length = self.resolve(value.get("Length"))
+            return value, self.read(offset + pos, int(length))
+        return value, None
+
+    # -- xref sections ------------------------------------------------
+    def load(self):
+        version = VERSION_RE.search(self.read(0, 1024))
+        if not version:
+            raise ValueError("Missing %PDF header")
+        self.version = version.group(1).decode()
+
+        tail = self.read(max(0, self.size - TAIL_BYTES), TAIL_BYTES)
+        at = tail.rfind(b"startxref")
+        if at < 0:
+            raise ValueError("Missing startxref")
+        offset = int(re.match(rb"startxref\s+(\d+)", tail[at:]).group(1))
+
+        seen = set()
+        while offset is not None and offset not in seen:
+            seen.add(offset)
+            head = self.read(offset, 16).lstrip(WHITESPACE)
+            if head.startswith(b"xref"):
+                trailer, table = self._xref_table(offset)
+                # Hybrid file: the stream only fills in what the table lacks
+                hybrid = None
+                if "XRefStm" in trailer:
+                    hybrid = self._xref_stream(int(trailer["XRefStm"]))[1]
+                self.sections.append((table, hybrid))
+            else:
+                trailer, entries = self._xref_stream(offset)
+                self.sections.append(entries)
+
+            if self.trailer is None:
+                self.trailer = trailer
+            prev = trailer.get("Prev")
+            offset = int(prev) if prev is not None else None
+
+        if not self.trailer or "Root" not in self.trailer:
+            raise ValueError("Trailer has no /Root")
+
+    def _xref_table(self, offset):
+        """Classic table: remember where each subsection's 20-byte rows start."""
+        subsections = []
+        data = self.read(offset, 64)
+        pos = offset + data.index(b"xref") + 4
+        while True:
+            data = self.read(pos, 64)
+            m = SUBSECTION_RE.match(data)
+            if not m:
+                break
+            start, count = int(m.group(1)), int(m.group(2))
+            rows = pos + m.end()
+            first = self.read(rows, 20)
+            row_size = 20 if first[18:20] in (b" \n", b" \r", b"\r\n") else 19
+            subsections.append((start, count, rows, row_size))
+            pos = rows + count * row_size
+
+        data = self.read(pos, 64)
+        at = data.find(b"trailer")
+        if at < 0:
+            raise ValueError(f"No trailer after xref at {offset}")
+        trailer, _, _ = self.parse_at(pos + at + 7)
+        return trailer, subsections
+
+    def _xref_stream(self, offset):
+        meta, raw = self.object_at(offset)
+        if meta.get("Type") != "XRef" or raw is None:
+            raise ValueError(f"No xref stream at {offset}")
+        data = _decode_stream(meta, raw)
+
+        w1, w2, w3 = (int(x) for x in meta["W"])
+        row = w1 + w2 + w3
+        index = meta.get("Index") or [0, meta["Size"]]
+        entries = {}
+        pos = 0
+        for start, count in zip(index[0::2], index[1::2]):
+            for num in range(start, start + count):
+                fields = data[pos:pos + row]
+                pos += row
+                kind = int.from_bytes(fields[:w1], "big") if w1 else 1
+                a = int.from_bytes(fields[w1:w1 + w2], "big")
+                b = int.from_bytes(fields[w1 + w2:], "big")
+                entries[num] = (kind, a, b)
+        return meta, entries
+
+    def _table_entry(self, table, num):
+        for start, count, rows, row_size in table:
+            if start <= num < start + count:
+                row = self.read(rows + (num - start) * row_size, 18)
+                if row[17:18] == b"n":
+                    return 1, int(row[:10]), int(row[11:16])
+                return 0, 0, 0
+        return None
+
+    def _entry(self, num):
+        for section in self.sections:
+            if isinstance(section, dict):
+                if num in section:
+                    return section[num]
+                continue
+            table, hybrid = section
+            entry = self._table_entry(table, num)
+            # Objects in object streams are left out of a hybrid file's
+            # table or marked free there; the XRefStm stream locates them
+            if hybrid is not None and (entry is None or entry[0] == 0):
+                entry = hybrid.get(num, entry)
+            if entry is not None:
+                return entry
+        return None
+
+    # -- objects ------------------------------------------------------
+    def get(self, num):
+        entry = self._entry(num)
+        if entry is None or entry[0] == 0:
+            return None
+        if entry[0] == 1:
+            return self.object_at(entry[1])[0]
+        return self._from_object_stream(entry[1], entry[2])
+
+    def _from_object_stream(self, stream_num, index):
+        if stream_num not in self._objstm_cache:
+            meta, raw = self.object_at(self._entry(stream_num)[1])
+            self._objstm_cache[stream_num] = (meta, _decode_stream(meta, raw))
+        meta, data = self._objstm_cache[stream_num]
+        first = int(meta["First"])
+        header = [int(x) for x in data[:first].split()]
+        return parse_object(data, first + header[index * 2 + 1])[0]
+
+    def resolve(self, value):
+        while isinstance(value, Ref):
+            value = self.get(value.num)
+        return value
+
+
+# ----------------------------------------------------------------------
+# Standard security handler: does the empty user password open it?
+# ----------------------------------------------------------------------
+def _rc4(key, data):
+    s = list(range(256))
+    j = 0
+    for i in range(256):
+        j = (j + s[i] + key[i % len(key)]) & 0xFF
+        s[i], s[j] = s[j], s[i]
+    i = j = 0
+    out = bytearray()
+    for byte in data:
+        i = (i + 1) & 0xFF
+        j = (j + s[i]) & 0xFF
+        s[i], s[j] = s[j], s[i]
+        out.append(byte ^ s[(s[i] + s[j]) & 0xFF])
+    return bytes(out)
+
+
+def opens_without_password(encrypt, file_id):
+    """
+    True/False when the empty user password does/doesn't authenticate,
+    None when it cannot be decided here (R6, non-standard handlers).
+    """
+    if encrypt.get("Filter") != "Standard":
+        return None
+    revision = int(encrypt.get("R", 0))
+    owner, user = encrypt["O"], encrypt["U"]
+
+    if revision >= 6:
+        return None
+    if revision == 5:
+        return hashlib.sha256(user[32:40]).digest() == user[:32]
+
+    if revision == 2:
+        key_length = 5
+    elif int(encrypt.get("V", 0)) == 4:
+        key_length = 16
+    else:
+        key_length = int(encrypt.get("Length", 40)) // 8
+
+    digest = hashlib.md5(PASSWORD_PAD + owner[:32] + (int(encrypt["P"]) & 0xFFFFFFFF).to_bytes(4, "little") + file_id)
+    if revision >= 4 and encrypt.get("EncryptMetadata") is False:
+        digest.update(b"\xff\xff\xff\xff")
+    key = digest.digest()[:key_length]
+
+    if revision == 2:
+        return _rc4(key, PASSWORD_PAD) == user[:32]
+
+    for _ in range(50):
+        key = hashlib.md5(key).digest()[:key_length]
+    check = _rc4(key, hashlib.md5(PASSWORD_PAD + file_id).digest())
+    for i in range(1, 20):
+        check = _rc4(bytes(k ^ i for k in key), check)
+    return check == user[:16]
+
+
+# ----------------------------------------------------------------------
+# Public API
+# ----------------------------------------------------------------------
+def _sniff(stream):
+    reader = _PdfReader(stream)
+    reader.load()
+    trailer = reader.trailer
+
+    info = {
+        "version": reader.version,
+        "size": reader.size,
+        "encrypted": False,
+        "needs_password": False,
+        "encryption": None,
+        "pages": None,
+        "method": "sniff",
+    }
+
+    if trailer.get("Encrypt") is not None:
+        encrypt = reader.resolve(trailer["Encrypt"])
+        ids = trailer.get("ID") or [b""]
+        unlocked = opens_without_password(encrypt, ids[0] if isinstance(ids[0], bytes) else b"")
+        info["encrypted"] = True
+        info["encryption"] = {
+            "filter": encrypt.get("Filter"),
+            "v": encrypt.get("V"),
+            "r": encrypt.get("R"),
+            "bits": 40 if encrypt.get("R") == 2 else encrypt.get("Length", 40),
+        }
+        info["needs_password"] = None if unlocked is None else not unlocked
+
+    try:
+        root = reader.resolve(trailer["Root"])
+        pages = reader.resolve(root["Pages"])
+        info["pages"] = int(reader.resolve(pages["Count"]))
+    except Exception:
+        # Page tree inside an encrypted object stream; the lock state stands
+        if not info["encrypted"]:
+            raise
+    return info
+
+
+def _full_open(stream):
+    import pikepdf
+
+    stream.seek(0, 2)
+    size = stream.tell()
+    stream.seek(0)
+    info = {"size": size, "encryption": None, "method": "open"}
+    try:
+        with pikepdf.open(stream) as pdf:
+            info.update(
+                version=pdf.pdf_version,
+                encrypted=pdf.is_encrypted,
+                needs_password=False,
+                pages=len(pdf.pages),
+            )
+            if pdf.is_encrypted:
+                enc = pdf.encryption
+                info["encryption"] = {"filter": "Standard", "v": enc.V, "r": enc.R, "bits": enc.bits}
+    except pikepdf.PasswordError:
+        stream.seek(0)
+        version = VERSION_RE.search(stream.read(1024))
+        info.update(
+            version=version.group(1).decode() if version else None,
+            encrypted=True,
+            needs_password=True,
+            pages=None,
+        )
+    return info
+
+
+def sniff_pdf(stream):
+    """
+    Inspect a PDF from a seekable binary stream. Returns
+    {version, size, encrypted, needs_password, encryption, pages, method};
+    `method` is "sniff" or "open" (fallback). The stream is rewound.
+    Raises pikepdf errors only when the file is not a readable PDF at all.
+    """
+    try:
+        info = _sniff(stream)
+    except Exception as e:
+        print(f"⚠️ PDF sniff fell back to a full open: {e}")
+        info = None
+    try:
+        if info is None or info["needs_password"] is None:
+            opened = _full_open(stream)
+            if info is not None:
+                opened["encryption"] = opened["encryption"] or info["encryption"]
+            info = opened
+    finally:
+        stream.seek(0)
+    return info
@@ -0,0 +1,70 @@
+# backend/utils/pool_document.py
+"""
+Per-process document handle for pool workers.
+
+Pool tasks for one request (pages to render, images to recompress) all
+read the same input, so each worker process keeps the document open
+between tasks instead of reopening it for every one. The handle is keyed
+by (path, inode, mtime), so a new file at a reused path is never mistaken
+for the old one. It is closed once no task has used it for
+POOL_DOCUMENT_IDLE seconds: the request's workspace is gone by then, and
+an open handle would keep the deleted input (possibly in tmpfs RAM) alive
+until that worker happened to get another job.
+
+Config (env):
+    POOL_DOCUMENT_IDLE  seconds an unused document stays open (default 2)
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+POOL_DOCUMENT_IDLE = float(os.getenv("POOL_DOCUMENT_IDLE", "2"))
+
+
+class PoolDocument:
+    """The one document a pool process is working on; `opener(path)` opens it."""
+
+    def __init__(self, opener, idle=POOL_DOCUMENT_IDLE):
+        self.opener = opener
+        self.idle = idle
+        self._key = None
+        self._doc = None
+        self._lock = threading.Lock()
+        self._timer = None
+        self._uses = 0
+
+    @contextmanager
+    def use(self, path):
+        """Yield the open document for `path`; it is not closed while in use."""
+        with self._lock:
+            stat = os.stat(path)
+            key = (path, stat.st_ino, stat.st_mtime_ns)
+            if key != self._key:
+                self._close()
+                self._doc = self.opener(path)
+                self._key = key
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._uses += 1
+            try:
+                yield self._doc
+            finally:
+                self._timer = threading.Timer(self.idle, self._expire, args=(self._uses,))
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _expire(self, uses):
+        with self._lock:
+            # Only when no task came in since this timer was set
+            if uses == self._uses:
+                self._close()
+
+    def _close(self):
+        if self._doc is not None:
+            try:
+                self._doc.close()
+            except Exception:
+                pass
+        self._doc = None
+        self._key = None
@@ -0,0 +1,260 @@
+# backend/utils/result_cache.py
+"""
+Content-addressed cache for tool outputs.
+
+Keys are the SHA-256 of the input bytes plus the tool name and its
+parameters, so re-uploading the same deck / spreadsheet / PDF with the
+same options streams the stored output back without starting soffice,
+Ghostscript, pdf2docx or poppler again.
+
+Outputs live on local disk. Total size is bounded with LRU eviction
+(access time is tracked through the file mtime so every web worker on
+the node shares one view) and entries can optionally expire after a TTL.
+
+Config (env):
+    TOOL_CACHE_ENABLED   "false" turns the cache off (default on)
+    TOOL_CACHE_DIR       storage folder (default uploads/cache)
+    TOOL_CACHE_MAX_MB    size bound before eviction (default 1024)
+    TOOL_CACHE_TTL       seconds an entry stays valid, 0 = forever (default 0)
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from flask import send_file
+
+CACHE_ENABLED = os.getenv("TOOL_CACHE_ENABLED", "true").lower() != "false"
+CACHE_DIR = os.getenv("TOOL_CACHE_DIR", os.path.join(os.getcwd(), "uploads", "cache"))
+CACHE_MAX_MB = int(os.getenv("TOOL_CACHE_MAX_MB", "1024"))
+CACHE_TTL = int(os.getenv("TOOL_CACHE_TTL", "0"))
+
+CHUNK_SIZE = 1024 * 1024
+
+
+# ----------------------------------------------------------
+# Hashing helpers
+# ----------------------------------------------------------
+def sha256_file(path):
+    """SHA-256 hex digest of a file on disk."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def sha256_upload(file_storage):
+    """SHA-256 hex digest of an uploaded file; rewinds the stream afterwards."""
+    # Stored upload handles already know their digest
+    known = getattr(file_storage, "sha256", None)
+    if known:
+        return known
+
+    digest = hashlib.sha256()
+    stream = file_storage.stream
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+def make_key(tool, input_digests, params=None):
+    """Cache key for `tool` run over the inputs (in order) with `params`."""
+    payload = json.dumps(
+        {"tool": tool, "inputs": list(input_digests), "params": params or {}},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# ----------------------------------------------------------
+# Disk cache
+# ----------------------------------------------------------
+class ResultCache:
+    def __init__(self, root=CACHE_DIR, max_bytes=CACHE_MAX_MB * 1024 * 1024, ttl=CACHE_TTL):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        os.makedirs(self.root, exist_ok=True)
+        self._approx_bytes = self._scan_size()
+
+    def _paths(self, key):
+        folder = os.path.join(self.root, key[:2])
+        return os.path.join(folder, f"{key}.bin"), os.path.join(folder, f"{key}.json")
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _remove(self, key):
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def get(self, key):
+        """Return the cached entry for `key` or None. Refreshes its LRU position."""
+        data_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if not os.path.exists(data_path):
+                raise FileNotFoundError(data_path)
+        except (FileNotFoundError, ValueError):
+            self._count("misses")
+            return None
+
+        if self.ttl and time.time() - meta.get("created", 0) > self.ttl:
+            self._remove(key)
+            self._count("misses")
+            return None
+
+        os.utime(data_path, None)
+        self._count("hits")
+        meta["path"] = data_path
+        return meta
+
+    def put(self, key, source, download_name, mimetype, headers=None):
+        """
+        Store `source` (a file path or bytes / BytesIO) under `key`.
+        Returns the path of the stored copy.
+        """
+        data_path, meta_path = self._paths(key)
+        folder = os.path.dirname(data_path)
+        os.makedirs(folder, exist_ok=True)
+
+        # Write to a temp name first so readers never see half a file
+        fd, tmp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        with os.fdopen(fd, "wb") as out:
+            if isinstance(source, (str, os.PathLike)):
+                with open(source, "rb") as f:
+                    shutil.copyfileobj(f, out, CHUNK_SIZE)
+            elif isinstance(source, (bytes, bytearray, memoryview)):
+                out.write(source)
+            else:
+                source.seek(0)
+                shutil.copyfileobj(source, out, CHUNK_SIZE)
+                source.seek(0)
+        os.replace(tmp_path, data_path)
+
+        meta = {
+            "download_name": download_name,
+            "mimetype": mimetype,
+            "headers": headers or {},
+            "created": time.time(),
+        }
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+        size = os.path.getsize(data_path)
+        with self._lock:
+            self._counters["stores"] += 1
+            self._approx_bytes += size
+            needs_eviction = self._approx_bytes > self.max_bytes
+
+        if needs_eviction:
+            self.evict()
+        return data_path
+
+    def _entries(self):
+        for folder, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith(".bin"):
+                    path = os.path.join(folder, name)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    yield name[:-4], st.st_size, st.st_mtime
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """Drop least-recently-used (and expired) entries until under the size bound."""
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        now = time.time()
+        evicted = 0
+
+        for key, size, mtime in entries:
+            expired = self.ttl and now - mtime > self.ttl
+            if total <= self.max_bytes and not expired:
+                continue
+            self._remove(key)
+            total -= size
+            evicted += 1
+
+        with self._lock:
+            self._approx_bytes = total
+            self._counters["evictions"] += evicted
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            counters["size_bytes"] = self._approx_bytes
+        lookups = counters["hits"] + counters["misses"]
+        counters["hit_rate"] = round(counters["hits"] / lookups, 4) if lookups else 0.0
+        counters["max_bytes"] = self.max_bytes
+        counters["ttl_seconds"] = self.ttl
+        counters["enabled"] = CACHE_ENABLED
+        return counters
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Return the process-wide result cache (created on first use)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache()
+        return _cache
+
+
+# ----------------------------------------------------------
+# Route helpers
+# ----------------------------------------------------------
+def cache_lookup(tool, uploads, params=None):
+    """
+    Hash the uploads and look the result up.
+    Returns (key, entry) — entry is None on a miss, key is None when disabled.
+    """
+    if not CACHE_ENABLED:
+        return None, None
+    key = make_key(tool, [sha256_upload(f) for f in uploads], params)
+    return key, get_cache().get(key)
+
+
+def cache_store(key, source, download_name, mimetype, headers=None):
+    """Save a fresh result; a failing cache never fails the request."""
+    if key is None:
+        return
+    try:
+        get_cache().put(key, source, download_name, mimetype, headers)
+    except Exception as e:
+        print("⚠️ Result cache store failed:", e)
+
+
+def send_cached(entry, download_name=None):
+    """Stream a cached entry straight back to the client."""
+    response = send_file(
+        entry["path"],
+        as_attachment=True,
+        download_name=download_name or entry["download_name"],
+        mimetype=entry["mimetype"],
+    )
+    for name, value in entry.get("headers", {}).items():
+        response.headers[name] = value
+    response.headers["x-cache"] = "HIT"
+    return response
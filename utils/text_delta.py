@@ -0,0 +1,53 @@
+# backend/utils/text_delta.py
+"""
+Text deltas for document saves.
+
+A delta is a list of operations walked left to right over the current text
+(the same shape as a Quill delta):
+    {"retain": n}    keep the next n characters
+    {"delete": n}    drop the next n characters
+    {"insert": "s"}  insert s here
+Whatever follows the last operation is kept.
+
+Lengths and positions count UTF-16 code units, as JavaScript strings do,
+so emoji and other astral characters count as two.
+"""
+
+UNIT = 2  # bytes per UTF-16 code unit
+
+
+def apply_delta(text, ops):
+    """
+    Apply `ops` to `text` and return the new text.
+    Raises ValueError for a malformed delta or one that runs past the end.
+    """
+    if not isinstance(ops, list):
+        raise ValueError("ops must be a list")
+
+    source = text.encode("utf-16-le")
+    parts, pos = [], 0
+    for op in ops:
+        if not isinstance(op, dict) or len(op) != 1:
+            raise ValueError(f"Invalid operation: {op!r}")
+        (kind, value), = op.items()
+
+        if kind == "insert":
+            if not isinstance(value, str):
+                raise ValueError("insert takes a string")
+            parts.append(value.encode("utf-16-le"))
+            continue
+
+        if kind not in ("retain", "delete") or not isinstance(value, int) or isinstance(value, bool) or value < 1:
+            raise ValueError(f"Invalid operation: {op!r}")
+        end = pos + value * UNIT
+        if end > len(source):
+            raise ValueError(f"{kind} runs past the end of the document")
+        if kind == "retain":
+            parts.append(source[pos:end])
+        pos = end
+
+    parts.append(source[pos:])
+    try:
+        return b"".join(parts).decode("utf-16-le")
+    except UnicodeDecodeError:
+        raise ValueError("Delta splits a character in two")
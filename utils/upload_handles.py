@@ -0,0 +1,309 @@
+# backend/utils/upload_handles.py
+"""
+Upload-once file handles.
+
+Multi-step flows (check → unlock, check → protect, estimate → compress)
+used to send the same file on every step. POST /api/tools/upload stores
+it once and returns a handle; any tool then takes `handle` (or `handles`
+for multi-file tools) in place of the multipart file.
+
+A handle is a random token issued per upload, so it cannot be derived
+from the file and is never shared between uploaders; it keeps its own
+filename. Behind it the bytes are stored by SHA-256: uploading content
+that is already stored adds a handle without storing or parsing it again.
+
+Handles expire after a TTL that is refreshed on every use. Content goes
+once no live handle points to it.
+
+Config (env):
+    UPLOAD_HANDLE_DIR  storage folder (default uploads/handles)
+    UPLOAD_HANDLE_TTL  seconds a handle stays valid after last use (default 3600)
+"""
+import json
+import os
+import re
+import secrets
+import shutil
+import tempfile
+import threading
+import time
+from flask import request
+from utils.result_cache import sha256_file
+from utils.pdf_sniff import sniff_pdf
+from utils.upload_ingest import received
+
+UPLOAD_HANDLE_DIR = os.getenv("UPLOAD_HANDLE_DIR", os.path.join(os.getcwd(), "uploads", "handles"))
+UPLOAD_HANDLE_TTL = int(os.getenv("UPLOAD_HANDLE_TTL", "3600"))
+
+HANDLE_BYTES = 24
+HANDLE_PATTERN = re.compile(r"^[A-Za-z0-9_-]{32}$")
+PURGE_INTERVAL = 300
+
+
+class UploadHandleError(ValueError):
+    """Unknown or expired upload handle."""
+
+
+# ----------------------------------------------------------
+# Metadata
+# ----------------------------------------------------------
+def pdf_metadata(path):
+    """
+    Page count, encryption state and version of a PDF on disk.
+    `needs_password` is set when a user password is required to open it.
+    """
+    with open(path, "rb") as f:
+        info = sniff_pdf(f)
+    return {
+        "pages": info["pages"],
+        "encrypted": info["encrypted"],
+        "needs_password": info["needs_password"],
+        "version": info["version"],
+        "encryption": info["encryption"],
+    }
+
+
+def file_metadata(path, filename):
+    meta = {"size": os.path.getsize(path)}
+    if filename.lower().endswith(".pdf"):
+        try:
+            meta["pdf"] = pdf_metadata(path)
+        except Exception as e:
+            meta["pdf"] = {"error": str(e)}
+    return meta
+
+
+# ----------------------------------------------------------
+# Store
+# ----------------------------------------------------------
+class HandleStore:
+    """
+    Layout under `root`:
+        blobs/<sha256>.bin     file content, stored once per distinct content
+        blobs/<sha256>.json    content metadata (size, pdf info), parsed once
+        handles/<token>.json   one per upload: sha256, filename, expires_at
+    """
+
+    def __init__(self, root=UPLOAD_HANDLE_DIR, ttl=UPLOAD_HANDLE_TTL):
+        self.root = root
+        self.ttl = ttl
+        self._last_purge = 0
+        self.blob_dir = os.path.join(self.root, "blobs")
+        self.handle_dir = os.path.join(self.root, "handles")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.handle_dir, exist_ok=True)
+
+    def _blob_paths(self, sha):
+        return os.path.join(self.blob_dir, f"{sha}.bin"), os.path.join(self.blob_dir, f"{sha}.json")
+
+    def _handle_path(self, handle):
+        return os.path.join(self.handle_dir, f"{handle}.json")
+
+    @staticmethod
+    def _write_json(path, data):
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _read_json(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _content_meta(self, sha):
+        """Metadata of stored content (marking it in use), or None."""
+        data_path, meta_path = self._blob_paths(sha)
+        meta = self._read_json(meta_path)
+        if meta is None or not os.path.exists(data_path):
+            return None
+        try:
+            os.utime(data_path)
+        except FileNotFoundError:
+            return None
+        return meta
+
+    def _store_content(self, file_storage):
+        """Store the upload's bytes (once per content); returns (sha256, content meta)."""
+        # Ingested uploads arrive hashed: known content is not stored twice
+        sha = getattr(file_storage, "sha256", None)
+        meta = self._content_meta(sha) if sha else None
+        if meta is not None:
+            return sha, meta
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.blob_dir, suffix=".tmp")
+        os.close(fd)
+        os.remove(tmp_path)  # free the name so save() can hard-link
+        try:
+            file_storage.save(tmp_path)
+            sha = sha or sha256_file(tmp_path)
+            meta = self._content_meta(sha)
+            if meta is None:
+                data_path, meta_path = self._blob_paths(sha)
+                os.replace(tmp_path, data_path)
+                meta = file_metadata(data_path, file_storage.filename)
+                if getattr(file_storage, "kind", None):
+                    meta["kind"] = file_storage.kind
+                self._write_json(meta_path, meta)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return sha, meta
+
+    def put(self, file_storage):
+        """
+        Store an uploaded file under a new random handle; returns its
+        metadata (including the handle). Every upload gets its own handle,
+        even when the same bytes are already stored.
+        """
+        self.purge_expired()
+
+        sha, content = self._store_content(file_storage)
+        handle = secrets.token_urlsafe(HANDLE_BYTES)
+        entry = {"sha256": sha, "filename": file_storage.filename, "expires_at": time.time() + self.ttl}
+        self._write_json(self._handle_path(handle), entry)
+        return {**content, "handle": handle, "filename": entry["filename"], "expires_at": entry["expires_at"]}
+
+    def get(self, handle):
+        """Metadata for a live handle (refreshing its expiry), or None."""
+        if not handle or not HANDLE_PATTERN.match(handle):
+            return None
+        entry = self._read_json(self._handle_path(handle))
+        if entry is None or entry.get("expires_at", 0) < time.time():
+            return None
+        content = self._content_meta(entry["sha256"])
+        if content is None:
+            return None
+
+        entry["expires_at"] = time.time() + self.ttl
+        self._write_json(self._handle_path(handle), entry)
+        data_path, _ = self._blob_paths(entry["sha256"])
+        return {**content, "handle": handle, **entry, "path": data_path}
+
+    def purge_expired(self):
+        """
+        Remove expired handles, then content no live handle points to
+        (at most every few minutes). Content is only removed once it has
+        been unused for a full TTL, so a concurrent put() that is about to
+        reference it keeps it.
+        """
+        now = time.time()
+        if now - self._last_purge < PURGE_INTERVAL:
+            return
+        self._last_purge = now
+
+        live = set()
+        for name in os.listdir(self.handle_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.handle_dir, name)
+            entry = self._read_json(path) or {}
+            if entry.get("expires_at", 0) < now:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            else:
+                live.add(entry.get("sha256"))
+
+        for name in os.listdir(self.blob_dir):
+            if not name.endswith(".bin") or name[:-4] in live:
+                continue
+            data_path, meta_path = self._blob_paths(name[:-4])
+            try:
+                if os.path.getmtime(data_path) > now - self.ttl:
+                    continue
+            except FileNotFoundError:
+                pass
+            for path in (data_path, meta_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_handle_store():
+    """Return the process-wide handle store (created on first use)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = HandleStore()
+        return _store
+
+
+# ----------------------------------------------------------
+# Route helpers
+# ----------------------------------------------------------
+class HandleUpload:
+    """
+    Stand-in for a werkzeug FileStorage backed by a stored handle, so
+    tools treat "uploaded now" and "uploaded earlier" the same way.
+    """
+
+    def __init__(self, meta):
+        self.meta = meta
+        self.handle = meta["handle"]
+        self.filename = meta.get("filename") or "upload"
+        self.path = meta["path"]
+        self.sha256 = meta["sha256"]
+
+    def save(self, dst, buffer_size=None):
+        """Hard-link the stored file into the work dir (copy across filesystems)."""
+        try:
+            os.link(self.path, dst)
+        except OSError:
+            shutil.copyfile(self.path, dst)
+
+
+def upload_pdf_info(upload):
+    """
+    Encryption / page metadata for an upload: cached for stored handles,
+    otherwise sniffed from the request stream (nothing is written to disk).
+    """
+    pdf_meta = getattr(upload, "meta", {}).get("pdf") or {}
+    if "needs_password" in pdf_meta:
+        return pdf_meta
+    if isinstance(upload, HandleUpload):
+        return pdf_metadata(upload.path)
+    return sniff_pdf(upload.stream)
+
+
+def resolve_handle(handle):
+    meta = get_handle_store().get((handle or "").strip())
+    if meta is None:
+        raise UploadHandleError("Upload handle is unknown or expired; please upload the file again")
+    return HandleUpload(meta)
+
+
+def get_upload(field="file"):
+    """
+    The multipart file in `field`, else the file behind the `handle` form
+    field, else None. Raises UploadHandleError for a dead handle.
+    """
+    file = request.files.get(field)
+    if file and file.filename:
+        return received(file)
+    if request.form.get("handle"):
+        return resolve_handle(request.form["handle"])
+    return None
+
+
+def get_uploads(field="files"):
+    """
+    Multipart files in `field`, or the files behind `handles` (repeated
+    or comma-separated, in order). Empty list when neither is present.
+    """
+    files = [received(f) for f in request.files.getlist(field) if f and f.filename]
+    if files:
+        return files
+    handles = []
+    for value in request.form.getlist("handles"):
+        handles.extend(h for h in value.split(",") if h.strip())
+    return [resolve_handle(h) for h in handles]
@@ -0,0 +1,223 @@
+# backend/utils/upload_ingest.py
+"""
+Streamed upload ingestion.
+
+Werkzeug normally spools each multipart file to memory or a temp file,
+and the tool then copies it again with `file.save()`. With IngestRequest
+as the app's request class, every file part is streamed in chunks
+straight into a per-request workspace instead. Each chunk is hashed
+(SHA-256) and the first bytes are kept for a magic-number sniff, all in
+the same pass. Saving such an upload into a tool's work dir hard-links
+it rather than copying. The digest feeds the result cache and the upload
+handle store, so nothing re-reads the file to hash it.
+
+Size limits are enforced before any file data is read when the client
+sends Content-Length, and while reading otherwise:
+- MAX_UPLOAD_MB is the limit for every route
+- tools with bigger inputs get their own limit (see TOOL_UPLOAD_LIMITS_MB)
+- the lock /check routes take up to CHECK_UPLOAD_MB
+An oversized request is answered with 413. An upload whose content does
+not match its extension is answered with 415.
+
+The /check routes only read a PDF's header and trailer (utils/pdf_sniff),
+so they are not ingested: their files keep werkzeug's own seekable stream
+and are never hashed or linked into a workspace.
+
+Config (env):
+    MAX_UPLOAD_MB     request body limit for every route (default 100)
+    UPLOAD_LIMITS_MB  per-tool overrides, e.g. "pdf-merge=500,pdf-compress=300"
+    CHECK_UPLOAD_MB   request body limit for the /check routes (default 500)
+"""
+import hashlib
+import os
+import tempfile
+from flask import Request, request
+from werkzeug.datastructures import FileStorage
+from werkzeug.exceptions import UnsupportedMediaType
+from utils.job_queue import cleanup_paths
+from utils.workspace import new_workspace
+
+MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "100"))
+CHECK_UPLOAD_MB = int(os.getenv("CHECK_UPLOAD_MB", "500"))
+
+# Multi-file tools take more in one request than a single-file tool
+TOOL_UPLOAD_LIMITS_MB = {
+    "pdf-merge": 500,
+    "image-to-pdf": 300,
+    "office-to-pdf": 500,
+    "pdf-compress": 300,
+}
+for _item in os.getenv("UPLOAD_LIMITS_MB", "").split(","):
+    if "=" in _item:
+        _tool, _mb = _item.split("=", 1)
+        TOOL_UPLOAD_LIMITS_MB[_tool.strip()] = int(_mb)
+# Handles stand in for uploads to any tool, so they accept the largest
+TOOL_UPLOAD_LIMITS_MB.setdefault("upload", max([MAX_UPLOAD_MB, *TOOL_UPLOAD_LIMITS_MB.values()]))
+
+TOOLS_PREFIX = "/api/tools/"
+SNIFF_BYTES = 1024
+
+# Extensions whose content is checked. Any image type passes for an image
+# extension (the decoder does not care about a wrong one). Legacy Office
+# formats are left out: LibreOffice also opens the RTF / HTML / CSV files
+# saved under them.
+IMAGE_KINDS = {"jpeg", "png", "gif", "webp", "bmp", "tiff"}
+EXTENSION_KINDS = {
+    ".pdf": {"pdf"},
+    ".docx": {"zip"},
+    ".xlsx": {"zip"},
+    ".pptx": {"zip"},
+    **{ext: IMAGE_KINDS for ext in (".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp", ".tif", ".tiff")},
+}
+
+
+def sniff_kind(head):
+    """File type from its first bytes, or None when unrecognised."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head.startswith(b"PK\x03\x04"):
+        return "zip"
+    if head.startswith(b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"):
+        return "ole"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    if head.startswith((b"II*\x00", b"MM\x00*")):
+        return "tiff"
+    if head.startswith(b"BM"):
+        return "bmp"
+    if head.startswith(b"{\\rtf"):
+        return "rtf"
+    # Readers accept junk before the header, as long as it is near the start
+    if b"%PDF-" in head:
+        return "pdf"
+    return None
+
+
+def upload_limit(tool):
+    """Request body limit in bytes for a tool (URL name, e.g. "pdf-merge")."""
+    return TOOL_UPLOAD_LIMITS_MB.get(tool, MAX_UPLOAD_MB) * 1024 * 1024
+
+
+def is_check_route(path):
+    """A tool's header-only /check route (e.g. /api/tools/unlock-pdf/check)."""
+    return path.startswith(TOOLS_PREFIX) and path.rstrip("/").endswith("/check")
+
+
+# ----------------------------------------------------------
+# Receiving
+# ----------------------------------------------------------
+class IngestFile:
+    """Upload sink: writes to disk, hashing and keeping the head as it goes."""
+
+    def __init__(self, path):
+        self.path = path
+        self.size = 0
+        self._file = open(path, "w+b")
+        self._digest = hashlib.sha256()
+        self._head = b""
+
+    def write(self, data):
+        if len(self._head) < SNIFF_BYTES:
+            self._head += bytes(data[:SNIFF_BYTES - len(self._head)])
+        self._digest.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    @property
+    def sha256(self):
+        return self._digest.hexdigest()
+
+    @property
+    def kind(self):
+        return sniff_kind(self._head)
+
+    def __iter__(self):
+        return iter(self._file)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+class IngestRequest(Request):
+    """Request class that streams file parts into a request workspace."""
+
+    _ingest_dir = None
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if is_check_route(self.path):
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        if self._ingest_dir is None:
+            self._ingest_dir = new_workspace("upload-", expected_bytes=total_content_length or 0)
+        fd, path = tempfile.mkstemp(dir=self._ingest_dir, suffix=".part")
+        os.close(fd)
+        return IngestFile(path)
+
+    def close(self):
+        # Tools hold hard links to what they kept; the received parts can go
+        try:
+            super().close()
+        finally:
+            if self._ingest_dir is not None:
+                cleanup_paths([self._ingest_dir])
+                self._ingest_dir = None
+
+
+class IngestedUpload(FileStorage):
+    """A received upload already on disk: `save` links it instead of copying."""
+
+    @classmethod
+    def from_storage(cls, file):
+        return cls(stream=file.stream, filename=file.filename, name=file.name, headers=file.headers)
+
+    @property
+    def sha256(self):
+        return self.stream.sha256
+
+    @property
+    def kind(self):
+        return self.stream.kind
+
+    def save(self, dst, buffer_size=16384):
+        if isinstance(dst, (str, os.PathLike)):
+            self.stream.flush()
+            try:
+                os.link(self.stream.path, dst)
+                return
+            except OSError:
+                pass  # other filesystem or target exists: copy
+        super().save(dst, buffer_size)
+
+
+def received(file):
+    """Wrap a parsed multipart file if it came in through IngestRequest."""
+    if isinstance(file.stream, IngestFile):
+        return IngestedUpload.from_storage(file)
+    return file
+
+
+# ----------------------------------------------------------
+# Tool hook
+# ----------------------------------------------------------
+def ingest_uploads():
+    """
+    before_request hook for the tool routes. It applies the tool's size
+    limit and receives the body before the view runs, so oversized (413)
+    and mislabelled (415) uploads never reach tool code.
+    """
+    if is_check_route(request.path):
+        request.max_content_length = CHECK_UPLOAD_MB * 1024 * 1024
+        return
+    tool = request.path.split(TOOLS_PREFIX, 1)[-1].split("/", 1)[0]
+    request.max_content_length = upload_limit(tool)
+
+    for _, file in request.files.items(multi=True):
+        if not isinstance(file.stream, IngestFile) or not file.filename:
+            continue
+        ext = os.path.splitext(file.filename.lower())[1]
+        expected = EXTENSION_KINDS.get(ext)
+        if expected and file.stream.kind not in expected:
+            raise UnsupportedMediaType(f"{file.filename} is not a valid {ext[1:].upper()} file")
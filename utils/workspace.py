@@ -0,0 +1,211 @@
+# backend/utils/workspace.py
+"""
+Per-request scratch workspaces.
+
+Every tool request gets its own uniquely named directory. Inputs,
+intermediates and outputs live there under fixed names, so concurrent
+requests never overwrite each other. The route removes the directory once
+the response has been sent (`cleanup=[work_dir]`).
+
+Workspaces go to a RAM-backed tmpfs (/dev/shm) when it has room for the
+request. Otherwise they fall back to disk. Room means the request body
+times WORKSPACE_SIZE_FACTOR, plus the reserve left for other users.
+
+A background janitor thread catches whatever a crash or a dropped
+connection left behind:
+- it removes workspaces older than WORKSPACE_MAX_AGE
+- when a root exceeds its size budget, it removes the oldest workspaces
+  that are past the grace period
+- it leaves alone workspaces held by a queued or running job. The job
+  queue marks them (`hold_workspaces`) and refreshes the mark on every
+  heartbeat, so a mark older than WORKSPACE_HOLD_TIMEOUT means the job's
+  worker died and the workspace is reclaimed as usual.
+
+Config (env):
+    WORKSPACE_TMPFS_DIR         RAM-backed root (default /dev/shm/viadocs-work; empty = disk only)
+    WORKSPACE_DISK_DIR          disk root (default <system temp>/viadocs-work)
+    WORKSPACE_TMPFS_RESERVE_MB  tmpfs space always left free (default 256)
+    WORKSPACE_MAX_AGE           seconds before any workspace is reclaimed (default 3600)
+    WORKSPACE_MAX_TOTAL_MB      size budget per root (default 4096)
+    WORKSPACE_EVICT_GRACE       seconds a workspace is safe from size eviction (default 600)
+    WORKSPACE_JANITOR_INTERVAL  seconds between janitor sweeps (default 120)
+    WORKSPACE_HOLD_TIMEOUT      seconds a job's hold lasts without a refresh (default 300)
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+from flask import has_request_context, request
+
+WORKSPACE_TMPFS_DIR = os.getenv("WORKSPACE_TMPFS_DIR", "/dev/shm/viadocs-work")
+WORKSPACE_DISK_DIR = os.getenv("WORKSPACE_DISK_DIR", os.path.join(tempfile.gettempdir(), "viadocs-work"))
+WORKSPACE_TMPFS_RESERVE_MB = int(os.getenv("WORKSPACE_TMPFS_RESERVE_MB", "256"))
+WORKSPACE_MAX_AGE = int(os.getenv("WORKSPACE_MAX_AGE", "3600"))
+WORKSPACE_MAX_TOTAL_MB = int(os.getenv("WORKSPACE_MAX_TOTAL_MB", "4096"))
+WORKSPACE_EVICT_GRACE = int(os.getenv("WORKSPACE_EVICT_GRACE", "600"))
+WORKSPACE_JANITOR_INTERVAL = int(os.getenv("WORKSPACE_JANITOR_INTERVAL", "120"))
+WORKSPACE_HOLD_TIMEOUT = int(os.getenv("WORKSPACE_HOLD_TIMEOUT", "300"))
+
+# Marker file of a workspace held by a job
+HOLD_MARKER = ".job-hold"
+
+# Inputs + intermediates + output of a typical tool, relative to the upload
+WORKSPACE_SIZE_FACTOR = 3
+
+_tmpfs_usable = None
+_janitor = None
+_janitor_lock = threading.Lock()
+
+
+# ----------------------------------------------------------
+# Roots
+# ----------------------------------------------------------
+def _prepare_root(root):
+    """Create `root` if needed; True when it can hold workspaces."""
+    try:
+        os.makedirs(root, exist_ok=True)
+        return os.access(root, os.W_OK | os.X_OK)
+    except OSError:
+        return False
+
+
+def _tmpfs_root():
+    global _tmpfs_usable
+    if not WORKSPACE_TMPFS_DIR:
+        return None
+    if _tmpfs_usable is None:
+        parent = os.path.dirname(WORKSPACE_TMPFS_DIR.rstrip("/")) or "/"
+        _tmpfs_usable = os.path.isdir(parent) and _prepare_root(WORKSPACE_TMPFS_DIR)
+        if not _tmpfs_usable:
+            print(f"⚠️ tmpfs workspace root {WORKSPACE_TMPFS_DIR} unavailable — using disk")
+    return WORKSPACE_TMPFS_DIR if _tmpfs_usable else None
+
+
+def _has_room(root, expected_bytes):
+    try:
+        stats = os.statvfs(root)
+    except OSError:
+        return False
+    free = stats.f_bavail * stats.f_frsize
+    return free - expected_bytes * WORKSPACE_SIZE_FACTOR > WORKSPACE_TMPFS_RESERVE_MB * 1024 * 1024
+
+
+def workspace_roots():
+    """The roots workspaces may live in (tmpfs first)."""
+    return [root for root in (_tmpfs_root(), WORKSPACE_DISK_DIR) if root]
+
+
+# ----------------------------------------------------------
+# Public API
+# ----------------------------------------------------------
+def new_workspace(prefix="work-", expected_bytes=None):
+    """
+    Create a fresh, uniquely named scratch directory and return its path.
+    `expected_bytes` defaults to the size of the current request body.
+    """
+    _start_janitor()
+
+    if expected_bytes is None:
+        expected_bytes = (request.content_length or 0) if has_request_context() else 0
+
+    tmpfs = _tmpfs_root()
+    if tmpfs is not None and _has_room(tmpfs, expected_bytes):
+        root = tmpfs
+    else:
+        root = WORKSPACE_DISK_DIR
+        os.makedirs(root, exist_ok=True)
+    return tempfile.mkdtemp(prefix=prefix, dir=root)
+
+
+def hold_workspaces(paths):
+    """Mark workspaces as in use by a job, or refresh the mark."""
+    for path in paths or []:
+        marker = os.path.join(path, HOLD_MARKER)
+        try:
+            with open(marker, "a"):
+                pass
+            os.utime(marker)
+        except OSError:
+            pass  # not a directory, or already removed
+
+
+def _held(path, now):
+    try:
+        return now - os.stat(os.path.join(path, HOLD_MARKER)).st_mtime < WORKSPACE_HOLD_TIMEOUT
+    except OSError:
+        return False
+
+
+def _workspace_size(path):
+    total = 0
+    for folder, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(folder, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def sweep_workspaces(now=None):
+    """
+    Remove expired workspaces, then the oldest ones over the size budget.
+    Returns the number of workspaces removed.
+    """
+    now = now or time.time()
+    budget = WORKSPACE_MAX_TOTAL_MB * 1024 * 1024
+    removed = 0
+
+    for root in workspace_roots():
+        try:
+            names = os.listdir(root)
+        except OSError:
+            continue
+
+        live = []
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                modified = os.stat(path).st_mtime
+            except OSError:
+                continue
+            held = os.path.isdir(path) and _held(path, now)
+            if now - modified > WORKSPACE_MAX_AGE and not held:
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+            elif os.path.isdir(path):
+                live.append((modified, path, _workspace_size(path), held))
+
+        # Over budget: oldest first, but never one a request or job may still be using
+        total = sum(size for _, _, size, _ in live)
+        for modified, path, size, held in sorted(live):
+            if total <= budget:
+                break
+            if held or now - modified < WORKSPACE_EVICT_GRACE:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            removed += 1
+
+    return removed
+
+
+def _janitor_loop():
+    while True:
+        try:
+            removed = sweep_workspaces()
+            if removed:
+                print(f"🧹 Workspace janitor removed {removed} stale workspace(s)")
+        except Exception as e:
+            print("⚠️ Workspace janitor error:", e)
+        time.sleep(WORKSPACE_JANITOR_INTERVAL)
+
+
+def _start_janitor():
+    """Start the background janitor once per process."""
+    global _janitor
+    with _janitor_lock:
+        if _janitor is None or not _janitor.is_alive():
+            _janitor = threading.Thread(target=_janitor_loop, name="workspace-janitor", daemon=True)
+            _janitor.start()
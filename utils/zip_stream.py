@@ -0,0 +1,122 @@
+# backend/utils/zip_stream.py
+"""
+Streaming ZIP writer shared by every tool that returns several files.
+
+Entries are written through `zipfile` into an unseekable buffer (so it
+emits data descriptors instead of seeking back) and each entry's bytes
+are handed to the client as soon as it is written. Already-compressed
+formats (JPEG, PNG, WebP) are stored rather than deflated, since deflate
+only burns CPU on them.
+
+An entry is (arcname, data) where data is bytes or a file path.
+"""
+import io
+import os
+import tempfile
+import zipfile
+from flask import Response
+from utils.result_cache import cache_store
+from utils.job_queue import cleanup_paths
+
+STORED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".zip", ".gz"}
+CHUNK_SIZE = 1024 * 1024
+
+
+class _StreamBuffer(io.RawIOBase):
+    """Write-only sink that remembers its position but cannot seek."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _compress_type(arcname):
+    if os.path.splitext(arcname)[1].lower() in STORED_EXTENSIONS:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+def iter_zip(entries):
+    """Yield the bytes of a ZIP archive, flushing after every entry (and file chunk)."""
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, "w", allowZip64=True) as zf:
+        for arcname, data in entries:
+            info = zipfile.ZipInfo(arcname)
+            info.compress_type = _compress_type(arcname)
+
+            if isinstance(data, (str, os.PathLike)):
+                info.file_size = os.path.getsize(data)
+                with open(data, "rb") as src, zf.open(info, "w", force_zip64=True) as dest:
+                    for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                        dest.write(chunk)
+                        yield buffer.drain()
+            else:
+                zf.writestr(info, data)
+
+            yield buffer.drain()
+
+    # Central directory
+    yield buffer.drain()
+
+
+def write_zip(entries, zip_path):
+    """Write the same archive to disk (async jobs and the result cache)."""
+    with open(zip_path, "wb") as out:
+        for chunk in iter_zip(entries):
+            out.write(chunk)
+    return zip_path
+
+
+def zip_response(entries, download_name, cache_key=None, cleanup=None):
+    """
+    Chunked Flask response streaming a ZIP of `entries`.
+    With a cache key the archive is teed to disk and cached once complete.
+    `cleanup` lists scratch paths removed once the response is closed.
+    """
+    def generate():
+        tee = None
+        tee_path = None
+        if cache_key is not None:
+            fd, tee_path = tempfile.mkstemp(suffix=".zip")
+            tee = os.fdopen(fd, "wb")
+
+        completed = False
+        try:
+            for chunk in iter_zip(entries):
+                if not chunk:
+                    continue
+                if tee is not None:
+                    tee.write(chunk)
+                yield chunk
+            completed = True
+        finally:
+            if tee is not None:
+                tee.close()
+                if completed:
+                    cache_store(cache_key, tee_path, download_name, "application/zip")
+                os.remove(tee_path)
+
+    response = Response(generate(), mimetype="application/zip")
+    response.headers["Content-Disposition"] = f'attachment; filename="{download_name}"'
+    if cleanup:
+        response.call_on_close(lambda: cleanup_paths(cleanup))
+    return response